@@ -0,0 +1,141 @@
+"""
+JSON codec benchmark
+
+compares the available JSON codecs (see jut.util.codec) on the payloads that
+dominate `jut run` and `jut upload`:
+
+ * decoding websocket frames carrying a batch of points
+ * encoding batches of points as uploaded by `jut upload`
+ * encoding single points with indent=2 as done by the json output format
+
+Usage:
+
+    python benchmarks/codec_benchmark.py [--points-per-frame N] [--repeat N]
+
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from jut.common import info
+from jut.util import codec
+
+
+def make_point(index):
+    """
+    representative metric point as produced by a typical juttle program
+
+    """
+    return {
+        'time': '2015-10-03T06:59:%02d.%03dZ' % (index % 60, index % 1000),
+        'name': 'cpu.idle',
+        'host': 'host-%03d.example.com' % (index % 100),
+        'value': random.random() * 100,
+        'source_type': 'metric',
+        'plugin': 'cpu',
+        'type_instance': 'idle',
+        'cpu': index % 8
+    }
+
+
+def make_frame(points_per_frame):
+    """
+    websocket frame carrying a batch of points for a single sink
+
+    """
+    return json.dumps({
+        'points': [make_point(index) for index in range(0, points_per_frame)],
+        'sink': 'sink237'
+    })
+
+
+def measure(function, repeat):
+    """
+    return the best time out of the repeats of calling function
+
+    """
+    best = None
+
+    for _ in range(0, repeat):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+
+        if best == None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON codec benchmark')
+
+    parser.add_argument('--points-per-frame',
+                        type=int,
+                        default=100,
+                        help='number of points in each websocket frame, '
+                             'default: 100')
+
+    parser.add_argument('--frames',
+                        type=int,
+                        default=200,
+                        help='number of frames to process per run, '
+                             'default: 200')
+
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=5,
+                        help='number of runs to take the best of, default: 5')
+
+    options = parser.parse_args()
+
+    frame = make_frame(options.points_per_frame)
+    points = json.loads(frame)['points']
+    total_points = options.points_per_frame * options.frames
+
+    info('%d frames of %d points (%d bytes per frame), best of %d runs',
+         options.frames, options.points_per_frame, len(frame), options.repeat)
+    info('')
+    info('%-12s %18s %18s %18s', 'codec', 'decode frames', 'encode batches',
+         'encode indented')
+
+    def decode():
+        for _ in range(0, options.frames):
+            codec.loads(frame)
+
+    def encode():
+        for _ in range(0, options.frames):
+            codec.dumps(points)
+
+    def encode_indented():
+        for _ in range(0, options.frames):
+            for point in points:
+                codec.dumps(point, indent=2)
+
+    results = {}
+    for name in codec.available_codecs():
+        codec.set_codec(name)
+        results[name] = [total_points / measure(decode, options.repeat),
+                         total_points / measure(encode, options.repeat),
+                         total_points / measure(encode_indented, options.repeat)]
+
+        info('%-12s %s', name,
+             ' '.join(['%12d pts/s' % result for result in results[name]]))
+
+    info('')
+    info('speedup over the json module:')
+
+    for name in codec.available_codecs():
+        info('%-12s %s', name,
+             ' '.join(['%17.2fx' % (result / baseline)
+                       for (result, baseline) in zip(results[name], results['json'])]))
+
+
+if __name__ == '__main__':
+    main()
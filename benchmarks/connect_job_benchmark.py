@@ -0,0 +1,175 @@
+"""
+connect_job frame rate benchmark
+
+replays a websocket session through the real data_engine.connect_job
+receive loop, without any network involved, and reports the number of
+frames and points per second the loop can sustain.
+
+A session is a file with one websocket frame per line exactly as received
+on the /api/v1/juttle/channel websocket. When no session is provided a
+synthetic one is generated, which can be saved with --save-session.
+
+Usage:
+
+    python benchmarks/connect_job_benchmark.py [--session FILE]
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from jut.api import data_engine
+from jut.common import info
+
+
+class ReplayWebSocket(object):
+    """
+    websocket stand-in that replays the frames of a recorded session
+
+    """
+
+    def __init__(self, frames):
+        self.frames = iter(frames)
+        self.sent = 0
+
+    def recv(self):
+        return next(self.frames)
+
+    def send(self, data):
+        self.sent += 1
+
+    def close(self):
+        pass
+
+
+class StaticTokenManager(object):
+    """
+    token manager stand-in whose access token never expires
+
+    """
+
+    def is_access_token_expired(self):
+        return False
+
+    def get_access_token(self):
+        return 'token'
+
+
+def make_session(frames, points_per_frame, ping_every):
+    """
+    generate a synthetic session of points frames with a heartbeat every
+    ping_every frames and a final job_end frame
+
+    """
+    session = []
+
+    for index in range(0, frames):
+        if index % ping_every == 0:
+            session.append(json.dumps({'ping': True}))
+
+        points = []
+        for offset in range(0, points_per_frame):
+            points.append({
+                'time': '2015-10-03T06:59:49.%03dZ' % (offset % 1000),
+                'name': 'cpu.idle',
+                'host': 'host-%02d' % (offset % 10),
+                'value': offset * 1.5
+            })
+
+        session.append(json.dumps({
+            'points': points,
+            'sink': 'sink237'
+        }))
+
+    session.append(json.dumps({'job_end': True}))
+    return session
+
+
+def replay(session):
+    """
+    replay the session through connect_job and return the number of points
+    received along with the elapsed time
+
+    """
+    websocket = ReplayWebSocket(session)
+    points = 0
+
+    start = time.time()
+    for payload in data_engine.connect_job('benchmark',
+                                           None,
+                                           token_manager=StaticTokenManager(),
+                                           websocket=websocket,
+                                           data_url='https://localhost'):
+        if 'points' in payload:
+            points += len(payload['points'])
+
+    return points, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='connect_job frame rate benchmark')
+
+    parser.add_argument('--session',
+                        help='file with one websocket frame per line to '
+                             'replay instead of a synthetic session')
+
+    parser.add_argument('--save-session',
+                        help='save the synthetic session to this file')
+
+    parser.add_argument('--frames',
+                        type=int,
+                        default=20000,
+                        help='number of points frames in the synthetic '
+                             'session, default: 20000')
+
+    parser.add_argument('--points-per-frame',
+                        type=int,
+                        default=10,
+                        help='number of points per frame in the synthetic '
+                             'session, default: 10')
+
+    parser.add_argument('--ping-every',
+                        type=int,
+                        default=100,
+                        help='number of frames between heartbeats in the '
+                             'synthetic session, default: 100')
+
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=5,
+                        help='number of runs to take the best of, default: 5')
+
+    options = parser.parse_args()
+
+    if options.session != None:
+        with open(options.session, 'r') as session_file:
+            session = [line.strip() for line in session_file if line.strip()]
+
+    else:
+        session = make_session(options.frames,
+                               options.points_per_frame,
+                               options.ping_every)
+
+        if options.save_session != None:
+            with open(options.save_session, 'w') as session_file:
+                session_file.write('\n'.join(session))
+
+    best = None
+    for _ in range(0, options.repeat):
+        points, elapsed = replay(session)
+
+        if best == None or elapsed < best:
+            best = elapsed
+
+    info('%d frames, %d points, best of %d runs', len(session), points, options.repeat)
+    info('%12d frames/s', len(session) / best)
+    info('%12d points/s', points / best)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+jut run streaming throughput benchmark
+
+replays websocket sessions through the real data_engine.connect_job receive
+loop and each of the `jut run` output formats, which is the same path points
+take from the data engine to the output of `jut run`, and reports for each
+format:
+
+ * points per second
+ * CPU time per point (user and system)
+ * peak resident memory
+
+Each run happens in a forked process so the CPU time and peak memory are
+those of that run alone, the `none` format only receives the points and is
+the baseline the cost of each format adds to.
+
+Synthetic sessions are generated for every combination of --points-per-frame,
+--width (fields per point) and --sinks, or a session recorded with one frame
+per line (see connect_job_benchmark.py) can be replayed with --session.
+
+Usage:
+
+    python benchmarks/run_benchmark.py [--points N] [--points-per-frame 10,100]
+                                       [--width 8,32] [--sinks 1,4]
+                                       [--formats json,csv] [--session FILE]
+
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from connect_job_benchmark import ReplayWebSocket, StaticTokenManager
+
+from jut import formatters
+from jut.api import data_engine
+from jut.common import BufferedOutput, info
+
+# formats benchmarked by default, json-raw being the json format with --raw
+FORMATS = ['none', 'json', 'json-raw', 'ndjson', 'text', 'csv', 'arrow', 'parquet']
+
+
+def make_point(index, width):
+    """
+    point with a time field followed by width fields alternating between
+    strings, floats and integers
+
+    """
+    point = {
+        'time': '2015-10-03T06:59:%02d.%03dZ' % (index % 60, index % 1000)
+    }
+
+    for field in range(0, width):
+        name = 'field%02d' % field
+
+        if field % 3 == 0:
+            point[name] = 'value-%d' % (index % 100)
+        elif field % 3 == 1:
+            point[name] = index * 1.5
+        else:
+            point[name] = index
+
+    return point
+
+
+def make_session(points, points_per_frame, width, sinks, ping_every=100):
+    """
+    generate a synthetic session with the points spread evenly across the
+    sinks, a heartbeat every ping_every frames and a final job_end frame
+
+    """
+    session = []
+    frames = 0
+
+    for start in range(0, points, points_per_frame):
+        if frames % ping_every == 0:
+            session.append(json.dumps({'ping': True}))
+
+        count = min(points_per_frame, points - start)
+        session.append(json.dumps({
+            'points': [make_point(start + offset, width) for offset in range(0, count)],
+            'sink': 'sink%d' % (frames % sinks)
+        }))
+        frames += 1
+
+    session.append(json.dumps({'job_end': True}))
+    return session
+
+
+def count_points(session):
+    """
+    return the number of points in the session
+
+    """
+    points = 0
+
+    for frame in session:
+        points += len(json.loads(frame).get('points', []))
+
+    return points
+
+
+def stream(session, format_name, directory):
+    """
+    stream the session through connect_job and the formatter for the format
+    provided
+
+    """
+    raw = format_name == 'json-raw'
+
+    if raw:
+        format_name = 'json'
+
+    formatter = None
+    if format_name != 'none':
+        options = argparse.Namespace(format=format_name,
+                                     persist=False,
+                                     flush='size',
+                                     output=os.path.join(directory, 'points.%s' % format_name),
+                                     row_group_size=65536)
+
+        output = BufferedOutput(stream=open(os.devnull, 'w'), policy='size')
+
+        if format_name in ['arrow', 'parquet']:
+            formatter = formatters.get_formatter(format_name, options)
+        else:
+            formatter = formatters.get_formatter(format_name, options, output=output)
+
+        formatter.start()
+
+    for payload in data_engine.connect_job('benchmark',
+                                           None,
+                                           token_manager=StaticTokenManager(),
+                                           websocket=ReplayWebSocket(session),
+                                           data_url='https://localhost',
+                                           raw_points=raw):
+        if formatter == None:
+            continue
+
+        if 'points' in payload:
+            formatter.points(payload['points'], sink=payload.get('sink'))
+
+        elif 'raw_points' in payload:
+            formatter.raw_points(payload['raw_points'], sink=payload.get('sink'))
+
+        formatter.frame_end()
+
+    if formatter != None:
+        formatter.stop()
+
+
+def measure(session, format_name):
+    """
+    stream the session in a forked process and return the elapsed time, CPU
+    time and peak resident memory in bytes
+
+    """
+    (read_fd, write_fd) = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+        directory = tempfile.mkdtemp()
+
+        exit_status = 1
+
+        try:
+            start = time.time()
+            stream(session, format_name, directory)
+            os.write(write_fd, str(time.time() - start))
+            exit_status = 0
+
+        except Exception:
+            traceback.print_exc()
+
+        finally:
+            shutil.rmtree(directory)
+            os._exit(exit_status)
+
+    os.close(write_fd)
+
+    result = ''
+    data = None
+    while data != '':
+        data = os.read(read_fd, 4096)
+        result += data
+
+    os.close(read_fd)
+    (_, status, usage) = os.wait4(pid, 0)
+
+    if status != 0 or result == '':
+        raise Exception('benchmarking the %s format failed' % format_name)
+
+    elapsed = float(result)
+    cpu = usage.ru_utime + usage.ru_stime
+
+    # ru_maxrss is in bytes on OS X and kilobytes everywhere else
+    if sys.platform == 'darwin':
+        peak_rss = usage.ru_maxrss
+    else:
+        peak_rss = usage.ru_maxrss * 1024
+
+    return (elapsed, cpu, peak_rss)
+
+
+def available_formats():
+    formats = list(FORMATS)
+
+    try:
+        import pyarrow
+
+    except ImportError:
+        formats.remove('arrow')
+        formats.remove('parquet')
+
+    return formats
+
+
+def report(description, session, formats, repeat):
+    points = count_points(session)
+
+    info('')
+    info('%s (%d frames)', description, len(session))
+    info('%-10s %14s %14s %14s', 'format', 'points/s', 'us cpu/point', 'peak rss MB')
+
+    for format_name in formats:
+        best = None
+
+        for _ in range(0, repeat):
+            result = measure(session, format_name)
+
+            if best == None or result[0] < best[0]:
+                best = result
+
+        (elapsed, cpu, peak_rss) = best
+        info('%-10s %14d %14.2f %14.1f',
+             format_name,
+             points / elapsed,
+             cpu * 1000000.0 / max(points, 1),
+             peak_rss / (1024.0 * 1024.0))
+
+
+def integers(value):
+    return [int(item) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='jut run streaming throughput benchmark')
+
+    parser.add_argument('--session',
+                        help='file with one websocket frame per line to '
+                             'replay instead of the synthetic sessions')
+
+    parser.add_argument('--points',
+                        type=int,
+                        default=100000,
+                        help='number of points in each synthetic session, '
+                             'default: 100000')
+
+    parser.add_argument('--points-per-frame',
+                        type=integers,
+                        default=[10, 100, 1000],
+                        help='comma separated points per frame of the '
+                             'synthetic sessions, default: 10,100,1000')
+
+    parser.add_argument('--width',
+                        type=integers,
+                        default=[8],
+                        help='comma separated fields per point of the '
+                             'synthetic sessions, default: 8')
+
+    parser.add_argument('--sinks',
+                        type=integers,
+                        default=[1],
+                        help='comma separated number of sinks the points of '
+                             'the synthetic sessions are spread across, '
+                             'default: 1')
+
+    parser.add_argument('--formats',
+                        type=lambda value: value.split(','),
+                        default=None,
+                        help='comma separated formats to benchmark, default: '
+                             'all of %s (arrow and parquet require pyarrow)' %
+                             ','.join(FORMATS))
+
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=3,
+                        help='number of runs to take the best of, default: 3')
+
+    options = parser.parse_args()
+
+    formats = options.formats
+    if formats == None:
+        formats = available_formats()
+
+    for format_name in formats:
+        if format_name not in FORMATS:
+            parser.error('unknown format "%s"' % format_name)
+
+    if options.session != None:
+        with open(options.session, 'r') as session_file:
+            session = [line.strip() for line in session_file if line.strip()]
+
+        report(options.session, session, formats, options.repeat)
+
+    else:
+        for points_per_frame in options.points_per_frame:
+            for width in options.width:
+                for sinks in options.sinks:
+                    session = make_session(options.points,
+                                           points_per_frame,
+                                           width,
+                                           sinks)
+
+                    report('%d points, %d points/frame, %d fields/point, %d sinks' %
+                           (options.points, points_per_frame, width, sinks),
+                           session,
+                           formats,
+                           options.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+jut command line startup time benchmark
+
+runs quick jut commands that don't talk to Jut (ie `jut --help` or
+`jut config list`) in a new process each time and reports the best and
+median wall clock time of each, along with the interpreter startup time
+(`python -c pass`) as the baseline.
+
+Every command runs with a temporary jut home (HOME_OVERRIDE) holding a single
+configuration, so results don't depend on the local configuration. With
+--max-ms the benchmark fails when any command's median, minus the interpreter
+startup, goes over the limit provided.
+
+Usage:
+
+    python benchmarks/startup_benchmark.py [--repeat N] [--max-ms MS]
+
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from jut.common import info, error
+
+CLI = os.path.join(os.path.dirname(__file__), '..', 'jut', 'cli.py')
+
+COMMANDS = [
+    ['--help'],
+    ['config', 'list'],
+    ['run', '--help'],
+    ['jobs', 'list', '--help'],
+    ['upload', '--help']
+]
+
+CONFIG = """[jut-tools-user@https://app.jut.io]
+app_url = https://app.jut.io
+deployment_name = jut-tools-deployment
+username = jut-tools-user
+client_id = client_id
+client_secret = client_secret
+default = True
+
+"""
+
+
+def time_command(command, env, repeat):
+    """
+    run the command repeat times and return the best and median elapsed
+    time in seconds
+
+    """
+    timings = []
+
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(0, repeat):
+            start = time.time()
+            subprocess.call(command, stdout=devnull, stderr=devnull, env=env)
+            timings.append(time.time() - start)
+
+    timings.sort()
+    return (timings[0], timings[len(timings) / 2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='jut command line startup time benchmark')
+
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=20,
+                        help='number of times to run each command, default: 20')
+
+    parser.add_argument('--max-ms',
+                        type=float,
+                        default=None,
+                        help='fail when the median startup time of any command, '
+                             'minus the interpreter startup, is over this '
+                             'many milliseconds')
+
+    options = parser.parse_args()
+
+    home = tempfile.mkdtemp()
+
+    try:
+        with open(os.path.join(home, 'config'), 'w') as config_file:
+            config_file.write(CONFIG)
+
+        env = dict(os.environ)
+        env['HOME_OVERRIDE'] = home
+        env['PYTHONPATH'] = os.path.join(os.path.dirname(__file__), '..')
+
+        (_, baseline) = time_command([sys.executable, '-c', 'pass'], env, options.repeat)
+
+        info('%-24s %10s %10s %10s', 'command', 'best ms', 'median ms', 'jut ms')
+        info('%-24s %10s %10.1f', 'python -c pass', '', baseline * 1000)
+
+        failed = False
+        for command in COMMANDS:
+            (best, median) = time_command([sys.executable, CLI] + command,
+                                          env,
+                                          options.repeat)
+
+            jut_time = (median - baseline) * 1000
+            info('%-24s %10.1f %10.1f %10.1f',
+                 'jut %s' % ' '.join(command),
+                 best * 1000,
+                 median * 1000,
+                 jut_time)
+
+            if options.max_ms != None and jut_time > options.max_ms:
+                failed = True
+
+        if failed:
+            error('startup time over %sms' % options.max_ms)
+            sys.exit(1)
+
+    finally:
+        shutil.rmtree(home)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+jut upload ingestion throughput benchmark
+
+drives the real upload path (jut.commands.upload.push_json_file) with
+synthetic JSON files against the webhook import endpoint of a local fake jut
+server (see tests/fake_server.py), which can add latency to each request, and
+reports for each combination of --sizes and --batch-sizes:
+
+ * records and bytes per second
+ * peak resident memory of the upload
+ * latency of each batch POST (median, 99th percentile and max)
+
+Each upload happens in a forked process so the peak memory is that of that
+upload alone, the synthetic files are generated once in --directory (the
+system temp directory by default) and removed at the end unless --keep is
+used.
+
+Usage:
+
+    python benchmarks/upload_benchmark.py [--sizes 1MB,100MB,10GB]
+                                          [--batch-sizes 100,1000]
+                                          [--latency 0.01]
+
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from fake_server import FakeJutServer
+
+from jut.commands import upload
+from jut.common import info
+
+UNITS = {
+    'KB': 1024,
+    'MB': 1024 ** 2,
+    'GB': 1024 ** 3
+}
+
+
+def parse_size(value):
+    """
+    parse a size like 10MB or 1GB to the number of bytes
+
+    """
+    value = value.strip().upper()
+
+    for (unit, multiplier) in UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * multiplier)
+
+    return int(value)
+
+
+def make_record(index):
+    """
+    representative log record as uploaded with `jut upload`
+
+    """
+    return {
+        'time': '2015-10-03T06:59:%02d.%03dZ' % (index % 60, index % 1000),
+        'host': 'host-%03d.example.com' % (index % 100),
+        'level': ['info', 'warning', 'error'][index % 3],
+        'message': 'request %d served in %d ms' % (index, index % 250),
+        'bytes': index % 65536,
+        'duration': (index % 250) * 0.75
+    }
+
+
+def make_file(filepath, size):
+    """
+    write a JSON array of records to the file provided until it's at least
+    size bytes long and return the number of records written
+
+    """
+    records = 0
+    written = 0
+
+    with open(filepath, 'w') as json_file:
+        json_file.write('[')
+
+        while written < size:
+            data = json.dumps(make_record(records))
+
+            if records > 0:
+                data = ',\n' + data
+
+            json_file.write(data)
+            written += len(data)
+            records += 1
+
+        json_file.write(']')
+
+    return records
+
+
+def push(filepath, url, batch_size):
+    """
+    upload the file to the url provided in batches of batch_size records and
+    return the latency of each batch POST
+
+    """
+    latencies = []
+    post = upload.post
+
+    def timed_post(json_data, url, dry_run=False):
+        start = time.time()
+        post(json_data, url, dry_run=dry_run)
+        latencies.append(time.time() - start)
+
+    upload.post = timed_post
+
+    with open(filepath, 'r') as json_file:
+        upload.push_json_file(json_file, url, batch_size=batch_size)
+
+    return latencies
+
+
+def measure(filepath, url, batch_size):
+    """
+    upload the file in a forked process and return the elapsed time, peak
+    resident memory in bytes and the batch latencies
+
+    """
+    (read_fd, write_fd) = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+        exit_status = 1
+
+        try:
+            start = time.time()
+            latencies = push(filepath, url, batch_size)
+            elapsed = time.time() - start
+
+            data = json.dumps([elapsed, latencies])
+            while data != '':
+                data = data[os.write(write_fd, data):]
+
+            exit_status = 0
+
+        except Exception:
+            traceback.print_exc()
+
+        finally:
+            os._exit(exit_status)
+
+    os.close(write_fd)
+
+    result = ''
+    data = None
+    while data != '':
+        data = os.read(read_fd, 65536)
+        result += data
+
+    os.close(read_fd)
+    (_, status, usage) = os.wait4(pid, 0)
+
+    if status != 0 or result == '':
+        raise Exception('uploading %s failed' % filepath)
+
+    (elapsed, latencies) = json.loads(result)
+
+    # ru_maxrss is in bytes on OS X and kilobytes everywhere else
+    if sys.platform == 'darwin':
+        peak_rss = usage.ru_maxrss
+    else:
+        peak_rss = usage.ru_maxrss * 1024
+
+    return (elapsed, peak_rss, latencies)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def integers(value):
+    return [int(item) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='jut upload ingestion throughput benchmark')
+
+    parser.add_argument('--sizes',
+                        type=lambda value: [parse_size(size) for size in value.split(',')],
+                        default=[parse_size('1MB'), parse_size('10MB')],
+                        help='comma separated sizes of the synthetic files '
+                             'to upload (ie 1MB,100MB,10GB), default: 1MB,10MB')
+
+    parser.add_argument('--batch-sizes',
+                        type=integers,
+                        default=[100, 1000],
+                        help='comma separated number of records per POST, '
+                             'default: 100,1000')
+
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0,
+                        help='seconds the sink server waits before answering '
+                             'each POST, default: 0')
+
+    parser.add_argument('--directory',
+                        default=None,
+                        help='directory to generate the synthetic files in, '
+                             'default: the system temp directory')
+
+    parser.add_argument('--keep',
+                        action='store_true',
+                        default=False,
+                        help='keep the synthetic files around')
+
+    options = parser.parse_args()
+
+    server = FakeJutServer(latency=options.latency, store_imports=False)
+    server.start()
+
+    apikey = server.deployments.values()[0]['apikey']
+    url = '%s/api/v1/import/webhook/?space=benchmark&apikey=%s' % (server.url, apikey)
+
+    directory = tempfile.mkdtemp(dir=options.directory)
+
+    try:
+        for size in options.sizes:
+            filepath = os.path.join(directory, 'upload-%d.json' % size)
+            records = make_file(filepath, size)
+            size = os.path.getsize(filepath)
+
+            info('')
+            info('%d bytes, %d records, %.3fs latency', size, records, options.latency)
+            info('%-10s %12s %12s %12s %10s %10s %10s',
+                 'batch', 'records/s', 'MB/s', 'peak rss MB',
+                 'p50 ms', 'p99 ms', 'max ms')
+
+            for batch_size in options.batch_sizes:
+                (elapsed, peak_rss, latencies) = measure(filepath, url, batch_size)
+
+                info('%-10d %12d %12.2f %12.1f %10.2f %10.2f %10.2f',
+                     batch_size,
+                     records / elapsed,
+                     size / elapsed / UNITS['MB'],
+                     peak_rss / float(UNITS['MB']),
+                     percentile(latencies, 0.5) * 1000,
+                     percentile(latencies, 0.99) * 1000,
+                     max(latencies) * 1000)
+
+            if not options.keep:
+                os.remove(filepath)
+
+    finally:
+        if not options.keep:
+            shutil.rmtree(directory)
+
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,28 @@
 jut users API
 """
 
-import requests
 import json
+import os
+import tempfile
+import time
+
+from multiprocessing.pool import ThreadPool
 
 from jut import defaults
 from jut.api import environment
+from jut.api.session import SESSION
 from jut.exceptions import JutException
 
+# maximum number of account ids to resolve in a single request so the
+# request url stays well within what servers and proxies accept
+ACCOUNTS_CHUNK_SIZE = 50
+
+# maximum number of concurrent requests used to resolve account ids
+ACCOUNTS_MAX_WORKERS = 8
+
+# number of seconds an account stays valid in the local accounts cache
+ACCOUNTS_CACHE_TTL = 24 * 60 * 60
+
 
 def create_user(name,
                 username,
@@ -31,9 +46,9 @@ def create_user(name,
         'password': password
     }
 
-    response = requests.post(url,
-                             data=json.dumps(payload),
-                             headers=headers)
+    response = SESSION.post(url,
+                            data=json.dumps(payload),
+                            headers=headers)
 
     if response.status_code == 201:
         return response.json()
@@ -57,7 +72,7 @@ def delete_user(username,
     headers = token_manager.get_access_token_headers()
     auth_url = environment.get_auth_url(app_url=app_url)
     url = "%s/api/v1/accounts/%s" % (auth_url, account_id)
-    response = requests.delete(url, headers=headers)
+    response = SESSION.delete(url, headers=headers)
 
     if response.status_code == 204:
         return response.text
@@ -77,8 +92,8 @@ def get_account_id(username,
     auth_url = environment.get_auth_url(app_url=app_url)
     url = "%s/api/v1/accounts?username=%s" % (auth_url, username)
 
-    response = requests.get(url,
-                            headers=headers)
+    response = SESSION.get(url,
+                           headers=headers)
 
     if response.status_code == 200:
         return response.json()['id']
@@ -107,8 +122,8 @@ def get_logged_in_account(token_manager=None,
     auth_url = environment.get_auth_url(app_url=app_url)
     url = "%s/api/v1/account" % auth_url
 
-    response = requests.get(url,
-                            headers=headers)
+    response = SESSION.get(url,
+                           headers=headers)
 
     if response.status_code == 200:
         return response.json()
@@ -137,7 +152,7 @@ def user_exists(username,
     headers = token_manager.get_access_token_headers()
     auth_url = environment.get_auth_url(app_url=app_url)
     url = "%s/api/v1/accounts?username=%s" % (auth_url, username)
-    response = requests.get(url, headers=headers)
+    response = SESSION.get(url, headers=headers)
 
     if response.status_code == 404:
         return False
@@ -147,24 +162,167 @@ def user_exists(username,
         raise JutException('Error %s: %s' % (response.status_code, response.text))
 
 
+def _get_accounts(account_ids,
+                  headers,
+                  auth_url):
+    """
+    internal method to fetch the account details for a single chunk of
+    account ids
+
+    """
+    url = "%s/api/v1/accounts/%s" % (auth_url, ','.join(account_ids))
+
+    response = SESSION.get(url,
+                           headers=headers)
+
+    if response.status_code == 200:
+        return response.json()
+
+    else:
+        raise JutException('Error %s; %s' % (response.status_code, response.text))
+
+
 def get_accounts(account_ids,
                  token_manager=None,
                  app_url=defaults.APP_URL):
     """
     get the account details for each of the account ids in the account_ids list
 
+    large sets of account ids are split into chunks of ACCOUNTS_CHUNK_SIZE
+    which are then fetched in parallel
+
     """
     headers = token_manager.get_access_token_headers()
     auth_url = environment.get_auth_url(app_url=app_url)
 
-    url = "%s/api/v1/accounts/%s" % (auth_url, ','.join(account_ids))
+    account_ids = list(account_ids)
+    chunks = [account_ids[index:index + ACCOUNTS_CHUNK_SIZE]
+              for index in range(0, len(account_ids), ACCOUNTS_CHUNK_SIZE)]
 
-    response = requests.get(url,
-                            headers=headers)
+    if len(chunks) <= 1:
+        return _get_accounts(account_ids, headers, auth_url)
 
-    if response.status_code == 200:
-        return response.json()
+    pool = ThreadPool(min(len(chunks), ACCOUNTS_MAX_WORKERS))
+    try:
+        results = pool.map(lambda chunk: _get_accounts(chunk, headers, auth_url),
+                           chunks)
+    finally:
+        pool.close()
+        pool.join()
 
-    else:
-        raise JutException('Error %s; %s' % (response.status_code, response.text))
+    accounts = []
+    for result in results:
+        accounts += result['accounts']
+
+    return {
+        'accounts': accounts
+    }
+
+
+class AccountsCache(object):
+    """
+    on disk cache of account details keyed by app url and account id, so
+    repeatedly resolving the owners of jobs and programs doesn't require
+    refetching the same accounts every time
+
+    """
+
+    def __init__(self,
+                 filepath,
+                 ttl=ACCOUNTS_CACHE_TTL):
+        self.filepath = filepath
+        self.ttl = ttl
+        self.entries = {}
+
+        if os.path.exists(filepath):
+            try:
+                with open(filepath, 'r') as cache_file:
+                    self.entries = json.loads(cache_file.read())
+
+            except ValueError:
+                # a corrupt cache is simply rebuilt from scratch
+                self.entries = {}
+
+    def get(self, app_url, account_id):
+        """
+        return the cached account details or None if the account isn't
+        cached or the cached copy has expired
+
+        """
+        entry = self.entries.get(app_url, {}).get(account_id)
+
+        if entry == None or entry['cached_at'] + self.ttl < time.time():
+            return None
+
+        return entry['account']
+
+    def put(self, app_url, account):
+        """
+        add the account details provided to the cache
+
+        """
+        self.entries.setdefault(app_url, {})[account['id']] = {
+            'account': account,
+            'cached_at': time.time()
+        }
+
+    def save(self):
+        """
+        write the cache back to disk, by renaming a temporary file into place
+        so concurrent readers never see a partially written cache
+
+        """
+        directory = os.path.dirname(os.path.abspath(self.filepath))
+        (handle, temp_filepath) = tempfile.mkstemp(dir=directory)
+
+        with os.fdopen(handle, 'w') as cache_file:
+            cache_file.write(json.dumps(self.entries))
+
+        os.rename(temp_filepath, self.filepath)
+
+
+def get_account_lookup(account_ids,
+                       cache_filepath=None,
+                       ttl=ACCOUNTS_CACHE_TTL,
+                       token_manager=None,
+                       app_url=defaults.APP_URL):
+    """
+    return a dictionary of account id to account details for each of the
+    account ids provided. When cache_filepath is set the account details are
+    read from and saved to that cache, and only the accounts which aren't
+    cached (or whose cached copy is older than ttl seconds) are fetched.
+
+    """
+    account_lookup = {}
+    missing_ids = set()
+
+    cache = None
+    if cache_filepath != None:
+        cache = AccountsCache(cache_filepath, ttl=ttl)
+
+    for account_id in account_ids:
+        account = None
+
+        if cache != None:
+            account = cache.get(app_url, account_id)
+
+        if account != None:
+            account_lookup[account_id] = account
+        else:
+            missing_ids.add(account_id)
+
+    if missing_ids:
+        accounts_details = get_accounts(missing_ids,
+                                        token_manager=token_manager,
+                                        app_url=app_url)
+
+        for account in accounts_details['accounts']:
+            account_lookup[account['id']] = account
+
+            if cache != None:
+                cache.put(app_url, account)
+
+        if cache != None:
+            cache.save()
 
+    return account_lookup
@@ -3,12 +3,12 @@ jut auth API
 
 """
 
-import requests
 import json
 import time
 
 from jut import defaults
-from jut.api import environment
+from jut.api import environment, session
+from jut.api.session import SESSION
 from jut.exceptions import JutException
 from jut.common import debug, is_debug_enabled
 
@@ -115,21 +115,23 @@ def get_access_token(username=None,
     client_secret: client_secret generated through the Jut appliation or using
                    the authorizations API
     """
-    sess = requests.Session()
     auth_url = environment.get_auth_url(app_url=app_url)
 
     if client_id != None:
         headers = {
             'content-type': 'application/json'
         }
-        response = sess.post(auth_url + "/token",
-                             headers=headers,
-                             data=json.dumps({
-                                 'grant_type': 'client_credentials',
-                                 'client_id': client_id,
-                                 'client_secret': client_secret
-                             }))
+        response = SESSION.post(auth_url + "/token",
+                                headers=headers,
+                                data=json.dumps({
+                                    'grant_type': 'client_credentials',
+                                    'client_id': client_id,
+                                    'client_secret': client_secret
+                                }))
     else:
+        # the login cookie is only used for getting the token
+        sess = session.new_session()
+
         form = {
             'username': username,
             'password': password
@@ -3,10 +3,9 @@ jut authorizations API
 
 """
 
-import requests
-
 from jut import defaults
 from jut.api import environment
+from jut.api.session import SESSION
 from jut.exceptions import JutException
 
 
@@ -20,8 +19,8 @@ def get_authorization(token_manager,
     url = '%s/api/v1/authorizations' % auth_url
 
     headers = token_manager.get_access_token_headers()
-    response = requests.post(url,
-                             headers=headers)
+    response = SESSION.post(url,
+                            headers=headers)
 
     if response.status_code == 201:
         return response.json()
@@ -3,19 +3,268 @@ data engine API
 
 """
 
-import json
+import Queue
 import random
-import requests
+import re
+import select
 import socket
+import threading
 import time
 import traceback
+import zlib
 
-from websocket import create_connection
+from websocket import ABNF, WebSocket, WebSocketException, \
+                      WebSocketTimeoutException
+
+try:
+    from websocket._abnf import frame_buffer
+
+    # compressed frames are only let through by hooking into how the
+    # websocket-client versions we know of parse the frame headers
+    DEFLATE_SUPPORTED = hasattr(frame_buffer, 'has_received_header') and \
+                        hasattr(frame_buffer, 'recv_header') and \
+                        hasattr(WebSocket, 'recv_data_frame')
+
+except ImportError:
+    DEFLATE_SUPPORTED = False
 
 from jut import defaults
 from jut.api import deployments
+from jut.api.session import SESSION
 from jut.common import debug, is_debug_enabled
 from jut.exceptions import JutException
+from jut.util import codec
+
+# heartbeat response to the pings from the data engine
+PONG = codec.dumps({
+    'pong': True
+})
+
+# seconds we keep trying to reconnect to a job, just under the 30s the data
+# engine keeps running non persistent programs without any heartbeats
+RECONNECT_BUDGET = 25
+
+# exponential backoff between reconnect attempts, the actual delay being a
+# random number of seconds up to the current backoff
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 8
+
+# seconds a JobStream waits on the rest of a frame before going back to the
+# other streams, what's already read of the frame stays buffered
+READ_POLL_TIMEOUT = 0.01
+
+# offer of the permessage-deflate extension (RFC 7692) to the data engine
+DEFLATE_OFFER = 'Sec-WebSocket-Extensions: permessage-deflate'
+
+# tail of every compressed message, removed by the sender (RFC 7692)
+DEFLATE_TAIL = '\x00\x00\xff\xff'
+
+# an array closed and followed by more values, which within what we take
+# for the points array means it may have ended earlier
+ARRAY_CONTINUED = re.compile(r'\]\s*,')
+
+
+class WebsocketOptions(object):
+    """
+    timeouts and TCP options of the websockets to the data engine, along
+    with the number of times jobs were reconnected to using them, so they
+    can be tuned for each deployment. The options can be set in a jut
+    configuration with the websocket_connect_timeout,
+    websocket_read_timeout, websocket_tcp_nodelay, websocket_keepalive and
+    websocket_receive_buffer keys (see from_config).
+
+    """
+
+    def __init__(self,
+                 connect_timeout=10,
+                 read_timeout=10,
+                 tcp_nodelay=True,
+                 keepalive=30,
+                 receive_buffer=None,
+                 compression=False):
+        """
+        connect_timeout: seconds to wait for the websocket to open
+        read_timeout: seconds to wait for a frame from the data engine
+                      before reconnecting, None to wait forever and rely on
+                      the TCP keepalive to detect dead connections
+        tcp_nodelay: send our (small) heartbeat and token frames right away
+                     rather than coalescing them, see TCP_NODELAY
+        keepalive: seconds a connection is idle before sending TCP keepalive
+                   probes, 0 to disable them
+        receive_buffer: size in bytes of the socket receive buffer, None to
+                        keep the system default
+        compression: offer the permessage-deflate extension to the data
+                     engine so it compresses the payloads it sends, which
+                     requires a websocket-client we know how to extend (see
+                     DEFLATE_SUPPORTED)
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.tcp_nodelay = tcp_nodelay
+        self.keepalive = keepalive
+        self.receive_buffer = receive_buffer
+        self.compression = compression
+
+        # number of times jobs were reconnected to with these options
+        self.reconnects = 0
+
+        # bytes of the payloads received as sent over the wire and once
+        # decompressed
+        self.wire_bytes = 0
+        self.payload_bytes = 0
+
+    @classmethod
+    def from_config(cls, configuration):
+        """
+        create the websocket options from the websocket_* keys of the jut
+        configuration provided, using the defaults for any missing keys
+
+        """
+        def get(key, convert, default):
+            value = configuration.get('websocket_%s' % key)
+
+            if value == None:
+                return default
+
+            if value.lower() == 'none':
+                return None
+
+            return convert(value)
+
+        def boolean(value):
+            return value.lower() in ['true', 'yes', 'on', '1']
+
+        return cls(connect_timeout=get('connect_timeout', float, 10),
+                   read_timeout=get('read_timeout', float, 10),
+                   tcp_nodelay=get('tcp_nodelay', boolean, True),
+                   keepalive=get('keepalive', int, 30),
+                   receive_buffer=get('receive_buffer', int, None),
+                   compression=get('compression', boolean, False))
+
+    def update(self, **kwargs):
+        """
+        override the options provided, ignoring those set to None
+
+        """
+        for (key, value) in kwargs.items():
+            if not hasattr(self, key):
+                raise JutException('Unknown websocket option "%s"' % key)
+
+            if value != None:
+                setattr(self, key, value)
+
+    def get_sockopt(self):
+        """
+        return the socket options, as (level, option, value) tuples, applied
+        on top of the websocket-client defaults before connecting
+
+        """
+        sockopt = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.tcp_nodelay)),
+                   (socket.SOL_SOCKET, socket.SO_KEEPALIVE, int(self.keepalive > 0))]
+
+        if self.keepalive > 0 and hasattr(socket, 'TCP_KEEPIDLE'):
+            sockopt.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive))
+
+        if self.receive_buffer != None:
+            sockopt.append((socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer))
+
+        return sockopt
+
+    def get_compression_ratio(self):
+        """
+        return how many times smaller the payloads received were over the
+        wire, 1.0 without compression
+
+        """
+        if self.wire_bytes == 0:
+            return 1.0
+
+        return float(self.payload_bytes) / self.wire_bytes
+
+
+# options of the websockets opened without any options of their own
+DEFAULT_WEBSOCKET_OPTIONS = WebsocketOptions()
+
+
+class _DeflateWebSocket(WebSocket):
+    """
+    websocket negotiating the permessage-deflate extension (RFC 7692) with
+    the data engine, which the websocket-client we depend on doesn't
+    support, only used when DEFLATE_SUPPORTED. Only the payloads sent by the
+    data engine are compressed, ours are small and the extension lets us
+    send them uncompressed.
+
+    """
+
+    def __init__(self, websocket_options):
+        # compressed payloads aren't valid UTF-8 until they're decompressed
+        WebSocket.__init__(self,
+                           sockopt=websocket_options.get_sockopt(),
+                           skip_utf8_validation=True)
+        self.websocket_options = websocket_options
+        self.decompressor = None
+        self.no_context_takeover = False
+
+        # set when the message being received is compressed
+        self.compressed = False
+
+    def connect(self, url, **options):
+        header = options.get('header', [])
+
+        if isinstance(header, dict):
+            header = ['%s: %s' % item for item in header.items()]
+
+        options['header'] = list(header) + [DEFLATE_OFFER]
+
+        WebSocket.connect(self, url, **options)
+
+        extension = self.headers.get('sec-websocket-extensions', '')
+        parameters = [parameter.strip() for parameter in extension.split(';')]
+
+        if parameters[0] == 'permessage-deflate':
+            # the window of the data engine is at most the maximum window
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            self.no_context_takeover = 'server_no_context_takeover' in parameters
+
+            if is_debug_enabled():
+                debug('negotiated %s', extension)
+
+    def recv_frame(self):
+        if self.decompressor != None:
+            frame_buffer = self.frame_buffer
+
+            # a header is only read once per frame, even when the rest of
+            # the frame arrives over several calls (ie after timeouts)
+            if frame_buffer.has_received_header():
+                frame_buffer.recv_header()
+
+                (fin, rsv1, rsv2, rsv3, opcode, has_mask, length) = frame_buffer.header
+
+                # the first frame of a message marks it as compressed
+                if opcode in [ABNF.OPCODE_TEXT, ABNF.OPCODE_BINARY]:
+                    self.compressed = rsv1 == 1
+
+                # websocket-client rejects any frame with a reserved bit set
+                frame_buffer.header = (fin, 0, rsv2, rsv3, opcode, has_mask, length)
+
+        return WebSocket.recv_frame(self)
+
+    def recv_data_frame(self, control_frame=False):
+        (opcode, frame) = WebSocket.recv_data_frame(self, control_frame)
+
+        if opcode in [ABNF.OPCODE_TEXT, ABNF.OPCODE_BINARY]:
+            self.websocket_options.wire_bytes += len(frame.data)
+
+            if self.compressed:
+                self.compressed = False
+                frame.data = self.decompressor.decompress(frame.data + DEFLATE_TAIL)
+
+                if self.no_context_takeover:
+                    self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+            self.websocket_options.payload_bytes += len(frame.data)
+
+        return (opcode, frame)
 
 
 def get_data_url(deployment_name,
@@ -105,11 +354,13 @@ def get_import_data_url(deployment_name,
 def get_data_url_for_job(job_id,
                          deployment_name,
                          token_manager=None,
-                         app_url=defaults.APP_URL):
+                         app_url=defaults.APP_URL,
+                         data_urls=None):
     data_url = None
     jobs = get_jobs(deployment_name,
                     token_manager=token_manager,
-                    app_url=app_url)
+                    app_url=app_url,
+                    data_urls=data_urls)
 
     for job in jobs:
         if job['id'] == job_id:
@@ -121,18 +372,45 @@ def get_data_url_for_job(job_id,
 
     return data_url
 
-def __wss_connect(data_url,
-                  token_manager,
-                  job_id=None):
+def _wss_open(data_url, websocket_options=None):
     """
-    Establish the websocket connection to the data engine. When job_id is
-    provided we're basically establishing a websocket to an existing
-    program that was already started using the jobs API
+    internal method to open the websocket to the data engine at data_url
 
-    job_id: job id of a running program
     """
-    url = '%s/api/v1/juttle/channel' % data_url.replace('https://', 'wss://')
+    if websocket_options == None:
+        websocket_options = DEFAULT_WEBSOCKET_OPTIONS
 
+    # plain http data urls (ie local test servers) get an unencrypted websocket
+    url = '%s/api/v1/juttle/channel' % data_url.replace('https://', 'wss://') \
+                                               .replace('http://', 'ws://')
+
+    if is_debug_enabled():
+        debug("connecting to %s", url)
+
+    if websocket_options.compression and DEFLATE_SUPPORTED:
+        websocket = _DeflateWebSocket(websocket_options)
+
+    else:
+        if websocket_options.compression:
+            debug('compression is not supported with this websocket-client')
+
+        websocket = WebSocket(sockopt=websocket_options.get_sockopt())
+
+    websocket.settimeout(websocket_options.connect_timeout)
+    websocket.connect(url)
+    websocket.settimeout(websocket_options.read_timeout)
+    return websocket
+
+
+def _wss_authenticate(websocket,
+                      token_manager,
+                      job_id=None,
+                      resume_after=None):
+    """
+    internal method to send the access token, and the job to connect to, on
+    a newly opened websocket
+
+    """
     token_obj = {
         "accessToken": token_manager.get_access_token()
     }
@@ -140,29 +418,249 @@ def __wss_connect(data_url,
     if job_id != None:
         token_obj['job_id'] = job_id
 
+    if resume_after != None:
+        token_obj['resume_after'] = resume_after
+
     if is_debug_enabled():
-        debug("connecting to %s", url)
+        debug("sent %s", codec.dumps(token_obj))
 
-    websocket = create_connection(url)
-    websocket.settimeout(10)
+    websocket.send(codec.dumps(token_obj))
 
-    if is_debug_enabled():
-        debug("sent %s", json.dumps(token_obj))
 
-    websocket.send(json.dumps(token_obj))
+def _wss_connect(data_url,
+                 token_manager,
+                 job_id=None,
+                 resume_after=None,
+                 websocket_options=None):
+    """
+    Establish the websocket connection to the data engine. When job_id is
+    provided we're basically establishing a websocket to an existing
+    program that was already started using the jobs API
+
+    job_id: job id of a running program
+    resume_after: sequence number of the last payload received from the job
+                  so a data engine numbering its payloads (with 'seq')
+                  resumes right after it
+    websocket_options: WebsocketOptions of the websocket, by default
+                       DEFAULT_WEBSOCKET_OPTIONS
+    """
+    websocket = _wss_open(data_url, websocket_options=websocket_options)
+    _wss_authenticate(websocket,
+                      token_manager,
+                      job_id=job_id,
+                      resume_after=resume_after)
     return websocket
 
 
+def _close_quietly(websocket):
+    try:
+        websocket.close()
+
+    except Exception:
+        pass
+
+
+def _race_connect(data_urls,
+                  token_manager,
+                  job_id=None,
+                  resume_after=None,
+                  websocket_options=None):
+    """
+    internal method to open websockets to all of the data urls at once and
+    connect to the job over the first one to open, the others being closed
+    without ever receiving anything
+
+    """
+    if len(data_urls) == 1:
+        return _wss_connect(data_urls[0],
+                            token_manager,
+                            job_id=job_id,
+                            resume_after=resume_after,
+                            websocket_options=websocket_options)
+
+    results = Queue.Queue()
+
+    def open_websocket(data_url):
+        try:
+            results.put((_wss_open(data_url,
+                                   websocket_options=websocket_options), None))
+
+        except Exception as exception:
+            results.put((None, exception))
+
+    for data_url in data_urls:
+        thread = threading.Thread(target=open_websocket, args=(data_url,))
+        thread.daemon = True
+        thread.start()
+
+    websocket = None
+    failure = None
+    remaining = len(data_urls)
+
+    while websocket == None and remaining > 0:
+        (websocket, exception) = results.get()
+        remaining -= 1
+
+        if exception != None:
+            failure = exception
+
+    def close_losers(remaining):
+        for _ in range(0, remaining):
+            (loser, _) = results.get()
+
+            if loser != None:
+                _close_quietly(loser)
+
+    if remaining > 0:
+        thread = threading.Thread(target=close_losers, args=(remaining,))
+        thread.daemon = True
+        thread.start()
+
+    if websocket == None:
+        raise failure
+
+    _wss_authenticate(websocket,
+                      token_manager,
+                      job_id=job_id,
+                      resume_after=resume_after)
+    return websocket
+
+
+def _reconnect(data_urls,
+               token_manager,
+               job_id,
+               resume_after=None,
+               websocket_options=None):
+    """
+    internal method to reconnect to a job, racing all of the data urls on
+    every attempt and backing off exponentially (with jitter) between
+    attempts for up to RECONNECT_BUDGET seconds
+
+    """
+    if websocket_options == None:
+        websocket_options = DEFAULT_WEBSOCKET_OPTIONS
+
+    websocket_options.reconnects += 1
+
+    deadline = time.time() + RECONNECT_BUDGET
+    attempt = 0
+
+    while True:
+        try:
+            return _race_connect(data_urls,
+                                 token_manager,
+                                 job_id=job_id,
+                                 resume_after=resume_after,
+                                 websocket_options=websocket_options)
+
+        except (IOError, WebSocketException) as exception:
+            if is_debug_enabled():
+                traceback.print_exc()
+
+            delay = random.uniform(0, min(RECONNECT_MAX_DELAY,
+                                          RECONNECT_BASE_DELAY * 2 ** attempt))
+            attempt += 1
+
+            if time.time() + delay > deadline:
+                raise JutException('Unable to reconnect to job "%s": %s' %
+                                   (job_id, exception))
+
+            debug('network error reconnecting to job %s, attempt %s failed, '
+                  'retrying in %.1fs' % (job_id, attempt, delay))
+            time.sleep(delay)
+
+
+def _debug_payload(payload):
+    """
+    internal method to print out the payload received without the points
+    since there could be a lot of them
+
+    """
+    if 'points' in payload:
+        payload = dict(payload)
+        payload['points'] = 'NOT SHOWN'
+
+    debug('received %s' % codec.dumps(payload))
+
+
+def _refresh_access_token(websocket, token_manager):
+    """
+    internal method to send a fresh access token over the websocket when the
+    current one has expired
+
+    """
+    if token_manager.is_access_token_expired():
+        debug('refreshing access token')
+        token_obj = {
+            "accessToken": token_manager.get_access_token()
+        }
+        websocket.send(codec.dumps(token_obj))
+
+
+def _decode_raw_points(data):
+    """
+    internal method to decode a points payload while leaving its points as
+    the raw JSON text of the points array under the 'raw_points' key, which
+    avoids decoding each of the points. Returns None when data isn't a
+    points payload that can be split this way.
+
+    """
+    start = data.find('"points":')
+    end = data.rfind(']')
+
+    if start == -1 or end < start:
+        return None
+
+    raw_points = data[start + len('"points":'):end + 1].lstrip()
+
+    if not raw_points.startswith('['):
+        return None
+
+    # the last ']' only closes the points array when no key holding an array
+    # (or a string with a ']') follows it, in which case the points array
+    # is followed by a ',' right after its own ']'. Without scanning the
+    # points (which costs as much as decoding them) we can't tell that ','
+    # apart from one after an array within a point, so any of those fall
+    # back to a full decode of the payload
+    if ARRAY_CONTINUED.search(raw_points) != None:
+        return None
+
+    # decode everything else in the payload
+    try:
+        payload = codec.loads(data[:start] + '"points":null' + data[end + 1:])
+
+    except ValueError:
+        return None
+
+    del payload['points']
+    payload['raw_points'] = raw_points
+    return payload
+
+
 def connect_job(job_id,
                 deployment_name,
                 token_manager=None,
                 app_url=defaults.APP_URL,
                 persist=False,
                 websocket=None,
-                data_url=None):
+                data_url=None,
+                raw_points=False,
+                data_urls=None,
+                websocket_options=None):
     """
-    connect to a running Juttle program by job_id
-
+    connect to a running Juttle program by job_id, reconnecting whenever
+    the connection drops (see _reconnect). When the data engine numbers its
+    payloads (with 'seq') the job resumes right after the last payload
+    received, otherwise it picks up wherever the job is at.
+
+    raw_points: when set to True the points payloads carry the undecoded
+                JSON array of points under the 'raw_points' key instead of
+                the decoded 'points'
+    data_urls: all of the urls the data engine running the job can be
+               reached at, which are raced when reconnecting, by default
+               only data_url
+    websocket_options: WebsocketOptions of the websockets to the job, which
+                       also count the reconnects
     """
 
     if data_url == None:
@@ -172,13 +670,19 @@ def connect_job(job_id,
                                         app_url=app_url)
 
     if websocket == None:
-        websocket = __wss_connect(data_url,
-                                  token_manager,
-                                  job_id=job_id)
+        websocket = _wss_connect(data_url,
+                                 token_manager,
+                                 job_id=job_id,
+                                 websocket_options=websocket_options)
+
+    if data_urls == None:
+        data_urls = [data_url]
+
+    debug_enabled = is_debug_enabled()
 
-    pong = json.dumps({
-        'pong': True
-    })
+    # sequence number of the last payload received, when the data engine
+    # numbers them, to resume from when reconnecting
+    last_seq = None
 
     if not persist:
         job_finished = False
@@ -187,75 +691,61 @@ def connect_job(job_id,
             try:
                 data = websocket.recv()
 
-                if data:
-                    payload = json.loads(data)
+                if not data:
+                    debug('payload was "%s", forcing websocket reconnect' % data)
+                    raise IOError()
 
-                    if is_debug_enabled():
-                        printable_payload = dict(payload)
-                        if 'points' in payload:
-                            # don't want to print out all the outputs when in
-                            # debug mode
-                            del printable_payload['points']
-                            printable_payload['points'] = 'NOT SHOWN'
+                if raw_points:
+                    payload = _decode_raw_points(data)
 
-                        debug('received %s' % json.dumps(printable_payload))
+                    if payload != None:
+                        last_seq = payload.get('seq', last_seq)
+                        yield payload
+                        continue
 
-                    if 'ping' in payload.keys():
-                        # ping/pong (ie heartbeat) mechanism
-                        websocket.send(pong)
+                payload = codec.loads(data)
+                last_seq = payload.get('seq', last_seq)
 
-                        if is_debug_enabled():
-                            debug('sent %s' % json.dumps(pong))
+                if debug_enabled:
+                    _debug_payload(payload)
 
-                    if 'job_end' in payload.keys() and payload['job_end'] == True:
-                        job_finished = True
+                # points are by far the most common payload so they go
+                # straight through without any further inspection
+                if 'points' not in payload:
+                    if 'ping' in payload:
+                        # ping/pong (ie heartbeat) mechanism
+                        websocket.send(PONG)
 
-                    if token_manager.is_access_token_expired():
-                        debug('refreshing access token')
-                        token_obj = {
-                            "accessToken": token_manager.get_access_token()
-                        }
-                        # refresh authentication token
-                        websocket.send(json.dumps(token_obj))
+                        if debug_enabled:
+                            debug('sent %s' % PONG)
 
-                    if 'error' in payload:
-                        if payload['error'] == 'NONEXISTENT-JOB':
-                            raise JutException('Job "%s" no longer running' % job_id)
+                        # the heartbeats arrive every few seconds which is
+                        # a cheap timer to check on the access token
+                        _refresh_access_token(websocket, token_manager)
 
-                    # return all channel messages
-                    yield payload
+                    elif payload.get('job_end') == True:
+                        job_finished = True
 
-                else:
-                    debug('payload was "%s", forcing websocket reconnect' % data)
-                    raise IOError()
+                    elif payload.get('error') == 'NONEXISTENT-JOB':
+                        raise JutException('Job "%s" no longer running' % job_id)
+
+                # return all channel messages
+                yield payload
 
-            except IOError:
+            except (IOError, WebSocketException):
                 if is_debug_enabled():
                     traceback.print_exc()
-                #
-                # We'll retry for just under 30s since internally we stop
-                # running non persistent programs after 30s of not heartbeating
-                # with the client
-                #
-                retry = 1
-                while retry <= 5:
-                    try:
-                        debug('network error reconnecting to job %s, '
-                              'try %s of 5' % (job_id, retry))
-                        websocket = __wss_connect(data_url, token_manager, job_id=job_id)
-                        break
-
-                    except socket.error:
-
-                        if is_debug_enabled():
-                            traceback.print_exc()
-
-                        retry += 1
-                        time.sleep(5)
-
-                debug('network error reconnecting to job %s, '
-                      'try %s of 5' % (job_id, retry))
-                websocket = __wss_connect(data_url, token_manager, job_id=job_id)
+
+                # the dropped websocket is still open on our end
+                _close_quietly(websocket)
+
+                debug('network error reconnecting to job %s' % job_id)
+
+                websocket = _reconnect(data_urls,
+                                       token_manager,
+                                       job_id,
+                                       resume_after=last_seq,
+                                       websocket_options=websocket_options)
 
     websocket.close()
 
@@ -265,7 +755,10 @@ def run(juttle,
         program_name=None,
         persist=False,
         token_manager=None,
-        app_url=defaults.APP_URL):
+        app_url=defaults.APP_URL,
+        raw_points=False,
+        data_url=None,
+        websocket_options=None):
     """
     run a juttle program through the juttle streaming API and return the
     various events that are part of running a Juttle program which include:
@@ -340,20 +833,33 @@ def run(juttle,
              therefore becomes a persistent job.
     token_manager: auth.TokenManager object
     app_url: optional argument used primarily for internal Jut testing
+    raw_points: when set to True the points are not decoded and instead
+                each points payload carries the raw JSON array of points:
+                {
+                  "raw_points": "[ array of points ]",
+                  "sink": sink_id
+                }
+    data_url: juttle data url to run the program on, which is looked up
+              from the deployment when not provided
+    websocket_options: WebsocketOptions of the websocket the program runs
+                       on, by default DEFAULT_WEBSOCKET_OPTIONS
     """
     headers = token_manager.get_access_token_headers()
 
-    data_url = get_juttle_data_url(deployment_name,
-                                   app_url=app_url,
-                                   token_manager=token_manager)
+    if data_url == None:
+        data_url = get_juttle_data_url(deployment_name,
+                                       app_url=app_url,
+                                       token_manager=token_manager)
 
-    websocket = __wss_connect(data_url, token_manager)
+    websocket = _wss_connect(data_url,
+                             token_manager,
+                             websocket_options=websocket_options)
 
     data = websocket.recv()
-    channel_id_obj = json.loads(data)
+    channel_id_obj = codec.loads(data)
 
     if is_debug_enabled():
-        debug('got channel response %s', json.dumps(channel_id_obj))
+        debug('got channel response %s', codec.dumps(channel_id_obj))
 
     channel_id = channel_id_obj['channel_id']
     juttle_job = {
@@ -362,11 +868,13 @@ def run(juttle,
         'program': juttle
     }
 
-    response = requests.post('%s/api/v1/jobs' % data_url,
-                             data=json.dumps(juttle_job),
-                             headers=headers)
+    response = SESSION.post('%s/api/v1/jobs' % data_url,
+                            data=codec.dumps(juttle_job),
+                            headers=headers)
 
     if response.status_code != 200:
+        websocket.close()
+
         yield {
             "error": True,
             "context": response.json()
@@ -380,7 +888,7 @@ def run(juttle,
     job_id = job_info['job']['id']
 
     if is_debug_enabled():
-        debug('started job %s', json.dumps(job_info))
+        debug('started job %s', codec.dumps(job_info))
 
     for data in connect_job(job_id,
                             deployment_name,
@@ -388,27 +896,33 @@ def run(juttle,
                             app_url=app_url,
                             persist=persist,
                             websocket=websocket,
-                            data_url=data_url):
+                            data_url=data_url,
+                            raw_points=raw_points,
+                            websocket_options=websocket_options):
         yield data
 
 
 def get_jobs(deployment_name,
              token_manager=None,
-             app_url=defaults.APP_URL):
+             app_url=defaults.APP_URL,
+             data_urls=None):
     """
-    return list of currently running jobs
+    return list of currently running jobs, across all of the data_urls
+    provided or all of the juttle data urls of the deployment
 
     """
     headers = token_manager.get_access_token_headers()
-    data_urls = get_data_urls(deployment_name,
-                              app_url=app_url,
-                              token_manager=token_manager)
+
+    if data_urls == None:
+        data_urls = get_data_urls(deployment_name,
+                                  app_url=app_url,
+                                  token_manager=token_manager)
 
     jobs = []
 
     for data_url in data_urls:
         url = '%s/api/v1/jobs' % data_url
-        response = requests.get(url, headers=headers)
+        response = SESSION.get(url, headers=headers)
 
         if response.status_code == 200:
             # saving the data_url for the specific job so you know where to
@@ -428,7 +942,8 @@ def get_jobs(deployment_name,
 def get_job_details(job_id,
                     deployment_name,
                     token_manager=None,
-                    app_url=defaults.APP_URL):
+                    app_url=defaults.APP_URL,
+                    data_urls=None):
     """
     return job details for a specific job id
 
@@ -436,7 +951,8 @@ def get_job_details(job_id,
 
     jobs = get_jobs(deployment_name,
                     token_manager=token_manager,
-                    app_url=app_url)
+                    app_url=app_url,
+                    data_urls=data_urls)
 
     for job in jobs:
         if job['id'] == job_id:
@@ -448,21 +964,334 @@ def get_job_details(job_id,
 def delete_job(job_id,
                deployment_name,
                token_manager=None,
-               app_url=defaults.APP_URL):
+               app_url=defaults.APP_URL,
+               data_url=None):
     """
     delete a job with a specific job id
 
     """
     headers = token_manager.get_access_token_headers()
-    data_url = get_data_url_for_job(job_id,
-                                    deployment_name,
-                                    token_manager=token_manager,
-                                    app_url=app_url)
+
+    if data_url == None:
+        data_url = get_data_url_for_job(job_id,
+                                        deployment_name,
+                                        token_manager=token_manager,
+                                        app_url=app_url)
 
     url = '%s/api/v1/jobs/%s' % (data_url, job_id)
-    response = requests.delete(url, headers=headers)
+    response = SESSION.delete(url, headers=headers)
+
+    if response.status_code != 200:
+        raise JutException('Error %s: %s' % (response.status_code, response.text))
+
+
+class JobStream(object):
+    """
+    stream of the payloads produced by a single running job which, unlike
+    connect_job, never blocks waiting on the job and can therefore be driven
+    along with hundreds of other job streams from a single select loop (see
+    poll_jobs).
+
+    """
+
+    def __init__(self,
+                 job_id,
+                 data_url,
+                 token_manager,
+                 websocket=None,
+                 job_info=None,
+                 websocket_options=None):
+        if websocket_options == None:
+            websocket_options = DEFAULT_WEBSOCKET_OPTIONS
+
+        self.job_id = job_id
+        self.data_url = data_url
+        self.token_manager = token_manager
+        self.websocket_options = websocket_options
+        self.websocket = websocket
+        self.job_info = job_info
+        self.finished = False
+
+        # sequence number of the last payload read, see connect_job
+        self.last_seq = None
+
+        # time since which a partially received frame has been waiting on
+        # the rest of it
+        self.stalled_since = None
+
+        if self.websocket == None:
+            self.connect()
+
+    def connect(self):
+        """
+        (re)establish the websocket connection to the running job
+
+        """
+        self.websocket = _wss_connect(self.data_url,
+                                      self.token_manager,
+                                      job_id=self.job_id,
+                                      resume_after=self.last_seq,
+                                      websocket_options=self.websocket_options)
+        self.stalled_since = None
+
+    def reconnect(self):
+        """
+        reconnect to the job once its connection dropped or stalled, backing
+        off like connect_job does (see _reconnect) and returning None. When
+        that gives up the stream is closed and an error payload returned for
+        it, so the other streams polled along with it keep going.
+
+        """
+        debug('network error reconnecting to job %s' % self.job_id)
+
+        # a stalled connection is dropped without the closing handshake,
+        # which would wait on the rest of the stalled frame
+        self.websocket.shutdown()
+        self.stalled_since = None
+
+        try:
+            self.websocket = _reconnect([self.data_url],
+                                        self.token_manager,
+                                        self.job_id,
+                                        resume_after=self.last_seq,
+                                        websocket_options=self.websocket_options)
+
+        except JutException as exception:
+            self.close()
+
+            return {
+                'error': True,
+                'context': {
+                    'message': str(exception),
+                    'info': {}
+                }
+            }
+
+        return None
+
+    def fileno(self):
+        """
+        file descriptor of the underlying websocket, for use with select
+
+        """
+        return self.websocket.fileno()
+
+    def pending(self):
+        """
+        returns True when there is already data buffered locally (ie by the
+        SSL layer) which select won't report on the file descriptor
+
+        """
+        sock = self.websocket.sock
+        return hasattr(sock, 'pending') and sock.pending() > 0
+
+    def get_deadline(self):
+        """
+        returns the time by which the rest of a partially received frame has
+        to arrive before the connection is considered lost, None when there
+        is no partial frame or no read timeout
+
+        """
+        if self.stalled_since == None or \
+           self.websocket_options.read_timeout == None:
+            return None
+
+        return self.stalled_since + self.websocket_options.read_timeout
+
+    def is_stalled(self):
+        """
+        returns True when a partially received frame is past its deadline
+        (see get_deadline)
+
+        """
+        deadline = self.get_deadline()
+        return deadline != None and time.time() >= deadline
+
+    def read(self):
+        """
+        read and return the next payload from the job, heartbeats, token
+        refreshes and frames which haven't been received in full yet are
+        handled internally in which case None is returned.
+
+        Only call this once the stream is ready for reading, otherwise it
+        waits up to READ_POLL_TIMEOUT for the next websocket frame.
+
+        """
+        self.websocket.settimeout(READ_POLL_TIMEOUT)
+
+        try:
+            data = self.websocket.recv()
+
+            if not data:
+                raise IOError('websocket closed')
+
+        except WebSocketTimeoutException:
+            # the frame is only partially received, the rest of it being
+            # read once the stream is ready again (see poll_jobs)
+            self.websocket.settimeout(self.websocket_options.read_timeout)
+            self.stalled_since = time.time()
+            return None
+
+        except (IOError, WebSocketException):
+            if is_debug_enabled():
+                traceback.print_exc()
+
+            return self.reconnect()
+
+        self.websocket.settimeout(self.websocket_options.read_timeout)
+        self.stalled_since = None
+
+        payload = codec.loads(data)
+        self.last_seq = payload.get('seq', self.last_seq)
+
+        if 'points' not in payload:
+            if 'ping' in payload:
+                self.websocket.send(PONG)
+                _refresh_access_token(self.websocket, self.token_manager)
+                return None
+
+            elif payload.get('job_end') == True:
+                self.close()
+
+            elif payload.get('error') == 'NONEXISTENT-JOB':
+                # the error payload is still returned so the caller can
+                # report on the job no longer running
+                self.close()
+
+        return payload
+
+    def close(self):
+        """
+        close the websocket and mark this stream as finished
+
+        """
+        self.finished = True
+        _close_quietly(self.websocket)
+
+
+def open_job_stream(job_id,
+                    deployment_name,
+                    token_manager=None,
+                    app_url=defaults.APP_URL,
+                    data_url=None,
+                    websocket_options=None):
+    """
+    open a JobStream to a job that is already running. Pass the data_url
+    (available as job['data_url'] from get_jobs) when opening many streams
+    to avoid looking up the running jobs for each stream.
+
+    """
+    if data_url == None:
+        data_url = get_data_url_for_job(job_id,
+                                        deployment_name,
+                                        token_manager=token_manager,
+                                        app_url=app_url)
+
+    return JobStream(job_id,
+                     data_url,
+                     token_manager,
+                     websocket_options=websocket_options)
+
+
+def start_job_stream(juttle,
+                     deployment_name,
+                     program_name=None,
+                     token_manager=None,
+                     app_url=defaults.APP_URL,
+                     data_url=None,
+                     websocket_options=None):
+    """
+    start running the juttle program provided and return a JobStream for
+    its output, with the job details (see run) available as job_info on the
+    returned stream.
+
+    """
+    headers = token_manager.get_access_token_headers()
+
+    if data_url == None:
+        data_url = get_juttle_data_url(deployment_name,
+                                       app_url=app_url,
+                                       token_manager=token_manager)
+
+    websocket = _wss_connect(data_url,
+                             token_manager,
+                             websocket_options=websocket_options)
+    channel_id = codec.loads(websocket.recv())['channel_id']
+
+    juttle_job = {
+        'channel_id': channel_id,
+        'alias': program_name,
+        'program': juttle
+    }
+
+    response = SESSION.post('%s/api/v1/jobs' % data_url,
+                            data=codec.dumps(juttle_job),
+                            headers=headers)
 
     if response.status_code != 200:
+        websocket.close()
         raise JutException('Error %s: %s' % (response.status_code, response.text))
 
+    job_info = response.json()
+
+    return JobStream(job_info['job']['id'],
+                     data_url,
+                     token_manager,
+                     websocket=websocket,
+                     job_info=job_info,
+                     websocket_options=websocket_options)
+
+
+def poll_jobs(streams, timeout=None):
+    """
+    multiplex many JobStream objects from a single thread, yielding a tuple
+    of (stream, payload) for every payload received on any of the streams
+    until all of them have finished.
+
+    timeout: maximum number of seconds to wait for any stream to become
+             ready, when it expires (None, None) is yielded so the caller
+             can do other work before resuming the iteration
+
+    Streams are only read from once they're ready, so a stream stuck on a
+    partially received frame holds up none of the others and is reconnected
+    to when the rest of the frame doesn't arrive within its read timeout.
+    """
+    streams = list(streams)
+
+    while True:
+        streams = [stream for stream in streams if not stream.finished]
+
+        if len(streams) == 0:
+            return
+
+        ready = [stream for stream in streams if stream.pending()]
+
+        if len(ready) == 0:
+            wait = timeout
+            deadlines = [stream.get_deadline() for stream in streams
+                         if stream.get_deadline() != None]
+
+            if len(deadlines) > 0:
+                until_deadline = max(0, min(deadlines) - time.time())
+
+                if wait == None or until_deadline < wait:
+                    wait = until_deadline
+
+            ready, _, _ = select.select(streams, [], [], wait)
+
+            if len(ready) == 0 and wait == timeout:
+                yield (None, None)
+                continue
+
+        for stream in streams:
+            if stream in ready:
+                payload = stream.read()
+
+            elif stream.is_stalled():
+                payload = stream.reconnect()
+
+            else:
+                continue
 
+            if payload != None:
+                yield (stream, payload)
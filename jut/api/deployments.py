@@ -4,11 +4,11 @@ deployments API
 """
 
 import json
-import requests
 
 from jut import defaults
 
 from jut.api import accounts, environment
+from jut.api.session import SESSION
 from jut.exceptions import JutException
 
 ## deployments
@@ -28,9 +28,9 @@ def create_deployment(deployment_name,
     }
 
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.post('%s/api/v1/deployments' % deployment_url,
-                             data=json.dumps(payload),
-                             headers=headers)
+    response = SESSION.post('%s/api/v1/deployments' % deployment_url,
+                            data=json.dumps(payload),
+                            headers=headers)
 
     if response.status_code == 201:
         return response.json()
@@ -48,8 +48,8 @@ def get_deployments(token_manager=None,
     """
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.get('%s/api/v1/deployments' % deployment_url,
-                            headers=headers)
+    response = SESSION.get('%s/api/v1/deployments' % deployment_url,
+                           headers=headers)
 
     if response.status_code == 200:
         return response.json()
@@ -67,8 +67,8 @@ def get_deployment_id(deployment_name,
 
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.get('%s/api/v1/deployments' % deployment_url,
-                            headers=headers)
+    response = SESSION.get('%s/api/v1/deployments' % deployment_url,
+                           headers=headers)
 
     if response.status_code == 200:
         deployments = response.json()
@@ -96,9 +96,9 @@ def get_deployment_details(deployment_name,
 
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.get('%s/api/v1/deployments/%s' %
-                            (deployment_url, deployment_id),
-                            headers=headers)
+    response = SESSION.get('%s/api/v1/deployments/%s' %
+                           (deployment_url, deployment_id),
+                           headers=headers)
 
     if response.status_code == 200:
         return response.json()
@@ -115,9 +115,9 @@ def get_apikey(deployment_name,
 
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.get('%s/api/v1/deployments/%s/apikey' %
-                            (deployment_url, deployment_id),
-                            headers=headers)
+    response = SESSION.get('%s/api/v1/deployments/%s/apikey' %
+                           (deployment_url, deployment_id),
+                           headers=headers)
 
     if response.status_code == 200:
         return response.json()['apikey']
@@ -140,9 +140,9 @@ def get_spaces(deployment_name,
 
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.get('%s/api/v1/deployments/%s/spaces' %
-                            (deployment_url, deployment_id),
-                            headers=headers)
+    response = SESSION.get('%s/api/v1/deployments/%s/spaces' %
+                           (deployment_url, deployment_id),
+                           headers=headers)
 
     if response.status_code == 200:
         return response.json()
@@ -195,10 +195,10 @@ def create_space(deployment_name,
 
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.post('%s/api/v1/deployments/%s/spaces' %
-                             (deployment_url, deployment_id),
-                             data=json.dumps(payload),
-                             headers=headers)
+    response = SESSION.post('%s/api/v1/deployments/%s/spaces' %
+                            (deployment_url, deployment_id),
+                            data=json.dumps(payload),
+                            headers=headers)
 
     if response.status_code == 201:
         return response.json()
@@ -222,9 +222,9 @@ def delete_space(deployment_name,
 
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.delete('%s/api/v1/deployments/%s/spaces/%s' %
-                               (deployment_url, deployment_id, space_id),
-                               headers=headers)
+    response = SESSION.delete('%s/api/v1/deployments/%s/spaces/%s' %
+                              (deployment_url, deployment_id, space_id),
+                              headers=headers)
 
     if response.status_code == 204:
         return response.text
@@ -263,9 +263,9 @@ def get_users(deployment_name,
 
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.get('%s/api/v1/deployments/%s/accounts' %
-                            (deployment_url, deployment_id),
-                            headers=headers)
+    response = SESSION.get('%s/api/v1/deployments/%s/accounts' %
+                           (deployment_url, deployment_id),
+                           headers=headers)
 
     if response.status_code == 200:
         return response.json()
@@ -291,9 +291,9 @@ def add_user(username,
 
     headers = token_manager.get_access_token_headers()
     deployment_url = environment.get_deployment_url(app_url=app_url)
-    response = requests.put('%s/api/v1/deployments/%s/accounts/%s' %
-                            (deployment_url, deployment_id, account_id),
-                            headers=headers)
+    response = SESSION.put('%s/api/v1/deployments/%s/accounts/%s' %
+                           (deployment_url, deployment_id, account_id),
+                           headers=headers)
 
     if response.status_code == 204:
         return response.text
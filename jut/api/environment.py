@@ -5,9 +5,9 @@ NOT OFFICIAL API - "here be dragons"
 """
 
 import memoized
-import requests
 
 from jut import defaults
+from jut.api.session import SESSION
 from jut.exceptions import JutException
 
 @memoized.memoized
@@ -17,7 +17,7 @@ def get_details(app_url=defaults.APP_URL):
 
     """
     url = '%s/environment' % app_url
-    response = requests.get(url)
+    response = SESSION.get(url)
 
     if response.status_code == 200:
         return response.json()
@@ -5,11 +5,11 @@ EXPERIMENTAL API - "here be dragons"
 """
 
 import json
-import requests
 
 from jut import defaults
 
 from jut.api import accounts, data_engine
+from jut.api.session import SESSION
 from jut.exceptions import JutException
 from jut.util import dates
 
@@ -17,19 +17,21 @@ from jut.util import dates
 def get_programs(deployment_name,
                  created_by=None,
                  token_manager=None,
-                 app_url=defaults.APP_URL):
+                 app_url=defaults.APP_URL,
+                 data_url=None):
     """
 
     """
     headers = token_manager.get_access_token_headers()
 
-    data_url = data_engine.get_juttle_data_url(deployment_name,
-                                               token_manager=token_manager,
-                                               app_url=app_url)
+    if data_url == None:
+        data_url = data_engine.get_juttle_data_url(deployment_name,
+                                                   token_manager=token_manager,
+                                                   app_url=app_url)
 
     url = "%s/api/v1/app/programs" % data_url
 
-    response = requests.get(url, headers=headers)
+    response = SESSION.get(url, headers=headers)
 
     if response.status_code != 200:
         raise JutException('Error %s: %s' % (response.status_code, response.text))
@@ -52,11 +54,13 @@ def get_programs(deployment_name,
 def program_exists(program_name,
                    deployment_name,
                    token_manager=None,
-                   app_url=defaults.APP_URL):
+                   app_url=defaults.APP_URL,
+                   data_url=None):
 
     programs = get_programs(deployment_name,
                             token_manager=token_manager,
-                            app_url=app_url)
+                            app_url=app_url,
+                            data_url=data_url)
 
     for program in programs:
         if program['alias'] == program:
@@ -68,11 +72,13 @@ def program_exists(program_name,
 def get_program(program_name,
                 deployment_name,
                 token_manager=None,
-                app_url=defaults.APP_URL):
+                app_url=defaults.APP_URL,
+                data_url=None):
 
     programs = get_programs(deployment_name,
                             token_manager=token_manager,
-                            app_url=app_url)
+                            app_url=app_url,
+                            data_url=data_url)
 
     for program in programs:
         if program['name'] == program_name:
@@ -86,20 +92,25 @@ def update_program(program_name,
                    deployment_name,
                    last_edited=None,
                    token_manager=None,
-                   app_url=defaults.APP_URL):
+                   app_url=defaults.APP_URL,
+                   data_url=None,
+                   account_id=None):
     headers = token_manager.get_access_token_headers()
 
-    data_url = data_engine.get_juttle_data_url(deployment_name,
-                                               token_manager=token_manager,
-                                               app_url=app_url)
-
-    account_id = accounts.get_logged_in_account_id(token_manager=token_manager,
+    if data_url == None:
+        data_url = data_engine.get_juttle_data_url(deployment_name,
+                                                   token_manager=token_manager,
                                                    app_url=app_url)
 
+    if account_id == None:
+        account_id = accounts.get_logged_in_account_id(token_manager=token_manager,
+                                                       app_url=app_url)
+
     program_id = get_program(program_name,
                              deployment_name,
                              token_manager=token_manager,
-                             app_url=app_url)['id']
+                             app_url=app_url,
+                             data_url=data_url)['id']
 
     if last_edited == None:
         last_edited = dates.now_iso8601()
@@ -116,9 +127,9 @@ def update_program(program_name,
 
     url = "%s/api/v1/app/programs" % data_url
 
-    response = requests.put(url,
-                            headers=headers,
-                            data=json.dumps(program))
+    response = SESSION.put(url,
+                           headers=headers,
+                           data=json.dumps(program))
 
     if response.status_code != 204:
         raise JutException('Error %s: %s' % (response.status_code, response.text))
@@ -131,17 +142,21 @@ def save_program(program_name,
                  deployment_name,
                  last_edited=None,
                  token_manager=None,
-                 app_url=defaults.APP_URL):
+                 app_url=defaults.APP_URL,
+                 data_url=None,
+                 account_id=None):
 
     headers = token_manager.get_access_token_headers()
 
-    data_url = data_engine.get_juttle_data_url(deployment_name,
-                                               token_manager=token_manager,
-                                               app_url=app_url)
-
-    account_id = accounts.get_logged_in_account_id(token_manager=token_manager,
+    if data_url == None:
+        data_url = data_engine.get_juttle_data_url(deployment_name,
+                                                   token_manager=token_manager,
                                                    app_url=app_url)
 
+    if account_id == None:
+        account_id = accounts.get_logged_in_account_id(token_manager=token_manager,
+                                                       app_url=app_url)
+
     if last_edited == None:
         last_edited = dates.now_iso8601()
 
@@ -155,9 +170,9 @@ def save_program(program_name,
 
     url = "%s/api/v1/app/programs" % data_url
 
-    response = requests.post(url,
-                             headers=headers,
-                             data=json.dumps(program))
+    response = SESSION.post(url,
+                            headers=headers,
+                            data=json.dumps(program))
 
     if response.status_code != 201:
         raise JutException('Error %s: %s' % (response.status_code, response.text))
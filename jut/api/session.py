@@ -0,0 +1,50 @@
+"""
+shared HTTP session used by all of the jut APIs
+
+"""
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+# number of distinct hosts to keep connection pools for
+POOL_CONNECTIONS = 10
+
+# number of connections kept alive per host, which is also the number of
+# concurrent requests to the same host that can reuse a connection
+POOL_MAXSIZE = 32
+
+# long lived requests session object to keep HTTP connections alive and
+# shared between all of the API calls
+SESSION = requests.Session()
+
+
+def _mount_adapters(session):
+    session.mount('http://', HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                                         pool_maxsize=POOL_MAXSIZE))
+    session.mount('https://', HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                                          pool_maxsize=POOL_MAXSIZE))
+
+
+def new_session():
+    """
+    return a new session configured like the shared one, for the calls that
+    depend on cookies (ie logging in with a username and password) which
+    must not end up in the shared session
+
+    """
+    session = requests.Session()
+    _mount_adapters(session)
+    return session
+
+
+def reset():
+    """
+    replace the connection pools of the shared session with empty ones, which
+    a forked process has to do before making any requests so it doesn't share
+    the connections of its parent
+
+    """
+    _mount_adapters(SESSION)
+
+reset()
@@ -7,9 +7,7 @@ import argparse
 import sys
 import traceback
 
-from jut import defaults, config
-
-from jut.commands import configs, jobs, programs, run, upload
+from jut import defaults
 
 from jut.common import error, is_debug_enabled
 from jut.exceptions import JutException
@@ -23,6 +21,50 @@ def parse_key_value(string):
     return tuple(string.split('='))
 
 
+def add_websocket_arguments(parser):
+    """
+    internally used method to add the arguments overriding the websocket
+    options of the jut configuration (see data_engine.WebsocketOptions)
+
+    """
+    parser.add_argument('--connect-timeout',
+                        type=float,
+                        default=None,
+                        help='seconds to wait for the websocket to the data '
+                             'engine to open, default: 10')
+
+    parser.add_argument('--read-timeout',
+                        type=float,
+                        default=None,
+                        help='seconds to wait for data from the data engine '
+                             'before reconnecting, default: 10')
+
+    parser.add_argument('--keepalive',
+                        type=int,
+                        default=None,
+                        help='seconds the websocket is idle before sending TCP '
+                             'keepalive probes, 0 to disable, default: 30')
+
+    parser.add_argument('--receive-buffer',
+                        type=int,
+                        default=None,
+                        help='size in bytes of the websocket receive buffer, '
+                             'default: the system default')
+
+    parser.add_argument('--no-tcp-nodelay',
+                        dest='tcp_nodelay',
+                        action='store_false',
+                        default=None,
+                        help='let TCP coalesce the small frames sent to the '
+                             'data engine (Nagle\'s algorithm)')
+
+    parser.add_argument('--compression',
+                        action='store_true',
+                        default=None,
+                        help='ask the data engine to compress the data it '
+                             'sends (permessage-deflate)')
+
+
 def main():
 
     class JutArgParser(argparse.ArgumentParser):
@@ -136,8 +178,17 @@ def main():
     connect_job = jobs_commands.add_parser('connect',
                                            help='connect to a persistent job')
 
-    connect_job.add_argument('job_id',
-                             help='specify the job_id to connect to')
+    connect_job.add_argument('job_ids',
+                             metavar='job_id',
+                             nargs='*',
+                             help='specify the job_id(s) to connect to, when '
+                                  'connecting to multiple jobs each point is '
+                                  'tagged with the job_id it came from')
+
+    connect_job.add_argument('--all',
+                             action='store_true',
+                             default=False,
+                             help='connect to all of the persistent jobs')
 
     connect_job.add_argument('-d', '--deployment',
                              default=None,
@@ -164,10 +215,31 @@ def main():
                              default=10,
                              help='number of seconds to wait between retries.')
 
+    add_websocket_arguments(connect_job)
+
+    connect_job.add_argument('-o', '--output',
+                             default=None,
+                             help='file to write the output to instead of stdout')
+
+    connect_job.add_argument('--row-group-size',
+                             type=int,
+                             default=65536,
+                             help='number of points per record batch (or row group) '
+                                  'with the arrow and parquet formats, '
+                                  'default: 65536')
+
+    connect_job.add_argument('--flush',
+                             default='auto',
+                             choices=['auto', 'line', 'frame', 'size'],
+                             help='when to flush the output: after every line, '
+                                  'after the points of each payload received, or '
+                                  'once enough output is buffered (default: auto '
+                                  'which is line for terminals otherwise size)')
+
     connect_job.add_argument('-f', '--format',
                              default='json',
-                             help='available formats are json, text, csv with '
-                                  'default: json')
+                             help='available formats are json, ndjson, text, '
+                                  'csv, arrow, parquet with default: json')
 
     # programs commands
     programs_parser = commands.add_parser('programs',
@@ -315,6 +387,38 @@ def main():
                                help='space separated field names to rename '
                                     'from the data before uploading.')
 
+    # daemon parser
+    daemon_parser = commands.add_parser('daemon',
+                                        help='local daemon keeping the jut '
+                                             'tools warm for repeated commands')
+
+    daemon_commands = daemon_parser.add_subparsers(dest='daemon_subcommand')
+
+    start_daemon = daemon_commands.add_parser('start',
+                                              help='start the jut daemon, after '
+                                                   'which the run, jobs and '
+                                                   'programs list commands are '
+                                                   'forwarded to it')
+
+    start_daemon.add_argument('--foreground',
+                              action='store_true',
+                              default=False,
+                              help='run the daemon in the foreground instead '
+                                   'of in the background')
+
+    start_daemon.add_argument('--refresh',
+                              type=int,
+                              default=300,
+                              help='number of seconds between refreshing the '
+                                   'cached token and deployment details, '
+                                   'default: 300')
+
+    _ = daemon_commands.add_parser('stop',
+                                   help='stop the jut daemon')
+
+    _ = daemon_commands.add_parser('status',
+                                   help='check if the jut daemon is running')
+
     # run parser
     run_parser = commands.add_parser('run',
                                      help='run juttle program from the import '
@@ -331,8 +435,44 @@ def main():
 
     run_parser.add_argument('-f', '--format',
                             default='json',
-                            help='available formats are json, text, csv with '
-                                 'default: json')
+                            help='available formats are json, ndjson, text, '
+                                 'csv, arrow, parquet with default: json')
+
+    run_parser.add_argument('--raw',
+                            action='store_true',
+                            default=False,
+                            help='write the points out exactly as received '
+                                 'without decoding and re-encoding each '
+                                 'point, which is much faster with the json '
+                                 'format but produces compact JSON')
+
+    run_parser.add_argument('-o', '--output',
+                            default=None,
+                            help='file to write the output to instead of stdout')
+
+    run_parser.add_argument('--row-group-size',
+                            type=int,
+                            default=65536,
+                            help='number of points per record batch (or row group) '
+                                 'with the arrow and parquet formats, '
+                                 'default: 65536')
+
+    run_parser.add_argument('--sink-output',
+                            action='append',
+                            metavar='NAME=FILE',
+                            default=None,
+                            help='write the points of the sinks with the name '
+                                 'provided (ie table=out.csv) to their own '
+                                 'file, in the format implied by the file '
+                                 'extension, can be repeated')
+
+    run_parser.add_argument('--flush',
+                            default='auto',
+                            choices=['auto', 'line', 'frame', 'size'],
+                            help='when to flush the output: after every line, '
+                                 'after the points of each payload received, or '
+                                 'once enough output is buffered (default: auto '
+                                 'which is line for terminals otherwise size)')
 
     run_parser.add_argument('-n', '--name',
                             help='give your program a name to appear in the '
@@ -363,26 +503,75 @@ def main():
                             default=10,
                             help='number of seconds to wait between retries.')
 
+    add_websocket_arguments(run_parser)
+
+    run_parser.add_argument('--buffer-size',
+                            type=int,
+                            default=1000,
+                            help='number of payloads read ahead of the output '
+                                 'by a separate thread which keeps the '
+                                 'connection to the running program alive, '
+                                 '0 to disable, default: 1000')
+
+    run_parser.add_argument('--backpressure',
+                            choices=['block', 'drop', 'spill'],
+                            default='spill',
+                            help='what to do when the output can\'t keep up '
+                                 'and the buffer is full: block reading, drop '
+                                 'points or spill them to disk, default: spill')
+
+    run_parser.add_argument('--memory-watermark',
+                            type=int,
+                            default=64,
+                            help='megabytes of points buffered in memory after '
+                                 'which the buffer is full with --backpressure '
+                                 'spill, default: 64')
+
+    run_parser.add_argument('--spill-directory',
+                            default=None,
+                            help='directory to spill points to with '
+                                 '--backpressure spill, default: the system '
+                                 'temp directory')
+
     options = parser.parse_args()
 
+    if options.subcommand in ['run', 'jobs', 'programs']:
+        from jut import daemon
+
+        # thin client to the jut daemon when it's running (see jut/daemon.py)
+        if daemon.should_forward(options):
+            status = daemon.forward(sys.argv[1:])
+
+            if status != None:
+                sys.exit(status)
+
+    # the command modules (and the likes of requests and websocket they
+    # depend on) are only imported once we know which subcommand is being
+    # run, which keeps `jut --help` and `jut config list` quick to start
     try:
         if options.subcommand == 'config':
             if options.config_subcommand == 'list':
+                from jut import config
                 config.show()
 
             elif options.config_subcommand == 'add':
+                from jut.commands import configs
                 configs.add_configuration(options)
 
             elif options.config_subcommand == 'rm':
+                from jut.commands import configs
                 configs.rm_configuration(options)
 
             elif options.config_subcommand == 'defaults':
+                from jut.commands import configs
                 configs.change_defaults(options)
 
             else:
                 raise Exception('Unexpected config subcommand "%s"' % options.command)
 
         elif options.subcommand == 'jobs':
+            from jut.commands import jobs
+
             if options.jobs_subcommand == 'list':
                 jobs.list(options)
 
@@ -396,6 +585,8 @@ def main():
                 raise Exception('Unexpected jobs subcommand "%s"' % options.command)
 
         elif options.subcommand == 'programs':
+            from jut.commands import programs
+
             if options.programs_subcommand == 'list':
                 programs.list(options)
 
@@ -412,11 +603,28 @@ def main():
                 raise Exception('Unexpected programs subcommand "%s"' % options.command)
 
         elif options.subcommand == 'upload':
+            from jut.commands import upload
             upload.upload_file(options)
 
         elif options.subcommand == 'run':
+            from jut.commands import run
             run.run_juttle(options)
 
+        elif options.subcommand == 'daemon':
+            from jut import daemon
+
+            if options.daemon_subcommand == 'start':
+                daemon.start(options)
+
+            elif options.daemon_subcommand == 'stop':
+                daemon.stop(options)
+
+            elif options.daemon_subcommand == 'status':
+                daemon.status(options)
+
+            else:
+                raise Exception('Unexpected daemon subcommand "%s"' % options.command)
+
         else:
             raise Exception('Unexpected jut command "%s"' % options.command)
 
@@ -0,0 +1,344 @@
+"""
+long lived jut client
+
+"""
+
+import random
+
+from jut import config, defaults
+from jut.api import accounts, auth, data_engine, deployments, integrations, programs
+from jut.exceptions import JutException
+
+# clients returned by get_client by configuration and deployment name
+_CLIENTS = {}
+
+
+class JutClient(object):
+    """
+    jut client bundling the authentication, deployment and data engine
+    endpoints of a single deployment, which are looked up once and then
+    reused by every call made through the client. Use a single client for
+    the lifetime of a service to avoid repeating those lookups on every
+    call:
+
+        client = JutClient.from_config()
+
+        for payload in client.run('emit -limit 10'):
+            ...
+
+    The cached deployment details can be dropped with invalidate(), ie when
+    the data engines of the deployment have changed.
+    """
+
+    def __init__(self,
+                 deployment_name,
+                 username=None,
+                 password=None,
+                 client_id=None,
+                 client_secret=None,
+                 token_manager=None,
+                 app_url=defaults.APP_URL,
+                 websocket_options=None):
+        """
+        deployment_name: name of the deployment all calls are made against
+        token_manager: auth.TokenManager to use instead of creating one from
+                       the username, password or client_id, client_secret
+                       combination provided
+        app_url: optional argument used primarily for internal Jut testing
+        websocket_options: data_engine.WebsocketOptions of the websockets to
+                           the data engines, which also count the reconnects
+                           to jobs made through this client
+        """
+        if token_manager == None:
+            token_manager = auth.TokenManager(username=username,
+                                              password=password,
+                                              client_id=client_id,
+                                              client_secret=client_secret,
+                                              app_url=app_url)
+
+        self.deployment_name = deployment_name
+        self.token_manager = token_manager
+        self.app_url = app_url
+
+        if websocket_options == None:
+            websocket_options = data_engine.WebsocketOptions()
+
+        self.websocket_options = websocket_options
+
+        self.invalidate()
+
+    @classmethod
+    def from_config(cls, configuration=None, deployment_name=None):
+        """
+        create a client from a jut configuration, the default one unless
+        another one is provided, optionally against a different deployment
+        than the configured one
+
+        """
+        if configuration == None:
+            configuration = config.get_default()
+
+        if configuration == None:
+            raise JutException('No default configuration set, please run `jut config defaults`')
+
+        if deployment_name == None:
+            deployment_name = configuration['deployment_name']
+
+        return cls(deployment_name,
+                   client_id=configuration['client_id'],
+                   client_secret=configuration['client_secret'],
+                   app_url=configuration['app_url'],
+                   websocket_options=data_engine.WebsocketOptions.from_config(configuration))
+
+    def invalidate(self):
+        """
+        drop the cached deployment details, endpoints and account id so they
+        are looked up again on the next call needing them
+
+        """
+        self._deployment_details = None
+        self._account_id = None
+        self._webhook_urls = {}
+
+    def get_deployment_details(self):
+        """
+        return the deployment details, including its data engine endpoints
+
+        """
+        if self._deployment_details == None:
+            self._deployment_details = \
+                deployments.get_deployment_details(self.deployment_name,
+                                                   token_manager=self.token_manager,
+                                                   app_url=self.app_url)
+
+        return self._deployment_details
+
+    def get_deployment_id(self):
+        return self.get_deployment_details()['deployment_id']
+
+    def get_data_urls(self, endpoint_type='juttle'):
+        """
+        return all of the data urls for the endpoint_type specified, see
+        data_engine.get_data_url for the supported types
+
+        """
+        data_urls = []
+        for endpoint in self.get_deployment_details()['endpoints']:
+            if endpoint_type in endpoint['type']:
+                data_urls.append(endpoint['uri'])
+
+        if len(data_urls) == 0:
+            raise JutException('No data engine currently configured for '
+                               'deployment "%s"' % self.deployment_name)
+
+        return data_urls
+
+    def get_data_url(self, endpoint_type='juttle'):
+        """
+        return a random data url for the endpoint_type specified, so the
+        jobs started through the client are spread across data engines
+
+        """
+        return random.choice(self.get_data_urls(endpoint_type=endpoint_type))
+
+    def get_account_id(self):
+        """
+        return the account id of the authenticated user
+
+        """
+        if self._account_id == None:
+            self._account_id = accounts.get_logged_in_account_id(token_manager=self.token_manager,
+                                                                 app_url=self.app_url)
+
+        return self._account_id
+
+    def get_webhook_url(self, space='default', data_source='webhook', **fields):
+        """
+        return the webhook URL for posting data to the space provided
+
+        """
+        key = (space, data_source, tuple(sorted(fields.items())))
+
+        if key not in self._webhook_urls:
+            self._webhook_urls[key] = \
+                integrations.get_webhook_url(self.deployment_name,
+                                             space=space,
+                                             data_source=data_source,
+                                             token_manager=self.token_manager,
+                                             app_url=self.app_url,
+                                             **fields)
+
+        return self._webhook_urls[key]
+
+    # jobs
+
+    def run(self, juttle, program_name=None, persist=False, raw_points=False):
+        """
+        run a juttle program, see data_engine.run
+
+        """
+        return data_engine.run(juttle,
+                               self.deployment_name,
+                               program_name=program_name,
+                               persist=persist,
+                               token_manager=self.token_manager,
+                               app_url=self.app_url,
+                               raw_points=raw_points,
+                               data_url=self.get_data_url(),
+                               websocket_options=self.websocket_options)
+
+    def start_job_stream(self, juttle, program_name=None):
+        """
+        start a juttle program and return its JobStream, see
+        data_engine.start_job_stream
+
+        """
+        return data_engine.start_job_stream(juttle,
+                                            self.deployment_name,
+                                            program_name=program_name,
+                                            token_manager=self.token_manager,
+                                            app_url=self.app_url,
+                                            data_url=self.get_data_url(),
+                                            websocket_options=self.websocket_options)
+
+    def get_jobs(self):
+        return data_engine.get_jobs(self.deployment_name,
+                                    token_manager=self.token_manager,
+                                    app_url=self.app_url,
+                                    data_urls=self.get_data_urls())
+
+    def get_job_details(self, job_id):
+        return data_engine.get_job_details(job_id,
+                                           self.deployment_name,
+                                           token_manager=self.token_manager,
+                                           app_url=self.app_url,
+                                           data_urls=self.get_data_urls())
+
+    def get_data_url_for_job(self, job_id):
+        return data_engine.get_data_url_for_job(job_id,
+                                                self.deployment_name,
+                                                token_manager=self.token_manager,
+                                                app_url=self.app_url,
+                                                data_urls=self.get_data_urls())
+
+    def delete_job(self, job_id, data_url=None):
+        if data_url == None:
+            data_url = self.get_data_url_for_job(job_id)
+
+        data_engine.delete_job(job_id,
+                               self.deployment_name,
+                               token_manager=self.token_manager,
+                               app_url=self.app_url,
+                               data_url=data_url)
+
+    def connect_job(self, job_id, persist=False, raw_points=False, data_url=None):
+        """
+        connect to a running job, see data_engine.connect_job
+
+        """
+        if data_url == None:
+            data_url = self.get_data_url_for_job(job_id)
+
+        return data_engine.connect_job(job_id,
+                                       self.deployment_name,
+                                       token_manager=self.token_manager,
+                                       app_url=self.app_url,
+                                       persist=persist,
+                                       data_url=data_url,
+                                       raw_points=raw_points,
+                                       websocket_options=self.websocket_options)
+
+    def open_job_stream(self, job_id, data_url=None):
+        if data_url == None:
+            data_url = self.get_data_url_for_job(job_id)
+
+        return data_engine.open_job_stream(job_id,
+                                           self.deployment_name,
+                                           token_manager=self.token_manager,
+                                           app_url=self.app_url,
+                                           data_url=data_url,
+                                           websocket_options=self.websocket_options)
+
+    # programs
+
+    def get_programs(self, created_by=None):
+        return programs.get_programs(self.deployment_name,
+                                     created_by=created_by,
+                                     token_manager=self.token_manager,
+                                     app_url=self.app_url,
+                                     data_url=self.get_data_url())
+
+    def get_program(self, program_name):
+        return programs.get_program(program_name,
+                                    self.deployment_name,
+                                    token_manager=self.token_manager,
+                                    app_url=self.app_url,
+                                    data_url=self.get_data_url())
+
+    def program_exists(self, program_name):
+        return programs.program_exists(program_name,
+                                       self.deployment_name,
+                                       token_manager=self.token_manager,
+                                       app_url=self.app_url,
+                                       data_url=self.get_data_url())
+
+    def save_program(self, program_name, program_code, last_edited=None):
+        return programs.save_program(program_name,
+                                     program_code,
+                                     self.deployment_name,
+                                     last_edited=last_edited,
+                                     token_manager=self.token_manager,
+                                     app_url=self.app_url,
+                                     data_url=self.get_data_url(),
+                                     account_id=self.get_account_id())
+
+    def update_program(self, program_name, program_code, last_edited=None):
+        return programs.update_program(program_name,
+                                       program_code,
+                                       self.deployment_name,
+                                       last_edited=last_edited,
+                                       token_manager=self.token_manager,
+                                       app_url=self.app_url,
+                                       data_url=self.get_data_url(),
+                                       account_id=self.get_account_id())
+
+    # uploads
+
+    def push_json_file(self, json_file, space='default', **kwargs):
+        """
+        upload the JSON points in the file provided to the space specified,
+        see jut.commands.upload.push_json_file for the keyword arguments
+
+        """
+        # imported here as the upload command itself uses the client
+        from jut.commands import upload
+
+        upload.push_json_file(json_file, self.get_webhook_url(space=space), **kwargs)
+
+
+def get_client(configuration=None, deployment_name=None):
+    """
+    return the JutClient for the configuration (the default one unless
+    another one is provided) and deployment specified, reusing the client
+    created by a previous call for the same ones so their token and
+    deployment details carry over
+
+    """
+    if configuration == None:
+        configuration = config.get_default()
+
+    key = (tuple(sorted((configuration or {}).items())), deployment_name)
+
+    if key not in _CLIENTS:
+        _CLIENTS[key] = JutClient.from_config(configuration=configuration,
+                                              deployment_name=deployment_name)
+
+    return _CLIENTS[key]
+
+
+def clear_clients():
+    """
+    forget all of the clients returned by get_client
+
+    """
+    _CLIENTS.clear()
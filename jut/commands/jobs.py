@@ -8,13 +8,13 @@ import time
 
 from collections import OrderedDict
 
-from jut import config
+from jut import config, formatters
 
-from jut.api import auth, accounts, data_engine
+from jut.api import accounts, data_engine
+from jut.client import get_client
 from jut.common import info, error
 from jut.commands import configs
 from jut.exceptions import JutException
-from jut.formatters import JSONFormatter, TextFormatter, CSVFormatter
 
 from jut.util.console import prompt
 
@@ -30,19 +30,14 @@ def _print_jobs(jobs, token_manager, app_url, options):
         if job['user'] != 'jut.internal.user':
             accountids.add(job['user'])
 
-    account_lookup = {
-        'jut.internal.user': {
-            'username': 'Jut Internal'
-        }
-    }
-
-    if accountids:
-        accounts_details = accounts.get_accounts(accountids,
+    account_lookup = accounts.get_account_lookup(accountids,
+                                                 cache_filepath=config.get_cache_filepath('accounts'),
                                                  token_manager=token_manager,
                                                  app_url=app_url)
 
-        for account in accounts_details['accounts']:
-            account_lookup[account['id']] = account
+    account_lookup['jut.internal.user'] = {
+        'username': 'Jut Internal'
+    }
 
     if options.format == 'text':
         labels = OrderedDict()
@@ -118,31 +113,15 @@ def list(options):
     show all currently running jobs
 
     """
-    configuration = config.get_default()
-    app_url = configuration['app_url']
-
-    if options.deployment != None:
-        deployment_name = options.deployment
-    else:
-        deployment_name = configuration['deployment_name']
-
-    client_id = configuration['client_id']
-    client_secret = configuration['client_secret']
-
-    token_manager = auth.TokenManager(client_id=client_id,
-                                      client_secret=client_secret,
-                                      app_url=app_url)
-
-    jobs = data_engine.get_jobs(deployment_name,
-                                token_manager=token_manager,
-                                app_url=app_url)
+    client = get_client(deployment_name=options.deployment)
 
+    jobs = client.get_jobs()
 
     if len(jobs) == 0:
         error('No running jobs')
 
     else:
-        _print_jobs(jobs, token_manager, app_url, options)
+        _print_jobs(jobs, client.token_manager, client.app_url, options)
 
 
 def kill(options):
@@ -150,70 +129,133 @@ def kill(options):
     kill a specific job by id
 
     """
-    configuration = config.get_default()
-    app_url = configuration['app_url']
-
-    if options.deployment != None:
-        deployment_name = options.deployment
-    else:
-        deployment_name = configuration['deployment_name']
+    client = get_client(deployment_name=options.deployment)
 
-    client_id = configuration['client_id']
-    client_secret = configuration['client_secret']
-
-    token_manager = auth.TokenManager(client_id=client_id,
-                                      client_secret=client_secret,
-                                      app_url=app_url)
-
-    job_details = data_engine.get_job_details(options.job_id,
-                                              deployment_name,
-                                              token_manager=token_manager,
-                                              app_url=app_url)
+    job_details = client.get_job_details(options.job_id)
 
     options.format = 'table'
 
     if options.yes:
         decision = 'Y'
     else:
-        _print_jobs([job_details], token_manager, app_url, options)
+        _print_jobs([job_details], client.token_manager, client.app_url, options)
         decision = prompt('Are you sure you want to delete the above job? (Y/N)')
 
     if decision == 'Y':
-        data_engine.delete_job(options.job_id.strip(),
-                               deployment_name,
-                               token_manager=token_manager,
-                               app_url=app_url)
+        client.delete_job(options.job_id.strip())
 
     else:
         raise JutException('Unexpected option "%s"' % decision)
 
 
-def connect(options):
-    options.persist = False
+def _connect_jobs(client,
+                  formatter,
+                  show_error_or_warning,
+                  options):
+    """
+    internal method to connect to multiple jobs at once, streaming the points
+    of all of them through the same formatter with each point tagged with
+    the job_id of the job that produced it
 
-    if not config.is_configured():
-        configs.add_configuration(options)
+    """
+    jobs = client.get_jobs()
+
+    if options.all:
+        jobs = [job for job in jobs if job['timeout'] == 0]
 
-    configuration = config.get_default()
-    app_url = configuration['app_url']
+        if len(jobs) == 0:
+            raise JutException('No persistent jobs running')
 
-    if options.deployment != None:
-        deployment_name = options.deployment
     else:
-        deployment_name = configuration['deployment_name']
+        running_jobs = dict([(job['id'], job) for job in jobs])
+        jobs = []
 
-    client_id = configuration['client_id']
-    client_secret = configuration['client_secret']
+        for job_id in options.job_ids:
+            if job_id not in running_jobs:
+                raise JutException('Unable to find job with id "%s"' % job_id)
 
-    token_manager = auth.TokenManager(client_id=client_id,
-                                      client_secret=client_secret,
-                                      app_url=app_url)
+            jobs.append(running_jobs[job_id])
+
+    streams = []
+    total_points = 0
+    with_errors = False
+
+    try:
+        for job in jobs:
+            streams.append(client.open_job_stream(job['id'],
+                                                  data_url=job['data_url']))
+
+        formatter.start()
+
+        for (stream, data) in data_engine.poll_jobs(streams):
+            if 'points' in data:
+                points = data['points']
+                for point in points:
+                    point['job_id'] = stream.job_id
+
+                formatter.points(points, sink=data.get('sink'))
+
+                total_points += len(points)
+
+                if options.show_progress:
+                    error('streamed %s points', total_points, end='\r')
+
+            elif data.get('error') == 'NONEXISTENT-JOB':
+                error('Job "%s" no longer running' % stream.job_id)
+
+            elif 'error' in data:
+                show_error_or_warning(data)
+                with_errors = True
+
+            elif 'warning' in data:
+                show_error_or_warning(data)
+
+            formatter.frame_end()
+
+    finally:
+        for stream in streams:
+            if not stream.finished:
+                stream.close()
+
+        if options.show_progress:
+            # one enter to retain the last value of progress output
+            error('')
+
+        formatter.stop()
+
+    if with_errors:
+        raise JutException('Error while running juttle')
+
+
+def connect(options):
+    options.persist = False
+
+    if not config.is_configured():
+        configs.add_configuration(options)
+
+    client = get_client(deployment_name=options.deployment)
+    client.websocket_options.update(connect_timeout=options.connect_timeout,
+                                    read_timeout=options.read_timeout,
+                                    tcp_nodelay=options.tcp_nodelay,
+                                    keepalive=options.keepalive,
+                                    receive_buffer=options.receive_buffer,
+                                    compression=options.compression)
 
     total_points = 0
 
     def show_progress():
         if options.show_progress:
-            error('streamed %s points', total_points, end='\r')
+            websocket_options = client.websocket_options
+            message = 'streamed %s points' % total_points
+
+            if websocket_options.compression:
+                message += ', %.1fx compression' % \
+                           websocket_options.get_compression_ratio()
+
+            if websocket_options.reconnects > 0:
+                message += ', reconnected %s times' % websocket_options.reconnects
+
+            error(message, end='\r')
 
     def show_error_or_warning(data):
         """
@@ -251,20 +293,19 @@ def connect(options):
         else:
             error(message)
 
-    if options.format == 'json':
-        formatter = JSONFormatter(options)
-
-    elif options.format == 'text':
-        formatter = TextFormatter(options)
+    formatter = formatters.get_formatter(options.format, options)
 
-    elif options.format == 'csv':
-        formatter = CSVFormatter(options)
+    if options.all or len(options.job_ids) > 1:
+        _connect_jobs(client,
+                      formatter,
+                      show_error_or_warning,
+                      options)
+        return
 
-    else:
-        raise JutException('Unsupported output format "%s"' %
-                           options.format)
+    if len(options.job_ids) == 0:
+        raise JutException('Specify the job_id(s) to connect to or use --all')
 
-    job_id = options.job_id
+    job_id = options.job_ids[0]
 
     done = False
     with_errors = False
@@ -277,10 +318,7 @@ def connect(options):
             if not options.persist:
                 formatter.start()
 
-            for data in data_engine.connect_job(job_id,
-                                                deployment_name,
-                                                token_manager=token_manager,
-                                                app_url=app_url):
+            for data in client.connect_job(job_id):
                 show_progress()
 
                 if 'job' in data:
@@ -291,8 +329,7 @@ def connect(options):
 
                 if 'points' in data:
                     points = data['points']
-                    for point in points:
-                        formatter.point(point)
+                    formatter.points(points, sink=data.get('sink'))
 
                     total_points += len(points)
 
@@ -303,6 +340,8 @@ def connect(options):
                 elif 'warning' in data:
                     show_error_or_warning(data)
 
+                formatter.frame_end()
+
             done = True
 
         except JutException:
@@ -316,7 +355,7 @@ def connect(options):
         finally:
             if options.show_progress:
                 # one enter to retain the last value of progress output
-                info('')
+                error('')
 
             if not options.persist:
                 formatter.stop()
@@ -13,7 +13,8 @@ import urllib
 
 from jut import config
 
-from jut.api import accounts, auth, programs
+from jut.api import accounts
+from jut.client import get_client
 from jut.common import info
 from jut.exceptions import JutException
 from jut.util import dates, console
@@ -24,44 +25,24 @@ def list(options):
     list programs that belong to the authenticated user
 
     """
-    configuration = config.get_default()
-    app_url = configuration['app_url']
-
-    if options.deployment != None:
-        deployment_name = options.deployment
-    else:
-        deployment_name = configuration['deployment_name']
-
-    client_id = configuration['client_id']
-    client_secret = configuration['client_secret']
-
-    token_manager = auth.TokenManager(client_id=client_id,
-                                      client_secret=client_secret,
-                                      app_url=app_url)
+    client = get_client(deployment_name=options.deployment)
 
     if options.all == True:
         account_id = None
 
     else:
-        account_id = accounts.get_logged_in_account_id(token_manager=token_manager,
-                                                       app_url=app_url)
+        account_id = client.get_account_id()
 
-    programs_details = programs.get_programs(deployment_name,
-                                             token_manager=token_manager,
-                                             created_by=account_id,
-                                             app_url=app_url)
+    programs_details = client.get_programs(created_by=account_id)
 
     account_ids = set()
     for program in programs_details:
         account_ids.add(program['createdBy'])
 
-    accounts_details = accounts.get_accounts(account_ids,
-                                             token_manager=token_manager,
-                                             app_url=app_url)
-
-    account_lookup = {}
-    for account in accounts_details['accounts']:
-        account_lookup[account['id']] = account
+    account_lookup = accounts.get_account_lookup(account_ids,
+                                                 cache_filepath=config.get_cache_filepath('accounts'),
+                                                 token_manager=client.token_manager,
+                                                 app_url=client.app_url)
 
     headers = ['Name', 'Last Saved', 'Created By']
     table = []
@@ -91,32 +72,15 @@ def pull(options):
     pull all remote programs to a local directory
 
     """
-    configuration = config.get_default()
-    app_url = configuration['app_url']
-
-    if options.deployment != None:
-        deployment_name = options.deployment
-    else:
-        deployment_name = configuration['deployment_name']
-
-    client_id = configuration['client_id']
-    client_secret = configuration['client_secret']
-
-    token_manager = auth.TokenManager(client_id=client_id,
-                                      client_secret=client_secret,
-                                      app_url=app_url)
+    client = get_client(deployment_name=options.deployment)
 
     if options.all == True:
         account_id = None
 
     else:
-        account_id = accounts.get_logged_in_account_id(token_manager=token_manager,
-                                                       app_url=app_url)
+        account_id = client.get_account_id()
 
-    programs_details = programs.get_programs(deployment_name,
-                                             token_manager=token_manager,
-                                             created_by=account_id,
-                                             app_url=app_url)
+    programs_details = client.get_programs(created_by=account_id)
 
     if not os.path.exists(options.directory):
         os.mkdir(options.directory)
@@ -125,13 +89,10 @@ def pull(options):
     for program in programs_details:
         account_ids.add(program['createdBy'])
 
-    accounts_details = accounts.get_accounts(account_ids,
-                                             token_manager=token_manager,
-                                             app_url=app_url)
-
-    account_lookup = {}
-    for account in accounts_details['accounts']:
-        account_lookup[account['id']] = account
+    account_lookup = accounts.get_account_lookup(account_ids,
+                                                 cache_filepath=config.get_cache_filepath('accounts'),
+                                                 token_manager=client.token_manager,
+                                                 app_url=client.app_url)
 
     decision = None
     for program in programs_details:
@@ -200,21 +161,7 @@ def pull(options):
 
 
 def push(options):
-    configuration = config.get_default()
-    app_url = configuration['app_url']
-
-    if options.deployment != None:
-        deployment_name = options.deployment
-    else:
-        deployment_name = configuration['deployment_name']
-
-    client_id = configuration['client_id']
-    client_secret = configuration['client_secret']
-
-    token_manager = auth.TokenManager(client_id=client_id,
-                                      client_secret=client_secret,
-                                      app_url=app_url)
-
+    client = get_client(deployment_name=options.deployment)
 
     if not os.path.exists(options.source):
         raise JutException('Source "%s" does not exists.')
@@ -239,18 +186,12 @@ def push(options):
 
         local_last_edited = int(os.stat(filepath).st_mtime)
 
-        if programs.program_exists(program_name,
-                                   deployment_name,
-                                   token_manager=token_manager,
-                                   app_url=app_url):
+        if client.program_exists(program_name):
 
             # one last safety to check if the modification time of
             # the file still matches the lastEdited of the existing
             # copy on Jut otherwise we prompt the user for confirmation
-            program = programs.get_program(program_name,
-                                           deployment_name,
-                                           token_manager=token_manager,
-                                           app_url=app_url)
+            program = client.get_program(program_name)
 
             remote_last_edited = dates.iso8601_to_epoch(program['lastEdited'])
 
@@ -288,21 +229,15 @@ def push(options):
 
 
             last_edited_iso = dates.epoch_to_iso8601(local_last_edited)
-            programs.update_program(program_name,
-                                    program_code,
-                                    deployment_name,
-                                    last_edited=last_edited_iso,
-                                    token_manager=token_manager,
-                                    app_url=app_url)
+            client.update_program(program_name,
+                                  program_code,
+                                  last_edited=last_edited_iso)
             os.utime(filepath, (local_last_edited, local_last_edited))
 
         else:
             last_edited_iso = dates.epoch_to_iso8601(local_last_edited)
-            programs.save_program(program_name,
-                                  program_code,
-                                  deployment_name,
-                                  last_edited=last_edited_iso,
-                                  token_manager=token_manager,
-                                  app_url=app_url)
+            client.save_program(program_name,
+                                program_code,
+                                last_edited=last_edited_iso)
             os.utime(filepath, (local_last_edited, local_last_edited))
 
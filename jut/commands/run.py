@@ -2,15 +2,16 @@
 jut run command
 """
 
+import copy
 import os
 import time
 
-from jut import config
-from jut.api import auth, data_engine
+from jut import config, formatters
+from jut.client import get_client
 from jut.commands import configs
 from jut.common import info, error
 from jut.exceptions import JutException
-from jut.formatters import JSONFormatter, TextFormatter, CSVFormatter
+from jut.util.pipeline import Pipeline
 
 def run_juttle(options):
     if not config.is_configured():
@@ -21,30 +22,44 @@ def run_juttle(options):
     else:
         juttle = options.juttle
 
-    configuration = config.get_default()
-    app_url = configuration['app_url']
-
-    if options.deployment != None:
-        deployment_name = options.deployment
-    else:
-        deployment_name = configuration['deployment_name']
-
-    client_id = configuration['client_id']
-    client_secret = configuration['client_secret']
-
-    token_manager = auth.TokenManager(client_id=client_id,
-                                      client_secret=client_secret,
-                                      app_url=app_url)
+    client = get_client(deployment_name=options.deployment)
+    client.websocket_options.update(connect_timeout=options.connect_timeout,
+                                    read_timeout=options.read_timeout,
+                                    tcp_nodelay=options.tcp_nodelay,
+                                    keepalive=options.keepalive,
+                                    receive_buffer=options.receive_buffer,
+                                    compression=options.compression)
 
     program_name = options.name
     if program_name == None:
         program_name = 'jut-tools program %s' % int(time.time())
 
     total_points = 0
+    total_bytes = 0
+
+    # pipeline reading the payloads of the current run ahead of the output
+    pipeline = None
 
     def show_progress():
         if options.show_progress:
-            error('streamed %s points', total_points, end='\r')
+            websocket_options = client.websocket_options
+
+            if options.raw:
+                message = 'streamed %s bytes of points' % total_bytes
+            else:
+                message = 'streamed %s points' % total_points
+
+            if websocket_options.compression:
+                message += ', %.1fx compression' % \
+                           websocket_options.get_compression_ratio()
+
+            if websocket_options.reconnects > 0:
+                message += ', reconnected %s times' % websocket_options.reconnects
+
+            if pipeline != None and pipeline.dropped_payloads > 0:
+                message += ', dropped %s payloads' % pipeline.dropped_payloads
+
+            error(message, end='\r')
 
     def show_error_or_warning(data):
         """
@@ -82,18 +97,59 @@ def run_juttle(options):
         else:
             error(message)
 
-    if options.format == 'json':
-        formatter = JSONFormatter(options)
+    # sink name to output file for the sinks routed with --sink-output
+    sink_outputs = {}
 
-    elif options.format == 'text':
-        formatter = TextFormatter(options)
+    if options.sink_output != None:
+        for sink_output in options.sink_output:
+            if '=' not in sink_output:
+                raise JutException('Invalid --sink-output "%s", expected '
+                                   'NAME=FILE' % sink_output)
 
-    elif options.format == 'csv':
-        formatter = CSVFormatter(options)
+            (name, filename) = sink_output.split('=', 1)
+            sink_outputs[name] = filename
 
-    else:
-        raise JutException('Unsupported output format "%s"' %
-                           options.format)
+    # formatter of each sink name routed to its own output file, which are
+    # opened once so retries don't truncate what was already written out
+    formatters_by_name = {}
+
+    for (name, filename) in sink_outputs.items():
+        # the format is implied by the extension of the output file
+        sink_format = formatters.get_format_for_filename(filename,
+                                                         default=options.format)
+
+        sink_options = copy.copy(options)
+        sink_options.output = filename
+        sink_options.format = sink_format
+
+        formatters_by_name[name] = formatters.get_formatter(sink_format,
+                                                            sink_options)
+
+    def get_sink_formatters(sinks):
+        """
+        return a lookup of sink channel to formatter for each of the sinks
+        routed to their own output file
+
+        """
+        names = set([sink['name'] for sink in sinks])
+
+        for name in sink_outputs.keys():
+            if name not in names:
+                raise JutException('No sink named "%s", available sinks are: %s' %
+                                   (name, ', '.join(sorted(names))))
+
+        sink_formatters = {}
+
+        for sink in sinks:
+            if sink['name'] in formatters_by_name:
+                sink_formatters[sink['channel']] = formatters_by_name[sink['name']]
+
+        return sink_formatters
+
+    formatter = formatters.get_formatter(options.format, options)
+
+    for sink_formatter in formatters_by_name.values():
+        sink_formatter.start()
 
     done = False
     with_errors = False
@@ -101,56 +157,98 @@ def run_juttle(options):
     retry_delay = options.retry_delay
     retry = 0
 
-    while not done:
-        try:
-            if not options.persist:
-                formatter.start()
+    # set when the program itself doesn't fit the options, which no amount
+    # of retrying fixes
+    invalid = False
+
+    try:
+        while not done:
+            sink_formatters = {}
+
+            try:
+                if not options.persist:
+                    formatter.start()
+
+                payloads = client.run(juttle,
+                                      program_name=program_name,
+                                      persist=options.persist,
+                                      raw_points=options.raw)
+
+                if options.buffer_size > 0:
+                    pipeline = Pipeline(payloads,
+                                        max_payloads=options.buffer_size,
+                                        policy=options.backpressure,
+                                        memory_watermark=options.memory_watermark * 1024 * 1024,
+                                        directory=options.spill_directory)
+                    payloads = pipeline
+
+                for data in payloads:
+                    show_progress()
+
+                    if 'job' in data:
+                        # job details
+                        if options.persist:
+                            # lets print the job id
+                            info(data['job']['id'])
+
+                        elif len(sink_outputs) > 0:
+                            # the sinks routed are missing from the program
+                            # when this raises
+                            invalid = True
+                            sink_formatters = get_sink_formatters(data.get('sinks', []))
+                            invalid = False
+
+                    if 'points' in data:
+                        points = data['points']
+                        sink = data.get('sink')
+                        sink_formatters.get(sink, formatter).points(points, sink=sink)
+
+                        total_points += len(points)
+
+                    elif 'raw_points' in data:
+                        sink = data.get('sink')
+                        sink_formatters.get(sink, formatter).raw_points(data['raw_points'],
+                                                                        sink=sink)
+                        total_bytes += len(data['raw_points'])
 
-            for data in data_engine.run(juttle,
-                                        deployment_name,
-                                        program_name=program_name,
-                                        persist=options.persist,
-                                        token_manager=token_manager,
-                                        app_url=app_url):
-                show_progress()
+                    elif 'error' in data:
+                        show_error_or_warning(data)
+                        with_errors = True
 
-                if 'job' in data:
-                    # job details
-                    if options.persist:
-                        # lets print the job id
-                        info(data['job']['id'])
+                    elif 'warning' in data:
+                        show_error_or_warning(data)
 
-                if 'points' in data:
-                    points = data['points']
-                    for point in points:
-                        formatter.point(point)
+                    formatter.frame_end()
 
-                    total_points += len(points)
+                    for sink_formatter in set(sink_formatters.values()):
+                        sink_formatter.frame_end()
 
-                elif 'error' in data:
-                    show_error_or_warning(data)
-                    with_errors = True
+                done = True
 
-                elif 'warning' in data:
-                    show_error_or_warning(data)
+            except JutException:
+                retry += 1
 
-            done = True
+                if invalid or (max_retries != -1 and retry > max_retries):
+                    raise
 
-        except JutException:
-            retry += 1
+                time.sleep(retry_delay)
 
-            if max_retries != -1 and retry > max_retries:
-                raise
+            finally:
+                if options.show_progress:
+                    # one enter to retain the last value of progress output
+                    error('')
 
-            time.sleep(retry_delay)
+                if not options.persist:
+                    formatter.stop()
 
-        finally:
-            if options.show_progress:
-                # one enter to retain the last value of progress output
-                info('')
+                if pipeline != None and pipeline.dropped_payloads > 0:
+                    error('Dropped %s payloads (%s points) the output could not '
+                          'keep up with' % (pipeline.dropped_payloads,
+                                            pipeline.dropped_points))
 
-            if not options.persist:
-                formatter.stop()
+                if with_errors:
+                    raise JutException('Error while running juttle')
 
-            if with_errors:
-                raise JutException('Error while running juttle')
+    finally:
+        for sink_formatter in formatters_by_name.values():
+            sink_formatter.stop()
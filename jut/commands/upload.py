@@ -3,19 +3,14 @@ jut upload command
 """
 
 import hashlib
-import json
-import requests
 import sys
 
-from jut import config
-
-from jut.api import auth, integrations
+from jut.api.session import SESSION
+from jut.client import get_client
 from jut.common import info
+from jut.util import codec
 
 
-# long lived requests session object to keep HTTP connections alive
-SESSION = requests.Session()
-
 def post(json_data,
          url,
          dry_run=False):
@@ -25,10 +20,10 @@ def post(json_data,
     """
 
     if dry_run:
-        info('POST: %s' % json.dumps(json_data, indent=4))
+        info('POST: %s' % codec.dumps(json_data, indent=4))
     else:
         response = SESSION.post(url,
-                                data=json.dumps(json_data),
+                                data=codec.dumps(json_data),
                                 headers={'content-type': 'application/json'})
 
         if response.status_code != 200:
@@ -53,7 +48,7 @@ def push_json_file(json_file,
 
     """
     batch = []
-    json_data = json.loads(json_file.read())
+    json_data = codec.loads(json_file.read())
 
     if isinstance(json_data, list):
         for item in json_data:
@@ -103,25 +98,8 @@ def upload_file(options):
     url = options.url
 
     if url == None:
-        configuration = config.get_default()
-        app_url = configuration['app_url']
-
-        if options.deployment != None:
-            deployment_name = options.deployment
-        else:
-            deployment_name = configuration['deployment_name']
-
-        client_id = configuration['client_id']
-        client_secret = configuration['client_secret']
-
-        token_manager = auth.TokenManager(client_id=client_id,
-                                          client_secret=client_secret,
-                                          app_url=app_url)
-
-        url = integrations.get_webhook_url(deployment_name,
-                                           space=options.space,
-                                           token_manager=token_manager,
-                                           app_url=app_url)
+        client = get_client(deployment_name=options.deployment)
+        url = client.get_webhook_url(space=options.space)
 
     info('Pushing to %s' % url)
     push_json_file(json_file,
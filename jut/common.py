@@ -3,9 +3,16 @@
 
 import sys
 import os
+import time
 
 DEBUG = os.environ.get('JUT_DEBUG', False)
 
+# default number of bytes to buffer before flushing a BufferedOutput
+FLUSH_SIZE = 64 * 1024
+
+# default maximum number of seconds output stays in a BufferedOutput
+FLUSH_INTERVAL = 1
+
 def info(message, *args, **kwargs):
     """
     write a message to stdout
@@ -17,10 +24,9 @@ def info(message, *args, **kwargs):
         end = '\n'
 
     if len(args) == 0:
-        sys.stdout.write(message)
+        sys.stdout.write(message + end)
     else:
-        sys.stdout.write(message % args)
-    sys.stdout.write(end)
+        sys.stdout.write(message % args + end)
     sys.stdout.flush()
 
 
@@ -71,3 +77,77 @@ def is_debug_enabled():
 
     """
     return DEBUG
+
+
+class BufferedOutput(object):
+    """
+    buffered writer used for large amounts of output, such as the points
+    produced by `jut run`, to avoid a write and flush for every line. The
+    flush policy is one of:
+
+     * line: flush after every write
+     * frame: flush at the end of every frame (see frame_end)
+     * size: flush once flush_size bytes are buffered or flush_interval
+             seconds have passed since the last flush
+     * auto: line when writing to a terminal otherwise size
+
+    """
+
+    def __init__(self,
+                 stream=None,
+                 policy='auto',
+                 flush_size=FLUSH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        if stream == None:
+            stream = sys.stdout
+
+        if policy == 'auto':
+            policy = 'line' if stream.isatty() else 'size'
+
+        self.stream = stream
+        self.policy = policy
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.time()
+
+    def write(self, data):
+        """
+        buffer the data provided flushing when required by the flush policy
+
+        """
+        self.buffer.append(data)
+        self.buffered += len(data)
+
+        if self.policy == 'line' or self.buffered >= self.flush_size:
+            self.flush()
+
+        # a frame may take longer than the flush interval to write out
+        elif self.policy == 'size' and \
+             time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def frame_end(self):
+        """
+        mark the end of a frame of output (ie all the points from a single
+        websocket payload)
+
+        """
+        if self.policy == 'frame' or \
+           time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        write out all of the buffered data
+
+        """
+        if self.buffered > 0:
+            self.stream.write(''.join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+
+        self.stream.flush()
+        self.last_flush = time.time()
@@ -4,45 +4,233 @@ jut internal configuration module
 """
 
 import ConfigParser
+import functools
 import os
+import tempfile
 
 from os.path import expanduser
 
+try:
+    import fcntl
+
+except ImportError:
+    # no advisory file locking (ie on Windows) so concurrent updates to the
+    # configuration aren't protected
+    fcntl = None
+
 from jut import defaults
 from jut.common import info
 from jut.exceptions import JutException
 
-_CONFIG = None
-_CONFIG_FILEPATH = None
-_JUT_HOME = None
-
 
-def init():
-    global _CONFIG, _CONFIG_FILEPATH, _JUT_HOME
-
-    _CONFIG = ConfigParser.RawConfigParser()
+def _get_jut_home():
+    """
+    internal method to return the jut home directory
 
+    """
     # HOME_OVERRIDE for testing purposes
     if os.environ.get('HOME_OVERRIDE') != None:
-        _JUT_HOME = os.environ.get('HOME_OVERRIDE')
+        return os.environ.get('HOME_OVERRIDE')
     else:
         home = expanduser('~')
-        _JUT_HOME = os.path.join(home, '.jut')
+        return os.path.join(home, '.jut')
+
+
+# the parsed configuration is only read on first use and then cached, along
+# with the name of the default section, until the configuration file changes
+_CONFIG = None
+_CONFIG_SIGNATURE = None
+_DEFAULT_SECTION = None
+_JUT_HOME = _get_jut_home()
+_CONFIG_FILEPATH = os.path.join(_JUT_HOME, 'config')
+_LOCK_FILEPATH = os.path.join(_JUT_HOME, 'config.lock')
 
-    if not os.path.exists(_JUT_HOME):
-        os.makedirs(_JUT_HOME)
 
+def set_jut_home():
+    """
+    point the configuration at the jut home directory of the current
+    environment (ie after HOME_OVERRIDE changed), forgetting the
+    configuration read so far, returns True when the jut home changed
+
+    """
+    global _CONFIG, _JUT_HOME, _CONFIG_FILEPATH, _LOCK_FILEPATH
+
+    jut_home = _get_jut_home()
+
+    if jut_home == _JUT_HOME:
+        return False
+
+    _CONFIG = None
+    _JUT_HOME = jut_home
     _CONFIG_FILEPATH = os.path.join(_JUT_HOME, 'config')
+    _LOCK_FILEPATH = os.path.join(_JUT_HOME, 'config.lock')
+    return True
+
+
+def _make_jut_home():
+    """
+    internal method to create the jut home directory if it doesn't exist
+
+    """
+    try:
+        os.makedirs(_JUT_HOME)
 
-    if os.path.exists(_CONFIG_FILEPATH):
+    except OSError:
+        # created by another process in the meantime
+        if not os.path.isdir(_JUT_HOME):
+            raise
+
+
+def _get_signature(filepath):
+    """
+    internal method to return the signature used to tell when the file has
+    changed, the inode is part of it as the file may be replaced within the
+    resolution of its modification time
+
+    """
+    try:
+        stat = os.stat(filepath)
+
+    except OSError:
+        return None
+
+    return (stat.st_mtime, stat.st_size, stat.st_ino)
+
+
+def _update_default_section():
+    global _DEFAULT_SECTION
+
+    _DEFAULT_SECTION = None
+
+    for configuration in _CONFIG.sections():
+        if _CONFIG.has_option(configuration, 'default'):
+            _DEFAULT_SECTION = configuration
+            break
+
+
+def init():
+    """
+    (re)load the configuration from the jut home directory
+
+    """
+    global _CONFIG, _CONFIG_SIGNATURE
+
+    _CONFIG = ConfigParser.RawConfigParser()
+    _CONFIG_SIGNATURE = _get_signature(_CONFIG_FILEPATH)
+
+    if _CONFIG_SIGNATURE != None:
         _CONFIG.read(_CONFIG_FILEPATH)
 
+    _update_default_section()
+
+
+def _get_config():
+    """
+    internal method to return the parsed configuration, which is only read
+    again when the configuration file changes
+
+    """
+    if _CONFIG == None or _CONFIG_SIGNATURE != _get_signature(_CONFIG_FILEPATH):
+        init()
+
+    return _CONFIG
+
+
+def _locked_update(function):
+    """
+    internal decorator for the methods updating the configuration, which run
+    holding an exclusive lock on the configuration and with it freshly read
+    from disk, so the updates of concurrent jut processes are merged instead
+    of overwriting each other. The lock is only held for the update itself.
+
+    """
+    @functools.wraps(function)
+    def locked_update(*args, **kwargs):
+        global _CONFIG
+
+        _make_jut_home()
+
+        with open(_LOCK_FILEPATH, 'a') as lock_file:
+            if fcntl != None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            try:
+                init()
+                return function(*args, **kwargs)
+
+            except:
+                # drop any changes that didn't make it to disk
+                _CONFIG = None
+                raise
+
+            finally:
+                if fcntl != None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    return locked_update
+
+
+def _save():
+    """
+    internal method to write the configuration back to disk, by renaming a
+    temporary file into place so readers never see a partially written
+    configuration
+
+    """
+    global _CONFIG_SIGNATURE
+
+    _make_jut_home()
+
+    (handle, temp_filepath) = tempfile.mkstemp(dir=_JUT_HOME, prefix='.config.')
+
+    try:
+        with os.fdopen(handle, 'w') as configfile:
+            _CONFIG.write(configfile)
+            configfile.flush()
+            os.fsync(configfile.fileno())
+
+        if os.name == 'nt' and os.path.exists(_CONFIG_FILEPATH):
+            # rename doesn't replace existing files on Windows
+            os.remove(_CONFIG_FILEPATH)
+
+        os.rename(temp_filepath, _CONFIG_FILEPATH)
+
+    except:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+    _CONFIG_SIGNATURE = _get_signature(_CONFIG_FILEPATH)
+    _update_default_section()
+
+
+def get_cache_filepath(name):
+    """
+    return the path of the cache file with the specified name within the jut
+    home directory
+
+    """
+    _make_jut_home()
+    return os.path.join(_JUT_HOME, '%s.cache' % name)
+
+
+def get_daemon_filepath(extension):
+    """
+    return the path of the jut daemon file with the specified extension (ie
+    sock or log) within the jut home directory
+
+    """
+    _make_jut_home()
+    return os.path.join(_JUT_HOME, 'daemon.%s' % extension)
+
 
 def show():
     """
     print the available configurations directly to stdout
 
     """
+    _get_config()
+
     if not is_configured():
         raise JutException('No configurations available, please run: `jut config add`')
 
@@ -68,13 +256,14 @@ def show():
 
 
 def is_configured():
-    return len(_CONFIG.sections()) > 0
+    return len(_get_config().sections()) > 0
 
 
 def length():
-    return len(_CONFIG.sections())
+    return len(_get_config().sections())
 
 
+@_locked_update
 def set_default(name=None, index=None):
     """
     set the default configuration by name
@@ -103,29 +292,31 @@ def set_default(name=None, index=None):
     if not default_was_set:
         raise JutException('Unable to find %s configuration' % name)
 
-    with open(_CONFIG_FILEPATH, 'w') as configfile:
-        _CONFIG.write(configfile)
+    _save()
 
     info('Configuration updated at %s' % _JUT_HOME)
 
 def exists(name):
     """
     """
-    return _CONFIG.has_section(name)
+    return _get_config().has_section(name)
 
+@_locked_update
 def add(name, **kwargs):
     """
     add a new configuration with the name specified and all of the keywords
     as attributes of that configuration.
 
     """
+    if _CONFIG.has_section(name):
+        raise JutException('Configuration for "%s" already exists' % name)
+
     _CONFIG.add_section(name)
 
     for (key, value) in kwargs.items():
         _CONFIG.set(name, key, value)
 
-    with open(_CONFIG_FILEPATH, 'w') as configfile:
-        _CONFIG.write(configfile)
+    _save()
 
     info('Configuration updated at %s' % _JUT_HOME)
 
@@ -139,17 +330,18 @@ def get_default():
     if not is_configured():
         raise JutException('No configurations available, please run `jut config add`')
 
-    for configuration in _CONFIG.sections():
-        if _CONFIG.has_option(configuration, 'default'):
-            return dict(_CONFIG.items(configuration))
+    if _DEFAULT_SECTION == None:
+        return None
+
+    return dict(_CONFIG.items(_DEFAULT_SECTION))
 
 
+@_locked_update
 def remove(name=None, index=None):
     """
     remove the specified configuration
 
     """
-
     removed = False
     count = 1
     for configuration in _CONFIG.sections():
@@ -170,8 +362,7 @@ def remove(name=None, index=None):
     if not removed:
         raise JutException('Unable to find %s configuration' % name)
 
-    with open(_CONFIG_FILEPATH, 'w') as configfile:
-        _CONFIG.write(configfile)
+    _save()
 
 
 def is_default(name=None, index=None):
@@ -183,19 +374,16 @@ def is_default(name=None, index=None):
     if not is_configured():
         raise JutException('No configurations available, please run `jut config add`')
 
-    count = 1
-    for configuration in _CONFIG.sections():
+    if _DEFAULT_SECTION == None:
+        return False
 
-        if index != None:
-            if _CONFIG.has_option(configuration, 'default') and count == index:
-                return True
+    if index != None:
+        sections = _CONFIG.sections()
 
-        if name != None:
-            if _CONFIG.has_option(configuration, 'default') and configuration == name:
-                return True
+        if 0 < index <= len(sections) and sections[index - 1] == _DEFAULT_SECTION:
+            return True
 
-        count += 1
+    if name != None and name == _DEFAULT_SECTION:
+        return True
 
     return False
-
-init()
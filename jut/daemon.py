@@ -0,0 +1,462 @@
+"""
+jut daemon which keeps the jut tools, authentication tokens, environment
+and deployment details warm in a long running process listening on a Unix
+socket in the jut home, so the `jut` commands forwarded to it skip the
+interpreter startup, imports and all of those lookups.
+
+Every forwarded command runs in a process forked from the daemon, in the
+working directory of the caller, with its output streamed back over the
+socket as frames made of a channel byte, the length of the data and the
+data itself:
+
+ * o: data written to stdout
+ * e: data written to stderr
+ * x: the exit status of the command, which is the last frame
+
+The command also runs with the environment of the caller, and ends as soon
+as the caller disconnects.
+
+"""
+
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+
+from jut import config
+from jut.common import info, error
+from jut.exceptions import JutException
+
+# jut subcommands forwarded to the daemon when it's running
+FORWARDED_COMMANDS = ['run', 'jobs', 'programs']
+
+# environment variable which disables forwarding commands to the daemon
+NO_DAEMON = 'JUT_NO_DAEMON'
+
+# default number of seconds between refreshes of the cached token and
+# deployment details
+REFRESH_INTERVAL = 300
+
+# maximum number of forwarded commands running at the same time
+MAX_COMMANDS = 64
+
+HEADER = struct.Struct('!cI')
+
+
+def _read_exactly(sock, length):
+    data = ''
+
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+
+        if not chunk:
+            return None
+
+        data += chunk
+
+    return data
+
+
+def _send_frame(sock, channel, data):
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+
+    sock.sendall(HEADER.pack(channel, len(data)) + data)
+
+
+def _connect():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(config.get_daemon_filepath('sock'))
+
+    # commands such as `jut jobs connect` can go quiet for any length of time
+    sock.settimeout(None)
+    return sock
+
+
+def _request(request, sock=None):
+    """
+    send the request to the daemon and write the output frames received back
+    to our stdout and stderr, returning the exit status
+
+    """
+    if sock == None:
+        sock = _connect()
+
+    try:
+        sock.sendall(json.dumps(request) + '\n')
+
+        while True:
+            header = _read_exactly(sock, HEADER.size)
+
+            if header == None:
+                raise JutException('jut daemon closed the connection unexpectedly')
+
+            (channel, length) = HEADER.unpack(header)
+            data = _read_exactly(sock, length)
+
+            if data == None:
+                raise JutException('jut daemon closed the connection unexpectedly')
+
+            if channel == 'o':
+                sys.stdout.write(data)
+                sys.stdout.flush()
+
+            elif channel == 'e':
+                sys.stderr.write(data)
+                sys.stderr.flush()
+
+            elif channel == 'x':
+                return int(data)
+
+    finally:
+        sock.close()
+
+
+def should_forward(options):
+    """
+    returns True when the command parsed into options can be forwarded to a
+    running daemon, which excludes anything that may have to prompt the user
+
+    """
+    if os.environ.get(NO_DAEMON) != None:
+        return False
+
+    if options.subcommand not in FORWARDED_COMMANDS:
+        return False
+
+    if options.subcommand == 'jobs' and options.jobs_subcommand == 'kill' and \
+       not options.yes:
+        return False
+
+    if options.subcommand == 'programs' and options.programs_subcommand != 'list':
+        return False
+
+    return os.path.exists(config.get_daemon_filepath('sock'))
+
+
+def forward(argv):
+    """
+    run the jut command line arguments provided on the daemon, returning
+    its exit status or None when the daemon isn't running
+
+    """
+    request = {
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+        'stdout_isatty': sys.stdout.isatty(),
+        'stderr_isatty': sys.stderr.isatty()
+    }
+
+    try:
+        sock = _connect()
+
+    except socket.error:
+        # stale socket left behind by a daemon that's no longer running
+        return None
+
+    return _request(request, sock=sock)
+
+
+class _Channel(object):
+    """
+    file like object writing the data written to it back to the caller as
+    frames on the channel specified
+
+    """
+
+    closed = False
+
+    def __init__(self, sock, channel, isatty):
+        self.sock = sock
+        self.channel = channel
+        self._isatty = isatty
+
+    def write(self, data):
+        if len(data) > 0:
+            _send_frame(self.sock, self.channel, data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return self._isatty
+
+    def fileno(self):
+        return self.sock.fileno()
+
+
+def _watch_caller(sock):
+    """
+    end this (forked) process as soon as the caller disconnects, which a
+    command that goes quiet (ie `jut jobs connect` on a persistent job)
+    would otherwise only notice the next time it writes some output
+
+    """
+    try:
+        while sock.recv(4096) != '':
+            # the caller doesn't send anything after the request
+            pass
+
+    except socket.error:
+        pass
+
+    os._exit(1)
+
+
+def _run_command(sock, request):
+    """
+    run the forwarded jut command in this (forked) process with its output
+    going back over the socket and return its exit status
+
+    """
+    # imported here as the thin client side of this module is used by
+    # jut.cli for every command and has to stay quick to import
+    import tempfile
+    import threading
+    import traceback
+
+    from jut import cli, client, common
+    from jut.api import session
+    from jut.util import codec
+
+    # the connections of the daemon can't be shared with it
+    session.reset()
+
+    watcher = threading.Thread(target=_watch_caller, args=(sock,))
+    watcher.daemon = True
+    watcher.start()
+
+    os.chdir(request['cwd'])
+
+    # whatever the jut tools read from the environment at import time has
+    # to be picked up again from the environment of the caller
+    os.environ.clear()
+    os.environ.update(request['env'])
+    os.environ[NO_DAEMON] = '1'
+
+    common.DEBUG = os.environ.get('JUT_DEBUG', False)
+    codec.set_codec(os.environ.get('JUT_JSON_CODEC'))
+    tempfile.tempdir = None
+
+    if config.set_jut_home():
+        # the clients warmed up by the daemon belong to another jut home
+        client.clear_clients()
+
+    sys.stdout = _Channel(sock, 'o', request['stdout_isatty'])
+    sys.stderr = _Channel(sock, 'e', request['stderr_isatty'])
+    sys.stdin = open(os.devnull, 'r')
+    sys.argv = ['jut'] + request['argv']
+
+    try:
+        cli.main()
+        return 0
+
+    except SystemExit as exception:
+        if exception.code == None:
+            return 0
+
+        if isinstance(exception.code, int):
+            return exception.code
+
+        error(str(exception.code))
+        return 1
+
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+def _handle(sock):
+    """
+    handle a single request on the socket provided
+
+    """
+    line = sock.makefile('r').readline()
+
+    if line == '':
+        # only checking if the daemon is running
+        return
+
+    request = json.loads(line)
+
+    # forwarded commands can go quiet for any length of time
+    sock.settimeout(None)
+
+    if 'status' in request:
+        _send_frame(sock, 'o', 'jut daemon running with pid %d\n' % os.getppid())
+        status = 0
+
+    elif 'stop' in request:
+        os.kill(os.getppid(), signal.SIGTERM)
+        _send_frame(sock, 'o', 'jut daemon stopped\n')
+        status = 0
+
+    else:
+        status = _run_command(sock, request)
+
+    _send_frame(sock, 'x', str(status))
+
+
+def _refresh():
+    """
+    drop the cached clients and warm up the one for the default
+    configuration by getting its access token and deployment details
+
+    """
+    from jut import client
+
+    client.clear_clients()
+
+    if not config.is_configured() or config.get_default() == None:
+        return
+
+    try:
+        default_client = client.get_client()
+        default_client.token_manager.get_access_token()
+        default_client.get_deployment_details()
+
+    except Exception as exception:
+        error('Unable to refresh the default configuration: %s' % exception)
+
+
+def serve(refresh_interval=REFRESH_INTERVAL):
+    """
+    run the daemon in the foreground until it's stopped or receives a
+    SIGTERM or SIGINT
+
+    """
+    import SocketServer
+
+    class Handler(SocketServer.BaseRequestHandler):
+
+        def handle(self):
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            _handle(self.request)
+
+    class Server(SocketServer.ForkingMixIn, SocketServer.UnixStreamServer):
+        max_children = MAX_COMMANDS
+
+    # import everything the commands need before forking any of them
+    from jut.commands import jobs, programs, run
+
+    # forwarded commands must run here rather than being forwarded again
+    os.environ[NO_DAEMON] = '1'
+
+    socket_filepath = config.get_daemon_filepath('sock')
+
+    if os.path.exists(socket_filepath):
+        os.remove(socket_filepath)
+
+    # only ever accessible to us, not just once it's chmod'ed after binding
+    umask = os.umask(0077)
+
+    try:
+        server = Server(socket_filepath, Handler)
+
+    finally:
+        os.umask(umask)
+
+    os.chmod(socket_filepath, 0600)
+    server.timeout = 1
+
+    def shutdown(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    info('jut daemon listening on %s with pid %d' % (socket_filepath, os.getpid()))
+
+    try:
+        last_refresh = 0
+
+        while True:
+            if time.time() - last_refresh > refresh_interval:
+                _refresh()
+                last_refresh = time.time()
+
+            server.handle_request()
+
+    finally:
+        if os.path.exists(socket_filepath):
+            os.remove(socket_filepath)
+
+        server.server_close()
+
+
+def is_running():
+    try:
+        _connect().close()
+        return True
+
+    except socket.error:
+        return False
+
+
+def start(options):
+    """
+    start the jut daemon in the background, or in the foreground with
+    --foreground, logging to the daemon.log in the jut home
+
+    """
+    if is_running():
+        raise JutException('jut daemon is already running')
+
+    if options.foreground:
+        serve(refresh_interval=options.refresh)
+        return
+
+    pid = os.fork()
+
+    if pid == 0:
+        os.setsid()
+
+        if os.fork() != 0:
+            os._exit(0)
+
+        log = open(config.get_daemon_filepath('log'), 'a')
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+
+        try:
+            serve(refresh_interval=options.refresh)
+
+        finally:
+            os._exit(0)
+
+    os.waitpid(pid, 0)
+
+    # wait for the daemon to start listening
+    for _ in range(0, 100):
+        if is_running():
+            _request({'status': True})
+            return
+
+        time.sleep(0.1)
+
+    raise JutException('jut daemon failed to start, see %s' %
+                       config.get_daemon_filepath('log'))
+
+
+def stop(options):
+    if not is_running():
+        raise JutException('jut daemon is not running')
+
+    _request({'stop': True})
+
+
+def status(options):
+    if not is_running():
+        raise JutException('jut daemon is not running')
+
+    _request({'status': True})
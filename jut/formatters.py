@@ -3,16 +3,35 @@ formatter module with various supported `jut run` output formats
 
 """
 
-from jut.common import info
+import csv
+import operator
+import os
+import sys
 
-import json
+from jut.common import BufferedOutput, error
+from jut.exceptions import JutException
+from jut.util import codec, dates
 
 
 class Formatter(object):
 
-    def __init__(self, options):
+    def __init__(self, options, output=None):
+        """
+        options: the command line options
+        output: common.BufferedOutput to write to, by default options.output
+                or stdout with the flush policy specified by options.flush
+        """
         self.options = options
 
+        if output == None:
+            if options.output != None:
+                output = BufferedOutput(stream=open(options.output, 'w'),
+                                        policy=options.flush)
+            else:
+                output = BufferedOutput(policy=options.flush)
+
+        self.output = output
+
     def start(self):
         """
         handle the start of your output format
@@ -25,37 +44,92 @@ class Formatter(object):
         """
         pass
 
+    def points(self, points, sink=None):
+        """
+        handle formatting all of the points received in a single payload for
+        the sink (ie flowgraph output) specified, by default each point is
+        formatted individually
+        """
+        for point in points:
+            self.point(point)
+
+    def raw_points(self, raw_points, sink=None):
+        """
+        handle formatting the raw JSON array of points received, by default
+        the points are decoded and formatted
+        """
+        self.points(codec.loads(raw_points), sink=sink)
+
+    def frame_end(self):
+        """
+        handle the end of a frame of points (ie a single websocket payload)
+        """
+        self.output.frame_end()
+
     def stop(self):
         """
-        handle the stop of your output format
+        handle the stop of your output format, make sure to call this when
+        overriding so all of the output is flushed
         """
-        pass
+        self.output.flush()
 
 
 class JSONFormatter(Formatter):
 
-    def __init__(self, options):
-        Formatter.__init__(self, options)
+    def __init__(self, options, output=None):
+        Formatter.__init__(self, options, output=output)
         self.previous_point = False
 
     def start(self):
         if not self.options.persist:
-            info('[')
+            self.output.write('[\n')
 
     def point(self, point):
         if self.previous_point:
-            info(',')
-        info(json.dumps(point, indent=2), end='')
+            self.output.write(',\n' + codec.dumps(point, indent=2))
+        else:
+            self.output.write(codec.dumps(point, indent=2))
+        self.previous_point = True
+
+    def raw_points(self, raw_points, sink=None):
+        # write the points exactly as received, just without the enclosing
+        # brackets since they're all part of one big array
+        points = raw_points.strip()[1:-1].strip()
+
+        if points == '':
+            return
+
+        if self.previous_point:
+            self.output.write(',\n' + points)
+        else:
+            self.output.write(points)
         self.previous_point = True
 
     def stop(self):
         if not self.options.persist:
-            info('\n]')
+            self.output.write('\n]\n')
+
+        Formatter.stop(self)
+
+
+class NDJSONFormatter(Formatter):
+    """
+    newline delimited JSON (http://ndjson.org/) with one compact JSON object
+    per line, which can be consumed as it streams and split at any line
+
+    """
+
+    def __init__(self, options, output=None):
+        Formatter.__init__(self, options, output=output)
+
+    def point(self, point):
+        self.output.write(codec.dumps(point) + '\n')
+
 
 class TextFormatter(Formatter):
 
-    def __init__(self, options):
-        Formatter.__init__(self, options)
+    def __init__(self, options, output=None):
+        Formatter.__init__(self, options, output=output)
 
 
     def point(self, point):
@@ -68,31 +142,341 @@ class TextFormatter(Formatter):
 
         keys = sorted(point.keys())
         line += [str(point[key]) for key in keys]
-        info(' '.join(line))
+        self.output.write(' '.join(line) + '\n')
 
 
 class CSVFormatter(Formatter):
 
-    def __init__(self, options):
-        Formatter.__init__(self, options)
-        self.current_headers = []
+    def __init__(self, options, output=None):
+        Formatter.__init__(self, options, output=output)
+        self.writer = csv.writer(self.output, lineterminator='\n')
+
+        # column plan (ie the ordered headers and a function to extract the
+        # row of values) for each distinct set of fields seen so far
+        self.column_plans = {}
+        self.current_plan = None
+
+    def column_plan(self, point):
+        """
+        return the column plan for the fields of the point provided, time
+        always comes first followed by the remaining fields in sorted order
+
+        """
+        signature = frozenset(point)
+        plan = self.column_plans.get(signature)
+
+        if plan == None:
+            headers = sorted(signature)
+
+            if 'time' in signature:
+                headers.remove('time')
+                headers.insert(0, 'time')
+
+            if len(headers) == 0:
+                row = lambda point: ()
+            elif len(headers) == 1:
+                row = lambda point, key=headers[0]: (point[key],)
+            else:
+                row = operator.itemgetter(*headers)
+
+            plan = (headers, row)
+            self.column_plans[signature] = plan
+
+        return plan
 
     def point(self, point):
-        line = []
+        self.points([point])
 
-        if 'time' in point:
-            keys = sorted(point.keys())
-            keys.remove('time')
-            keys.insert(0, 'time')
+    def points(self, points, sink=None):
+        rows = []
+
+        for point in points:
+            plan = self.column_plan(point)
+
+            if plan is not self.current_plan:
+                if len(rows) > 0:
+                    self.writer.writerows(rows)
+                    rows = []
+
+                self.output.write('#')
+                self.writer.writerow(plan[0])
+                self.current_plan = plan
+
+            rows.append(plan[1](point))
+
+        self.writer.writerows(rows)
+
+
+class ColumnarFormatter(Formatter):
+    """
+    columnar output using Apache Arrow (https://arrow.apache.org/) which
+    accumulates points into record batches of options.row_group_size points
+    and writes them out as they fill up. The schema of each sink is inferred
+    from its first batch of points, with the time field stored as a UTC
+    timestamp, numbers stored as doubles like JSON does (so a field that's
+    whole in the first batch still keeps its fractions later on), and
+    values not matching the schema (or fields first seen later on) written
+    out as nulls.
+
+    The first sink is written to options.output and any other sinks are
+    written next to it with the sink as a suffix (ie out.sink12.parquet).
+
+    """
+
+    # the columnar file format, either arrow (IPC stream) or parquet
+    file_format = None
+
+    def __init__(self, options):
+        # arrow writes binary data directly to the output file, so there's
+        # no use for the buffered text output of the other formatters
+        self.options = options
+        self.output = None
+
+        try:
+            import pyarrow
+
+        except ImportError:
+            raise JutException('The %s format requires pyarrow, install it '
+                               'with: pip install jut-tools[arrow]' %
+                               self.file_format)
+
+        self.pyarrow = pyarrow
+        self.sinks = {}
+
+        if options.output == None and \
+           (self.file_format == 'parquet' or sys.stdout.isatty()):
+            raise JutException('The %s format requires an output file, '
+                               'specify one with --output' % self.file_format)
+
+    def infer_type(self, name, values):
+        """
+        return the arrow type for the values of the field provided
+
+        """
+        types = set([type(value) for value in values if value != None])
 
+        if name == 'time' and types <= set([str, unicode]):
+            return self.pyarrow.timestamp('ms', tz='UTC')
+
+        if types == set([bool]):
+            return self.pyarrow.bool_()
+
+        # JSON doesn't tell integers apart from other numbers, so neither do
+        # we even when every value seen so far happens to be whole
+        if len(types) > 0 and types <= set([int, long, float]):
+            return self.pyarrow.float64()
+
+        # strings and anything else, which is stored as JSON
+        return self.pyarrow.string()
+
+    def coerce(self, arrow_type, value):
+        """
+        return the value converted to the arrow type provided or None when
+        the value doesn't fit that type
+
+        """
+        if value == None:
+            return None
+
+        if arrow_type == self.pyarrow.string():
+            if isinstance(value, basestring):
+                return value
+            return codec.dumps(value)
+
+        if isinstance(value, bool):
+            if arrow_type == self.pyarrow.bool_():
+                return value
+            return None
+
+        if arrow_type == self.pyarrow.float64():
+            if isinstance(value, (int, long, float)):
+                return float(value)
+            return None
+
+        if isinstance(value, basestring):
+            try:
+                return dates.iso8601_to_epoch_ms(value)
+            except ValueError:
+                return None
+
+        return None
+
+    def open_sink(self, sink, points):
+        """
+        infer the schema from the first batch of points of the sink and open
+        the writer for it
+
+        """
+        output = self.options.output
+
+        if len(self.sinks) > 0:
+            if output == None:
+                raise JutException('The %s format can only write multiple '
+                                   'sinks to files, specify one with --output'
+                                   % self.file_format)
+
+            (root, extension) = os.path.splitext(output)
+            output = '%s.%s%s' % (root, sink, extension)
+
+        names = set()
+        for point in points:
+            names.update(point.keys())
+
+        # time first followed by the rest of the fields in sorted order
+        names = sorted(names)
+        if 'time' in names:
+            names.remove('time')
+            names.insert(0, 'time')
+
+        fields = [self.pyarrow.field(name,
+                                     self.infer_type(name,
+                                                     [point.get(name) for point in points]))
+                  for name in names]
+        schema = self.pyarrow.schema(fields)
+
+        if output == None:
+            stream = sys.stdout
+        else:
+            stream = open(output, 'wb')
+
+        if self.file_format == 'parquet':
+            import pyarrow.parquet
+            writer = pyarrow.parquet.ParquetWriter(stream, schema)
         else:
-            keys = sorted(point.keys())
+            writer = self.pyarrow.RecordBatchStreamWriter(stream, schema)
 
-        if self.current_headers != keys:
-            info('#%s' % ','.join(keys))
-            self.current_headers = keys
+        self.sinks[sink] = {
+            'schema': schema,
+            'names': set(names),
+            'stream': stream,
+            'writer': writer,
+            'points': [],
+            'mismatched': False
+        }
 
-        line += [str(point[key]) for key in keys]
-        info(','.join(line))
+    def write_batch(self, sink):
+        """
+        write out the points accumulated for the sink as a single batch
+
+        """
+        state = self.sinks[sink]
+        points = state['points']
+        state['points'] = []
+
+        if len(points) == 0:
+            return
+
+        arrays = []
+        for field in state['schema']:
+            values = []
+
+            for point in points:
+                value = point.get(field.name)
+                coerced = self.coerce(field.type, value)
+
+                if coerced == None and value != None:
+                    state['mismatched'] = True
+
+                values.append(coerced)
+
+            arrays.append(self.pyarrow.array(values, type=field.type))
+
+        for point in points:
+            if not state['names'].issuperset(point):
+                state['mismatched'] = True
+                break
+
+        batch = self.pyarrow.RecordBatch.from_arrays(arrays, state['schema'].names)
+
+        if self.file_format == 'parquet':
+            state['writer'].write_table(self.pyarrow.Table.from_batches([batch]),
+                                        row_group_size=self.options.row_group_size)
+        else:
+            state['writer'].write_batch(batch)
+
+    def points(self, points, sink=None):
+        if len(points) == 0:
+            return
+
+        if sink not in self.sinks:
+            self.open_sink(sink, points)
+
+        state = self.sinks[sink]
+        state['points'].extend(points)
+
+        if len(state['points']) >= self.options.row_group_size:
+            self.write_batch(sink)
+
+    def frame_end(self):
+        pass
+
+    def stop(self):
+        for sink in self.sinks.keys():
+            self.write_batch(sink)
+
+            state = self.sinks[sink]
+            state['writer'].close()
+
+            if state['stream'] != sys.stdout:
+                state['stream'].close()
+
+            if state['mismatched']:
+                error('Warning: some values of sink %s did not match the '
+                      'inferred schema and were written as nulls' % sink)
+
+        self.sinks = {}
+
+
+class ArrowFormatter(ColumnarFormatter):
+
+    file_format = 'arrow'
+
+
+class ParquetFormatter(ColumnarFormatter):
+
+    file_format = 'parquet'
+
+
+FORMATTERS = {
+    'json': JSONFormatter,
+    'ndjson': NDJSONFormatter,
+    'text': TextFormatter,
+    'csv': CSVFormatter,
+    'arrow': ArrowFormatter,
+    'parquet': ParquetFormatter
+}
+
+
+# output formats implied by the extension of an output file
+FORMAT_EXTENSIONS = {
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.txt': 'text',
+    '.csv': 'csv',
+    '.arrow': 'arrow',
+    '.parquet': 'parquet'
+}
+
+
+def get_format_for_filename(filename, default=None):
+    """
+    return the output format implied by the extension of the filename
+    provided or the default when the extension isn't a known one
+
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return FORMAT_EXTENSIONS.get(extension, default)
+
+
+def get_formatter(format_name, options, output=None):
+    """
+    return a new formatter for the output format with the name provided
 
+    """
+    if format_name not in FORMATTERS:
+        raise JutException('Unsupported output format "%s"' % format_name)
 
+    if output != None:
+        return FORMATTERS[format_name](options, output=output)
+    else:
+        return FORMATTERS[format_name](options)
@@ -0,0 +1,128 @@
+"""
+JSON codec used for websocket payloads, HTTP bodies and output formatting.
+
+The fastest JSON implementation installed is picked automatically (ujson,
+then simplejson, falling back to the standard library json module) and can
+be overridden with the JUT_JSON_CODEC environment variable or set_codec.
+Encoding always goes through simplejson or the json module, which round
+trip floats exactly.
+
+"""
+
+import json
+import os
+
+from jut.exceptions import JutException
+
+
+def _compact_dumps(module):
+    """
+    internal method to wrap the dumps of json like modules so they produce
+    compact JSON without any whitespace unless indenting
+
+    """
+    def dumps(obj, indent=None):
+        if indent == None:
+            return module.dumps(obj, separators=(',', ':'))
+        else:
+            return module.dumps(obj, indent=indent, separators=(',', ': '))
+
+    return dumps
+
+
+def _json_codec():
+    return json.loads, _compact_dumps(json)
+
+
+def _simplejson_codec():
+    import simplejson
+    return simplejson.loads, _compact_dumps(simplejson)
+
+
+def _ujson_codec():
+    """
+    ujson only decodes, as its encoder rounds floats to at most 15 digits
+    and escapes forward slashes, the JSON is encoded with simplejson or the
+    json module instead
+
+    """
+    import ujson
+
+    try:
+        (fallback_loads, dumps) = _simplejson_codec()
+
+    except ImportError:
+        (fallback_loads, dumps) = _json_codec()
+
+    def loads(data):
+        try:
+            # precise_float so we parse floats exactly like the json module
+            return ujson.loads(data, precise_float=True)
+
+        except ValueError:
+            # ie integers too large for ujson
+            return fallback_loads(data)
+
+    return loads, dumps
+
+
+# supported codecs in order of preference
+CODECS = [
+    ('ujson', _ujson_codec),
+    ('simplejson', _simplejson_codec),
+    ('json', _json_codec)
+]
+
+# name of the codec currently in use along with its loads(data) and
+# dumps(obj, indent=None) functions, all set by set_codec
+NAME = None
+loads = None
+dumps = None
+
+
+def available_codecs():
+    """
+    return the names of the codecs that can be used with the currently
+    installed modules
+
+    """
+    names = []
+
+    for (name, codec) in CODECS:
+        try:
+            codec()
+            names.append(name)
+
+        except ImportError:
+            pass
+
+    return names
+
+
+def set_codec(name=None):
+    """
+    switch to the codec with the name provided or to the fastest available
+    codec when no name is given
+
+    """
+    global NAME, loads, dumps
+
+    if name == None:
+        name = available_codecs()[0]
+
+    for (codec_name, codec) in CODECS:
+        if codec_name == name:
+            try:
+                loads, dumps = codec()
+
+            except ImportError:
+                raise JutException('JSON codec "%s" is not installed' % name)
+
+            NAME = name
+            return
+
+    raise JutException('Unknown JSON codec "%s", available codecs are: %s' %
+                       (name, ', '.join(available_codecs())))
+
+
+set_codec(os.environ.get('JUT_JSON_CODEC'))
@@ -7,6 +7,12 @@ def iso8601_to_epoch(iso8601):
     return int((date - datetime.utcfromtimestamp(0)).total_seconds())
 
 
+def iso8601_to_epoch_ms(iso8601):
+    date = datetime.strptime(iso8601, "%Y-%m-%dT%H:%M:%S.%fZ")
+    delta = date - datetime.utcfromtimestamp(0)
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
 def datetime_to_iso8601(date):
     """
     take a datetime object and return it formatted per ISO8601 date format spec
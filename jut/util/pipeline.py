@@ -0,0 +1,306 @@
+"""
+pipeline decoupling the websocket of a running job from the formatters.
+
+A reader thread drives the payloads of the job (ie data_engine.run), which
+keeps receiving frames and answering the heartbeats of the data engine no
+matter how slowly the payloads are consumed, and hands them over to the
+consumer through a buffer bounded to a number of payloads and, optionally
+with the spill policy, to a memory watermark. What happens once the buffer
+is full depends on the backpressure policy:
+
+ * spill (the default): payloads are spilled to segment files on disk (see
+          jut.util.spill) and read back in order once the buffer is drained,
+          which keeps the memory used flat however bursty the job is
+ * drop: points payloads are dropped, and counted, until there's room again
+ * block: the reader waits for room in the buffer, throttling the job as
+          if there was no pipeline at all, which leaves the heartbeats of
+          the data engine unanswered while it waits
+
+The disk I/O of the spill happens outside of the lock shared by the reader
+and the consumer, so neither waits on the other's reads and writes.
+
+"""
+
+import sys
+import threading
+
+from collections import deque
+
+from jut.exceptions import JutException
+from jut.util import codec
+from jut.util.spill import SpillBuffer
+
+BLOCK = 'block'
+DROP = 'drop'
+SPILL = 'spill'
+
+POLICIES = [BLOCK, DROP, SPILL]
+
+# seconds between checks of whether the other side of the pipeline stopped
+# while waiting on it
+POLL_INTERVAL = 0.5
+
+
+def estimate_size(payload):
+    """
+    estimate the size of the payload provided from the size of its JSON
+    encoding, extrapolated from its first point for points payloads
+
+    """
+    if 'raw_points' in payload:
+        return len(payload['raw_points'])
+
+    points = payload.get('points')
+
+    if points:
+        return len(points) * len(codec.dumps(points[0]))
+
+    return len(codec.dumps(payload))
+
+
+class Pipeline(object):
+    """
+    iterable over the payloads provided, which are read ahead in a reader
+    thread:
+
+        pipeline = Pipeline(client.run(juttle), policy=pipeline.SPILL)
+
+        for payload in pipeline:
+            ...
+
+    Errors raised reading the payloads are raised again by the iteration.
+    """
+
+    def __init__(self,
+                 payloads,
+                 max_payloads=1000,
+                 policy=SPILL,
+                 memory_watermark=None,
+                 directory=None,
+                 max_spill_bytes=None):
+        """
+        payloads: iterator over the payloads of a job
+        max_payloads: number of payloads buffered in memory
+        policy: what to do when the buffer is full, one of POLICIES
+        memory_watermark: bytes of payloads (see estimate_size) buffered in
+                          memory after which the buffer is full with the
+                          spill policy, by default only max_payloads applies
+        directory: directory the spill segments are created in, by default
+                   the system temp directory
+        max_spill_bytes: bytes spilled to disk, and not read back yet, after
+                         which the reader waits for room like with the block
+                         policy, by default the spill is unbounded
+        """
+        if policy not in POLICIES:
+            raise JutException('Unknown backpressure policy "%s", use one of: %s' %
+                               (policy, ', '.join(POLICIES)))
+
+        self.payloads = payloads
+        self.max_payloads = max_payloads
+        self.policy = policy
+        self.directory = directory
+
+        # the other policies only bound the buffer to max_payloads, which
+        # spares every payload the cost of estimating its size
+        self.memory_watermark = None
+
+        if policy == SPILL:
+            self.memory_watermark = memory_watermark
+
+        # payloads buffered in memory along with their estimated size
+        self.buffer = deque()
+        self.buffered_bytes = 0
+
+        self.condition = threading.Condition()
+        self.finished = False
+        self.stopped = False
+        self.exc_info = None
+
+        # payloads and points dropped with the drop policy
+        self.dropped_payloads = 0
+        self.dropped_points = 0
+
+        # the spill is guarded by its own lock, see _spill and _unspill
+        self.spill = SpillBuffer(directory=directory, max_bytes=max_spill_bytes)
+        self.spill_lock = threading.Lock()
+
+        # payloads in the spill waiting to be read back, and the total
+        # number of payloads spilled to disk
+        self.spilled = 0
+        self.spilled_payloads = 0
+
+    def _is_full(self):
+        if len(self.buffer) >= self.max_payloads:
+            return True
+
+        return self.memory_watermark != None and \
+               self.buffered_bytes >= self.memory_watermark
+
+    def _must_wait(self):
+        if self.policy == BLOCK:
+            return self._is_full()
+
+        if self.policy == SPILL:
+            return self.spill.is_full()
+
+        return False
+
+    def _append(self, payload):
+        size = 0
+
+        if self.memory_watermark != None:
+            size = estimate_size(payload)
+
+        self.buffer.append((payload, size))
+        self.buffered_bytes += size
+
+    def _spill(self, payload):
+        """
+        internal method run by the reader thread to spill the payload to
+        disk, returns False once the consumer stopped
+
+        """
+        with self.spill_lock:
+            # the spill is closed once the consumer stopped
+            if self.stopped:
+                return False
+
+            self.spill.append(payload)
+
+        with self.condition:
+            self.spilled += 1
+            self.spilled_payloads += 1
+            self.condition.notify_all()
+
+        return True
+
+    def _unspill(self):
+        """
+        internal method run by the consumer to read back the oldest payload
+        spilled to disk
+
+        """
+        with self.spill_lock:
+            payload = self.spill.pop()
+
+        with self.condition:
+            self.spilled -= 1
+            self.condition.notify_all()
+
+        return payload
+
+    def _put(self, payload):
+        """
+        internal method to hand the payload over to the consumer according
+        to the backpressure policy, returns False once the consumer stopped
+
+        """
+        spill = False
+
+        with self.condition:
+            while self._must_wait() and not self.stopped:
+                self.condition.wait(POLL_INTERVAL)
+
+            if self.stopped:
+                return False
+
+            if self.spilled > 0 or (self.policy == SPILL and self._is_full()):
+                # once spilling everything is spilled, until it was all read
+                # back, to keep the payloads in order. Only the reader spills
+                # so nothing gets in between this and the spill below.
+                spill = True
+
+            elif not self._is_full():
+                self._append(payload)
+
+            elif 'points' in payload or 'raw_points' in payload:
+                self.dropped_payloads += 1
+                self.dropped_points += len(payload.get('points', []))
+
+            else:
+                # the job details, errors and end of the job are never dropped
+                self._append(payload)
+
+            self.condition.notify_all()
+
+        if spill:
+            return self._spill(payload)
+
+        return True
+
+    def _read(self):
+        """
+        internal method run by the reader thread
+
+        """
+        try:
+            for payload in self.payloads:
+                if not self._put(payload):
+                    break
+
+        except Exception:
+            self.exc_info = sys.exc_info()
+
+        finally:
+            if hasattr(self.payloads, 'close'):
+                self.payloads.close()
+
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def _get(self):
+        """
+        internal method to return the next payload, None once there are no
+        more payloads
+
+        """
+        with self.condition:
+            while len(self.buffer) == 0 and self.spilled == 0 and not self.finished:
+                self.condition.wait(POLL_INTERVAL)
+
+            if len(self.buffer) > 0:
+                (payload, size) = self.buffer.popleft()
+                self.buffered_bytes -= size
+                self.condition.notify_all()
+                return payload
+
+            if self.spilled == 0:
+                return None
+
+        # the buffer only fills up again once the spill was read back so
+        # everything buffered is older than what's spilled
+        return self._unspill()
+
+    def stop(self):
+        """
+        stop reading payloads, the reader thread stops after the payload it
+        is currently reading
+
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def __iter__(self):
+        thread = threading.Thread(target=self._read)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                payload = self._get()
+
+                if payload == None:
+                    break
+
+                yield payload
+
+            if self.exc_info != None:
+                raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+        finally:
+            self.stop()
+
+            with self.spill_lock:
+                self.spill.close()
@@ -0,0 +1,139 @@
+"""
+disk spill of payloads for the payloads a consumer can't keep up with.
+
+Payloads are appended, pickled and prefixed with their length, to segment
+files in a temporary directory and read back in the order they were
+written, exactly as they were spilled (unlike a JSON codec which may round
+floats or big integers). Each
+segment is removed as soon as it's been read back entirely, so the disk
+used only grows with the payloads still waiting to be read, and reading
+back only holds a single payload in memory at a time.
+
+"""
+
+import cPickle
+import os
+import shutil
+import struct
+import tempfile
+
+from collections import deque
+
+# bytes written to a segment file before starting the next one
+SEGMENT_SIZE = 16 * 1024 * 1024
+
+# length of the pickled payload which precedes it in the segment file
+HEADER = struct.Struct('!I')
+
+
+class _Segment(object):
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.writer = open(filepath, 'wb')
+        self.reader = open(filepath, 'rb')
+        self.size = 0
+        self.written = 0
+        self.read = 0
+
+    def remove(self):
+        self.writer.close()
+        self.reader.close()
+        os.remove(self.filepath)
+
+
+class SpillBuffer(object):
+    """
+    first in first out buffer of payloads spilled to segment files, not
+    thread safe
+
+    """
+
+    def __init__(self, directory=None, segment_size=SEGMENT_SIZE, max_bytes=None):
+        """
+        directory: directory to create the temporary segments directory in,
+                   by default the system temp directory
+        segment_size: bytes written to each segment file
+        max_bytes: bytes of spilled payloads not yet read back after which
+                   the buffer is full, by default it never is
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+
+        self.segments_directory = None
+        self.segments = deque()
+        self.created = 0
+
+        # payloads and bytes spilled but not read back yet
+        self.payloads = 0
+        self.bytes = 0
+
+    def __len__(self):
+        return self.payloads
+
+    def is_full(self):
+        return self.max_bytes != None and self.bytes >= self.max_bytes
+
+    def append(self, payload):
+        if self.segments_directory == None:
+            self.segments_directory = tempfile.mkdtemp(dir=self.directory,
+                                                       prefix='jut-spill-')
+
+        if len(self.segments) == 0 or self.segments[-1].size >= self.segment_size:
+            if len(self.segments) > 0:
+                # done writing to the previous segment
+                self.segments[-1].writer.close()
+
+            filepath = os.path.join(self.segments_directory,
+                                    'segment-%08d' % self.created)
+            self.segments.append(_Segment(filepath))
+            self.created += 1
+
+        data = cPickle.dumps(payload, cPickle.HIGHEST_PROTOCOL)
+        data = HEADER.pack(len(data)) + data
+        segment = self.segments[-1]
+        segment.writer.write(data)
+        segment.size += len(data)
+        segment.written += 1
+
+        self.payloads += 1
+        self.bytes += len(data)
+
+    def pop(self):
+        """
+        remove and return the oldest payload spilled
+
+        """
+        segment = self.segments[0]
+
+        if segment is self.segments[-1]:
+            # still being written to
+            segment.writer.flush()
+
+        (length,) = HEADER.unpack(segment.reader.read(HEADER.size))
+        data = segment.reader.read(length)
+        segment.read += 1
+
+        self.payloads -= 1
+        self.bytes -= HEADER.size + length
+
+        if segment.read == segment.written:
+            # read back entirely, which for the segment still being written
+            # to means everything was read back and the next payload
+            # spilled starts a new segment
+            self.segments.popleft().remove()
+
+        return cPickle.loads(data)
+
+    def close(self):
+        """
+        remove all of the segment files
+
+        """
+        while len(self.segments) > 0:
+            self.segments.popleft().remove()
+
+        if self.segments_directory != None:
+            shutil.rmtree(self.segments_directory, ignore_errors=True)
+            self.segments_directory = None
@@ -22,6 +22,11 @@ setup(
         'tabulate==0.7.5'
     ],
 
+    extras_require={
+        'ujson': ['ujson==1.35'],
+        'arrow': ['pyarrow']
+    },
+
     test_suite='tests',
     keywords=[''],
 
@@ -9,6 +9,29 @@ import tempfile
 from jut.common import info, error
 
 
+# the local fake jut server when running with JUT_FAKE_SERVER set
+FAKE_SERVER = None
+
+
+def start_fake_server():
+    """
+    start a local fake jut server and point the tests at it, any juttle
+    programs the tests run have to be scripted on FAKE_SERVER
+
+    """
+    global FAKE_SERVER
+
+    from tests.fake_server import FakeJutServer
+
+    FAKE_SERVER = FakeJutServer(username='jut-tools-admin',
+                                password='bigdata')
+    FAKE_SERVER.start()
+
+    os.environ['JUT_USER'] = 'jut-tools-admin'
+    os.environ['JUT_PASS'] = 'bigdata'
+    os.environ['JUT_APP_URL'] = FAKE_SERVER.url
+
+
 def init():
     """
     initialize the testing configuration
@@ -19,6 +42,9 @@ def init():
     # source and not any installed version of the jut tools
     os.environ.setdefault('PYTHONPATH', '.')
 
+    if os.environ.get('JUT_FAKE_SERVER') != None:
+        start_fake_server()
+
     if os.environ.get('JUT_USER') == None or \
     os.environ.get('JUT_PASS') == None:
         info('')
@@ -27,6 +53,13 @@ def init():
         info('')
         info(' JUT_USER=username JUT_PASS=password python setup.py test')
         info('')
+        info('or run the tests that only need a local fake jut server (see ')
+        info('tests/fake_server.py), the rest of them need a real deployment:')
+        info('')
+        info(' JUT_FAKE_SERVER=1 python setup.py test -s tests.fake_server_tests')
+        info('')
+        info('along with the other offline test cases listed in the README.')
+        info('')
         sys.exit(1)
 
     info('')
@@ -8,6 +8,8 @@ from jut.exceptions import JutException
 
 from tests.util import get_test_user_pass, get_test_app_url
 
+import os
+import tempfile
 import unittest
 
 
@@ -118,3 +120,35 @@ class AccountsAPITests(unittest.TestCase):
                                     app_url=app_url):
             raise Exception('User exists API failed for "%s"' % username)
 
+
+    def test_get_account_lookup_uses_cache(self):
+        """
+        verify account details are saved to the accounts cache and that a
+        subsequent lookup is answered from the cache without any requests
+
+        """
+        username, password = get_test_user_pass()
+        app_url = get_test_app_url()
+
+        token_manager = auth.TokenManager(username=username,
+                                          password=password,
+                                          app_url=app_url)
+
+        account_id = accounts.get_logged_in_account_id(token_manager=token_manager,
+                                                       app_url=app_url)
+
+        cache_filepath = os.path.join(tempfile.mkdtemp(), 'accounts.cache')
+        account_lookup = accounts.get_account_lookup([account_id],
+                                                     cache_filepath=cache_filepath,
+                                                     token_manager=token_manager,
+                                                     app_url=app_url)
+
+        self.assertEqual(account_lookup[account_id]['username'], username)
+        self.assertTrue(os.path.exists(cache_filepath))
+
+        # no token manager so any attempt to hit the accounts API would fail
+        account_lookup = accounts.get_account_lookup([account_id],
+                                                     cache_filepath=cache_filepath,
+                                                     app_url=app_url)
+
+        self.assertEqual(account_lookup[account_id]['username'], username)
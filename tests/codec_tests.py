@@ -0,0 +1,41 @@
+"""
+JSON codec tests, which don't talk to Jut and can run offline with:
+
+    JUT_FAKE_SERVER=1 python -m unittest tests.codec_tests
+
+"""
+
+from jut.util import codec
+
+import json
+import unittest
+
+
+class CodecTests(unittest.TestCase):
+
+
+    def tearDown(self):
+        codec.set_codec()
+
+
+    def test_codecs_round_trip(self):
+        """
+        verify every available codec encodes like the json module and decodes
+        what it encodes without altering any values
+
+        """
+        obj = {
+            'sum': 0.1 + 0.2,
+            'time': 1443855589233.123,
+            'big': 123456789012345678901234567890,
+            'url': 'http://docs.jut.io/',
+            'nested': {'value': 1}
+        }
+
+        for name in codec.available_codecs():
+            codec.set_codec(name)
+
+            self.assertEqual(codec.loads(codec.dumps(obj)), obj)
+            self.assertEqual(codec.loads(json.dumps(obj)), obj)
+            self.assertEqual(codec.dumps(obj, indent=2),
+                             json.dumps(obj, indent=2, separators=(',', ': ')))
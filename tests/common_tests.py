@@ -0,0 +1,119 @@
+"""
+buffered output tests, which don't talk to Jut and can run offline with:
+
+    JUT_FAKE_SERVER=1 python -m unittest tests.common_tests
+
+"""
+
+from jut.common import BufferedOutput
+
+import StringIO
+import time
+import unittest
+
+
+class Stream(StringIO.StringIO):
+    """
+    in memory stream keeping what was written out by the time of each flush
+
+    """
+
+    def __init__(self, tty=False):
+        StringIO.StringIO.__init__(self)
+        self.tty = tty
+        self.flushed = []
+
+    def isatty(self):
+        return self.tty
+
+    def flush(self):
+        self.flushed.append(self.getvalue())
+
+
+class BufferedOutputTests(unittest.TestCase):
+
+
+    def test_line_policy(self):
+        """
+        verify every write is flushed right away
+
+        """
+        stream = Stream()
+        output = BufferedOutput(stream, policy='line')
+
+        output.write('a\n')
+        output.write('b\n')
+
+        self.assertEqual(stream.flushed, ['a\n', 'a\nb\n'])
+
+
+    def test_frame_policy(self):
+        """
+        verify the writes are only flushed at the end of each frame
+
+        """
+        stream = Stream()
+        output = BufferedOutput(stream, policy='frame')
+
+        output.write('a\n')
+        output.write('b\n')
+        self.assertEqual(stream.getvalue(), '')
+
+        output.frame_end()
+        output.write('c\n')
+        output.frame_end()
+
+        self.assertEqual(stream.flushed, ['a\nb\n', 'a\nb\nc\n'])
+
+
+    def test_size_policy(self):
+        """
+        verify the writes are flushed once enough of them are buffered, and
+        not at the end of each frame
+
+        """
+        stream = Stream()
+        output = BufferedOutput(stream, policy='size', flush_size=4)
+
+        output.write('ab')
+        output.frame_end()
+        self.assertEqual(stream.getvalue(), '')
+
+        output.write('cd')
+        output.write('e')
+        self.assertEqual(stream.flushed, ['abcd'])
+
+        output.flush()
+        self.assertEqual(stream.flushed, ['abcd', 'abcde'])
+
+
+    def test_size_policy_interval(self):
+        """
+        verify the writes are flushed once the flush interval passed, even
+        in the middle of a frame
+
+        """
+        stream = Stream()
+        output = BufferedOutput(stream, policy='size', flush_interval=0.1)
+
+        output.write('a')
+        self.assertEqual(stream.getvalue(), '')
+
+        time.sleep(0.2)
+        output.write('b')
+        self.assertEqual(stream.flushed, ['ab'])
+
+        time.sleep(0.2)
+        output.write('c')
+        output.frame_end()
+        self.assertEqual(stream.flushed, ['ab', 'abc'])
+
+
+    def test_auto_policy(self):
+        """
+        verify terminals are written to line by line and anything else in
+        larger chunks
+
+        """
+        self.assertEqual(BufferedOutput(Stream(tty=True)).policy, 'line')
+        self.assertEqual(BufferedOutput(Stream()).policy, 'size')
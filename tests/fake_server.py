@@ -0,0 +1,1305 @@
+"""
+local stand-in for the Jut APIs used by the jut tools, so the integration
+tests and benchmarks can run without access to a live Jut deployment.
+
+A single server answers for the app, auth, deployment and data engine urls
+and implements:
+
+    * /environment
+    * the auth flow: /local, /status, /token and /api/v1/authorizations
+    * accounts: /api/v1/accounts and /api/v1/account
+    * deployments along with their apikey, spaces and accounts
+    * jobs: /api/v1/jobs
+    * programs: /api/v1/app/programs
+    * the webhook import endpoint: /api/v1/import/webhook/
+    * the /api/v1/juttle/channel websocket
+
+There's no juttle compiler behind it, instead each juttle program has to be
+scripted ahead of time with the exact payloads the websocket sends when the
+program runs:
+
+    server = FakeJutServer()
+    server.start()
+
+    server.script('emit -limit 1', [
+        {'points': [{'time': '2014-01-01T00:00:00.000Z'}]}
+    ])
+
+    ... point the jut tools at server.url ...
+
+    server.stop()
+
+Latency can be added to every HTTP response and websocket frame, and
+failures injected into specific endpoints or websocket streams, which can
+also be stalled in the middle of a frame or have their job killed. With
+compression the channel websocket negotiates the permessage-deflate
+extension when the client offers it. With sequence_frames every frame of a
+job carries its index under 'seq' and a client reconnecting with
+'resume_after' gets the frames following it.
+
+The server can also be run on its own, with the programs scripted in a JSON
+file mapping each program to its list of payloads:
+
+    python tests/fake_server.py --port 8080 --script programs.json
+
+Don't import this through the tests package, which requires a configured
+test environment, instead add the tests directory to sys.path and import
+fake_server directly.
+
+"""
+
+import argparse
+import base64
+import BaseHTTPServer
+import Cookie
+import hashlib
+import json
+import os
+import re
+import select
+import socket
+import SocketServer
+import struct
+import sys
+import threading
+import time
+import urlparse
+import uuid
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from jut.common import info
+
+# used to compute the Sec-WebSocket-Accept handshake header (RFC 6455)
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# websocket opcodes
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xa
+
+# seconds to wait for a job to be created on a channel before giving up
+CHANNEL_TIMEOUT = 30
+
+# default sink channel and name for scripted points without a sink
+DEFAULT_SINK = 'sink0'
+DEFAULT_SINK_NAME = 'table'
+
+ACCESS_TOKEN_EXPIRES_IN = 3600
+
+
+def _new_id():
+    return uuid.uuid4().hex[:8]
+
+
+def _read_exactly(sock, length):
+    """
+    read exactly length bytes from the socket or raise an IOError when the
+    connection is closed before then
+
+    """
+    data = ''
+
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+
+        if chunk == '':
+            raise IOError('connection closed')
+
+        data += chunk
+
+    return data
+
+
+def recv_frame(sock):
+    """
+    read a single websocket frame sent by a client and return its opcode and
+    unmasked payload
+
+    """
+    (first, second) = struct.unpack('!BB', _read_exactly(sock, 2))
+    opcode = first & 0x0f
+    length = second & 0x7f
+
+    if length == 126:
+        (length,) = struct.unpack('!H', _read_exactly(sock, 2))
+
+    elif length == 127:
+        (length,) = struct.unpack('!Q', _read_exactly(sock, 8))
+
+    mask = None
+    if second & 0x80:
+        mask = bytearray(_read_exactly(sock, 4))
+
+    payload = bytearray(_read_exactly(sock, length))
+
+    if mask != None:
+        for index in range(0, length):
+            payload[index] ^= mask[index % 4]
+
+    return (opcode, str(payload))
+
+
+class DeflateSocket(object):
+    """
+    websocket connection on which the permessage-deflate extension (RFC
+    7692) was negotiated, the text frames sent over it are compressed
+
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                                           zlib.DEFLATED,
+                                           -zlib.MAX_WBITS)
+
+    def compress(self, payload):
+        data = self.compressor.compress(payload) + \
+               self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        # the sender drops the tail of the sync flush
+        return data[:-4]
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def encode_frame(sock, payload, opcode=OPCODE_TEXT):
+    """
+    return a single unmasked websocket frame with the payload provided,
+    compressed when to be sent over a DeflateSocket
+
+    """
+    first = 0x80 | opcode
+
+    if opcode == OPCODE_TEXT and isinstance(sock, DeflateSocket):
+        payload = sock.compress(payload)
+        first |= 0x40
+
+    length = len(payload)
+
+    if length < 126:
+        header = struct.pack('!BB', first, length)
+
+    elif length < 65536:
+        header = struct.pack('!BBH', first, 126, length)
+
+    else:
+        header = struct.pack('!BBQ', first, 127, length)
+
+    return header + payload
+
+
+def send_frame(sock, payload, opcode=OPCODE_TEXT):
+    """
+    send a single unmasked websocket frame with the payload provided (see
+    encode_frame)
+
+    """
+    sock.sendall(encode_frame(sock, payload, opcode=opcode))
+
+
+def points_frames(points, points_per_frame=100, sink=DEFAULT_SINK):
+    """
+    return the points payloads to script a program that outputs the points
+    provided, points_per_frame at a time
+
+    """
+    frames = []
+
+    for start in range(0, len(points), points_per_frame):
+        frames.append({
+            'points': points[start:start + points_per_frame],
+            'sink': sink
+        })
+
+    return frames
+
+
+class _HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class):
+        BaseHTTPServer.HTTPServer.__init__(self, server_address, handler_class)
+        self.connections = set()
+
+    def process_request(self, request, client_address):
+        # keep track of the open connections so they can be closed on stop
+        self.connections.add(request)
+        SocketServer.ThreadingMixIn.process_request(self, request, client_address)
+
+    def shutdown_request(self, request):
+        self.connections.discard(request)
+        BaseHTTPServer.HTTPServer.shutdown_request(self, request)
+
+    def close_connections(self):
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+
+            except socket.error:
+                pass
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    request handler which routes each request to the FakeJutServer handling
+    it, see FakeJutServer.ROUTES
+
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    # buffer each response and send it without waiting on Nagle's algorithm,
+    # otherwise the status line and headers go out as separate small packets
+    # and every request pays for a delayed ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.fake.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def handle_request(self, method):
+        fake = self.server.fake
+        parsed = urlparse.urlparse(self.path)
+
+        length = int(self.headers.get('content-length', 0))
+        self.body = self.rfile.read(length) if length > 0 else ''
+        self.query = dict(urlparse.parse_qsl(parsed.query))
+
+        if fake.latency > 0:
+            time.sleep(fake.latency)
+
+        failure = fake.take_failure(parsed.path)
+        if failure != None:
+            self.respond(failure, {'message': 'injected failure'})
+            return
+
+        for (route_method, pattern, name) in fake.ROUTES:
+            match = re.match(pattern + '$', parsed.path)
+
+            if route_method == method and match != None:
+                getattr(fake, name)(self, *match.groups())
+                return
+
+        self.respond(404, {'message': 'Not found: %s %s' % (method, parsed.path)})
+
+    def do_GET(self):
+        if self.headers.get('upgrade', '').lower() == 'websocket':
+            self.server.fake.websocket(self)
+        else:
+            self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def respond(self, status, payload=None, headers={}):
+        """
+        send a response with the payload (if any) as its JSON body
+
+        """
+        body = json.dumps(payload) if payload != None else ''
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def json(self):
+        return json.loads(self.body)
+
+    def form(self):
+        return dict(urlparse.parse_qsl(self.body))
+
+
+class FakeJutServer(object):
+    """
+    in memory Jut server, see the module documentation for details
+
+    """
+
+    # (method, path regex, handler method)
+    ROUTES = [
+        ('GET', r'/environment', 'get_environment'),
+        ('POST', r'/local', 'post_local'),
+        ('GET', r'/status', 'get_status'),
+        ('POST', r'/token', 'post_token'),
+        ('POST', r'/api/v1/authorizations', 'post_authorization'),
+        ('GET', r'/api/v1/account', 'get_account'),
+        ('GET', r'/api/v1/accounts', 'get_account_by_username'),
+        ('POST', r'/api/v1/accounts', 'post_account'),
+        ('GET', r'/api/v1/accounts/([^/]+)', 'get_accounts'),
+        ('DELETE', r'/api/v1/accounts/([^/]+)', 'delete_account'),
+        ('GET', r'/api/v1/deployments', 'get_deployments'),
+        ('POST', r'/api/v1/deployments', 'post_deployment'),
+        ('GET', r'/api/v1/deployments/([^/]+)', 'get_deployment'),
+        ('GET', r'/api/v1/deployments/([^/]+)/apikey', 'get_apikey'),
+        ('GET', r'/api/v1/deployments/([^/]+)/spaces', 'get_spaces'),
+        ('POST', r'/api/v1/deployments/([^/]+)/spaces', 'post_space'),
+        ('DELETE', r'/api/v1/deployments/([^/]+)/spaces/([^/]+)', 'delete_space'),
+        ('GET', r'/api/v1/deployments/([^/]+)/accounts', 'get_deployment_accounts'),
+        ('PUT', r'/api/v1/deployments/([^/]+)/accounts/([^/]+)', 'put_deployment_account'),
+        ('GET', r'/api/v1/jobs', 'get_jobs'),
+        ('POST', r'/api/v1/jobs', 'post_job'),
+        ('DELETE', r'/api/v1/jobs/([^/]+)', 'delete_job'),
+        ('GET', r'/api/v1/app/programs', 'get_programs'),
+        ('POST', r'/api/v1/app/programs', 'post_program'),
+        ('PUT', r'/api/v1/app/programs', 'put_program'),
+        ('POST', r'/api/v1/import/webhook/?', 'post_webhook')
+    ]
+
+    def __init__(self,
+                 host='127.0.0.1',
+                 port=0,
+                 username='jut-tools-admin',
+                 password='bigdata',
+                 deployment_name='jut-tools-deployment',
+                 latency=0,
+                 frame_latency=0,
+                 ping_interval=5,
+                 store_imports=True,
+                 sequence_frames=False,
+                 compression=False,
+                 verbose=False):
+        """
+        host, port: address to listen on, by default a free local port
+        username, password: credentials of the admin account
+        deployment_name: name of the deployment the admin account is in
+        latency: seconds to wait before answering each HTTP request
+        frame_latency: seconds to wait before sending each websocket frame
+        ping_interval: seconds between heartbeats once a persistent job has
+                       sent all of its scripted payloads
+        store_imports: keep the points imported through the webhook in
+                       self.imported, otherwise only count them
+        sequence_frames: number the frames of each job and resume jobs
+                         after the frame the client reconnects with, the
+                         frame in flight when disconnecting the job (see
+                         disconnect_after) is then lost unless the client
+                         resumes after the last frame it received
+        compression: negotiate the permessage-deflate extension with the
+                     clients offering it and compress the frames sent to
+                     them
+        verbose: log each HTTP request to stderr
+        """
+        self.latency = latency
+        self.frame_latency = frame_latency
+        self.ping_interval = ping_interval
+        self.store_imports = store_imports
+        self.sequence_frames = sequence_frames
+        self.compression = compression
+        self.verbose = verbose
+
+        self.lock = threading.RLock()
+
+        self.accounts = {}
+        self.authorizations = {}
+        self.tokens = {}
+        self.sessions = {}
+        self.deployments = {}
+        self.programs = []
+        self.jobs = {}
+        self.channels = {}
+        self.scripts = {}
+
+        self.failures = []
+        self.disconnects = 0
+        self.stalls = 0
+
+        # number of channel websockets opened so far, how many of them were
+        # compressed and how many are still open
+        self.websockets = 0
+        self.compressed_websockets = 0
+        self.open_websockets = 0
+
+        # space name to the list of points imported through the webhook
+        self.imported = {}
+        self.imported_points = 0
+        self.imported_bytes = 0
+        self.import_requests = 0
+
+        self.httpd = _HTTPServer((host, port), _Handler)
+        self.httpd.fake = self
+        self.thread = None
+
+        (host, port) = self.httpd.server_address
+        self.url = 'http://%s:%s' % (host, port)
+
+        account = self.create_account(username, password, name=username)
+        self.create_deployment(deployment_name, account['id'])
+
+    def start(self):
+        """
+        start serving requests on a background thread
+
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """
+        stop serving requests
+
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.httpd.close_connections()
+
+        if self.thread != None:
+            self.thread.join()
+
+    # scripting and failure injection
+
+    def script(self, program, frames, sinks=None, persistent=False):
+        """
+        script the payloads sent when the juttle program provided is run,
+        frames being the list of payloads (ie points, warnings, errors or
+        heartbeats) sent after the job starts. Payloads with points and
+        without a sink are sent for DEFAULT_SINK.
+
+        sinks: list of (channel, name) of the sinks of the program, by
+               default derived from the sinks the points are sent to
+        persistent: if True the job keeps running once all of the frames
+                    are sent instead of ending
+        """
+        frames = [dict(frame) for frame in frames]
+
+        for frame in frames:
+            if 'points' in frame:
+                frame.setdefault('sink', DEFAULT_SINK)
+
+        if sinks == None:
+            channels = [DEFAULT_SINK]
+
+            for frame in frames:
+                if 'sink' in frame and frame['sink'] not in channels:
+                    channels.append(frame['sink'])
+
+            sinks = [(channel, DEFAULT_SINK_NAME) for channel in channels]
+
+        self.scripts[program] = {
+            'frames': frames,
+            'sinks': sinks,
+            'persistent': persistent
+        }
+
+    def inject_failure(self, path, status=500, times=1):
+        """
+        fail the next number of requests specified to paths starting with
+        the path provided with the HTTP status provided
+
+        """
+        with self.lock:
+            self.failures.append({
+                'path': path,
+                'status': status,
+                'times': times
+            })
+
+    def take_failure(self, path):
+        """
+        return the status of an injected failure for the path provided, if
+        there's one left
+
+        """
+        with self.lock:
+            for failure in self.failures:
+                if path.startswith(failure['path']) and failure['times'] > 0:
+                    failure['times'] -= 1
+                    return failure['status']
+
+        return None
+
+    def disconnect_after(self, frames, times=1):
+        """
+        drop the websocket connection of the next jobs to run after sending
+        the number of scripted frames provided, when the client reconnects
+        to the job the remaining frames are sent
+
+        """
+        with self.lock:
+            self.disconnects = times
+            self.disconnect_frames = frames
+
+    def stall_after(self, frames, seconds=None, times=1):
+        """
+        send only the first half of the frame following the number of
+        scripted frames provided on the next jobs to run, and the rest of it
+        after the seconds provided or never when None, in which case the
+        connection is held until the client drops it
+
+        """
+        with self.lock:
+            self.stalls = times
+            self.stall_frames = frames
+            self.stall_seconds = seconds
+
+    def kill_job(self, job_id):
+        """
+        make a running job go away as if the data engine running it died,
+        its websocket is dropped without ending the job which then no longer
+        exists when the client reconnects to it
+
+        """
+        with self.lock:
+            job = self.jobs.pop(job_id)
+            job['killed'] = True
+
+    # data model
+
+    def create_account(self, username, password, name=None, email=None):
+        with self.lock:
+            account = {
+                'id': str(uuid.uuid4()),
+                'name': name,
+                'username': username,
+                'email': email,
+                'password': password
+            }
+            self.accounts[account['id']] = account
+            return account
+
+    def create_deployment(self, name, account_id):
+        with self.lock:
+            deployment = {
+                'deployment_id': _new_id(),
+                'name': name,
+                'apikey': uuid.uuid4().hex,
+                'spaces': {},
+                'accounts': set([account_id])
+            }
+            self.deployments[deployment['deployment_id']] = deployment
+            return deployment
+
+    def account_for_username(self, username):
+        for account in self.accounts.values():
+            if account['username'] == username:
+                return account
+
+        return None
+
+    def public_account(self, account):
+        account = dict(account)
+        del account['password']
+        return account
+
+    def public_deployment(self, deployment):
+        return {
+            'deployment_id': deployment['deployment_id'],
+            'name': deployment['name'],
+            'endpoints': [
+                {'type': 'juttle', 'uri': self.url},
+                {'type': 'http-import', 'uri': self.url}
+            ]
+        }
+
+    def public_job(self, job):
+        return dict([(key, value) for (key, value) in job.items()
+                     if key not in ['frames', 'position', 'lock', 'killed']])
+
+    def authenticate(self, request):
+        """
+        return the account for the bearer token of the request or respond
+        with a 401 and return None
+
+        """
+        authorization = request.headers.get('authorization', '')
+        token = authorization.replace('Bearer ', '', 1)
+        account_id = self.tokens.get(token)
+
+        if account_id == None or account_id not in self.accounts:
+            request.respond(401, {'message': 'Unauthorized'})
+            return None
+
+        return self.accounts[account_id]
+
+    def deployment_for(self, request, account, deployment_id):
+        """
+        return the deployment with the id provided if the account has access
+        to it or respond with a 404 and return None
+
+        """
+        deployment = self.deployments.get(deployment_id)
+
+        if deployment == None or account['id'] not in deployment['accounts']:
+            request.respond(404, {'message': 'Deployment not found'})
+            return None
+
+        return deployment
+
+    # environment and auth
+
+    def get_environment(self, request):
+        request.respond(200, {
+            'auth_url': self.url,
+            'deployment_url': self.url
+        })
+
+    def post_local(self, request):
+        form = request.form()
+        account = self.account_for_username(form.get('username'))
+
+        if account == None or account['password'] != form.get('password'):
+            request.respond(401, {'message': 'Invalid username or password'})
+            return
+
+        session = uuid.uuid4().hex
+        self.sessions[session] = account['id']
+        request.respond(200, {}, headers={
+            'Set-Cookie': 'session=%s; Path=/' % session
+        })
+
+    def session_account_id(self, request):
+        cookie = Cookie.SimpleCookie(request.headers.get('cookie', ''))
+
+        if 'session' not in cookie:
+            return None
+
+        return self.sessions.get(cookie['session'].value)
+
+    def get_status(self, request):
+        request.respond(200, {
+            'authorized': self.session_account_id(request) != None
+        })
+
+    def post_token(self, request):
+        if request.headers.get('content-type', '').startswith('application/json'):
+            grant = request.json()
+            authorization = self.authorizations.get(grant.get('client_id'))
+
+            if authorization == None or \
+               authorization['client_secret'] != grant.get('client_secret'):
+                request.respond(401, {'message': 'Invalid client credentials'})
+                return
+
+            account_id = authorization['account_id']
+
+        else:
+            account_id = self.session_account_id(request)
+
+            if account_id == None:
+                request.respond(401, {'message': 'Not logged in'})
+                return
+
+        access_token = uuid.uuid4().hex
+        self.tokens[access_token] = account_id
+
+        request.respond(200, {
+            'access_token': access_token,
+            'token_type': 'Bearer',
+            'expires_in': ACCESS_TOKEN_EXPIRES_IN
+        })
+
+    def post_authorization(self, request):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        authorization = {
+            'client_id': uuid.uuid4().hex,
+            'client_secret': uuid.uuid4().hex,
+            'account_id': account['id']
+        }
+        self.authorizations[authorization['client_id']] = authorization
+
+        request.respond(201, {
+            'client_id': authorization['client_id'],
+            'client_secret': authorization['client_secret']
+        })
+
+    # accounts
+
+    def get_account(self, request):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        request.respond(200, self.public_account(account))
+
+    def get_account_by_username(self, request):
+        if self.authenticate(request) == None:
+            return
+
+        account = self.account_for_username(request.query.get('username'))
+
+        if account == None:
+            request.respond(404, {'message': 'Account not found'})
+        else:
+            request.respond(200, self.public_account(account))
+
+    def post_account(self, request):
+        if self.authenticate(request) == None:
+            return
+
+        payload = request.json()
+
+        if self.account_for_username(payload['username']) != None:
+            request.respond(409, {'message': 'username in use'})
+            return
+
+        account = self.create_account(payload['username'],
+                                      payload['password'],
+                                      name=payload.get('name'),
+                                      email=payload.get('email'))
+        request.respond(201, self.public_account(account))
+
+    def get_accounts(self, request, account_ids):
+        if self.authenticate(request) == None:
+            return
+
+        accounts = [self.public_account(self.accounts[account_id])
+                    for account_id in account_ids.split(',')
+                    if account_id in self.accounts]
+        request.respond(200, {'accounts': accounts})
+
+    def delete_account(self, request, account_id):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        if account_id not in self.accounts:
+            request.respond(404, {'message': 'Account not found'})
+            return
+
+        if account['id'] != account_id:
+            request.respond(403, {'message': 'Can only delete your own account'})
+            return
+
+        with self.lock:
+            del self.accounts[account_id]
+
+            for deployment in self.deployments.values():
+                deployment['accounts'].discard(account_id)
+
+        request.respond(204)
+
+    # deployments
+
+    def get_deployments(self, request):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        request.respond(200, [self.public_deployment(deployment)
+                              for deployment in self.deployments.values()
+                              if account['id'] in deployment['accounts']])
+
+    def post_deployment(self, request):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        deployment = self.create_deployment(request.json()['name'], account['id'])
+        request.respond(201, self.public_deployment(deployment))
+
+    def get_deployment(self, request, deployment_id):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        deployment = self.deployment_for(request, account, deployment_id)
+        if deployment != None:
+            request.respond(200, self.public_deployment(deployment))
+
+    def get_apikey(self, request, deployment_id):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        deployment = self.deployment_for(request, account, deployment_id)
+        if deployment != None:
+            request.respond(200, {'apikey': deployment['apikey']})
+
+    def get_spaces(self, request, deployment_id):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        deployment = self.deployment_for(request, account, deployment_id)
+        if deployment != None:
+            request.respond(200, deployment['spaces'].values())
+
+    def post_space(self, request, deployment_id):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        deployment = self.deployment_for(request, account, deployment_id)
+        if deployment == None:
+            return
+
+        space = request.json()
+        space['id'] = _new_id()
+
+        with self.lock:
+            deployment['spaces'][space['id']] = space
+
+        request.respond(201, space)
+
+    def delete_space(self, request, deployment_id, space_id):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        deployment = self.deployment_for(request, account, deployment_id)
+        if deployment == None:
+            return
+
+        with self.lock:
+            if deployment['spaces'].pop(space_id, None) == None:
+                request.respond(404, {'message': 'Space not found'})
+                return
+
+        request.respond(204)
+
+    def get_deployment_accounts(self, request, deployment_id):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        deployment = self.deployment_for(request, account, deployment_id)
+        if deployment != None:
+            request.respond(200, [self.public_account(self.accounts[account_id])
+                                  for account_id in deployment['accounts']
+                                  if account_id in self.accounts])
+
+    def put_deployment_account(self, request, deployment_id, account_id):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        deployment = self.deployment_for(request, account, deployment_id)
+        if deployment == None:
+            return
+
+        if account_id not in self.accounts:
+            request.respond(404, {'message': 'Account not found'})
+            return
+
+        with self.lock:
+            deployment['accounts'].add(account_id)
+
+        request.respond(204)
+
+    # jobs
+
+    def get_jobs(self, request):
+        if self.authenticate(request) == None:
+            return
+
+        with self.lock:
+            jobs = [self.public_job(job) for job in self.jobs.values()]
+
+        request.respond(200, {'jobs': jobs})
+
+    def post_job(self, request):
+        account = self.authenticate(request)
+        if account == None:
+            return
+
+        payload = request.json()
+        channel = self.channels.get(payload.get('channel_id'))
+
+        if channel == None:
+            request.respond(400, {'message': 'Unknown channel'})
+            return
+
+        script = self.scripts.get(payload['program'])
+
+        if script == None:
+            request.respond(400, {
+                'message': 'Error: program not scripted on the fake server: %s' %
+                           payload['program'],
+                'info': {}
+            })
+            return
+
+        now = time.time()
+        job = {
+            'id': _new_id(),
+            'channel_id': payload['channel_id'],
+            'alias': payload.get('alias'),
+            'user': account['id'],
+            'timeout': 0 if script['persistent'] else 5,
+            '_start_time': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(now)),
+            '_ms_begin': int(now * 1000),
+            'frames': script['frames'],
+            'position': 0,
+            'lock': threading.Lock()
+        }
+
+        with self.lock:
+            self.jobs[job['id']] = job
+
+        request.respond(200, {
+            'status': 'ok',
+            'job': self.public_job(job),
+            'now': job['_start_time'],
+            'sinks': [{'channel': channel_id, 'name': name, 'options': {}}
+                      for (channel_id, name) in script['sinks']]
+        })
+
+        channel['job'] = job
+        channel['ready'].set()
+
+    def delete_job(self, request, job_id):
+        if self.authenticate(request) == None:
+            return
+
+        with self.lock:
+            if self.jobs.pop(job_id, None) == None:
+                request.respond(404, {'message': 'Job not found'})
+                return
+
+        request.respond(200, {})
+
+    # programs
+
+    def get_programs(self, request):
+        if self.authenticate(request) == None:
+            return
+
+        request.respond(200, self.programs)
+
+    def post_program(self, request):
+        if self.authenticate(request) == None:
+            return
+
+        program = request.json()
+        program['id'] = _new_id()
+
+        with self.lock:
+            self.programs.append(program)
+
+        request.respond(201, program)
+
+    def put_program(self, request):
+        if self.authenticate(request) == None:
+            return
+
+        program = request.json()
+
+        with self.lock:
+            for (index, existing) in enumerate(self.programs):
+                if existing['id'] == program.get('id'):
+                    self.programs[index] = program
+                    request.respond(204)
+                    return
+
+        request.respond(404, {'message': 'Program not found'})
+
+    # webhook import
+
+    def post_webhook(self, request):
+        apikeys = [deployment['apikey'] for deployment in self.deployments.values()]
+
+        if request.query.get('apikey') not in apikeys:
+            request.respond(401, {'message': 'Invalid apikey'})
+            return
+
+        points = json.loads(request.body)
+        if not isinstance(points, list):
+            points = [points]
+
+        with self.lock:
+            self.import_requests += 1
+            self.imported_points += len(points)
+            self.imported_bytes += len(request.body)
+
+            if self.store_imports:
+                space = request.query.get('space', 'default')
+                self.imported.setdefault(space, []).extend(points)
+
+        request.respond(200, {})
+
+    # juttle channel websocket
+
+    def websocket(self, request):
+        """
+        complete the websocket handshake and serve the juttle channel
+
+        """
+        key = request.headers.get('sec-websocket-key', '')
+        accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+
+        extensions = request.headers.get('sec-websocket-extensions', '')
+        deflate = self.compression and \
+                  'permessage-deflate' in [extension.split(';')[0].strip()
+                                           for extension in extensions.split(',')]
+
+        request.send_response(101)
+        request.send_header('Upgrade', 'websocket')
+        request.send_header('Connection', 'Upgrade')
+        request.send_header('Sec-WebSocket-Accept', accept)
+
+        if deflate:
+            request.send_header('Sec-WebSocket-Extensions', 'permessage-deflate')
+
+        request.end_headers()
+        request.wfile.flush()
+
+        # the connection is never reused for HTTP requests
+        request.close_connection = 1
+        sock = request.connection
+
+        if deflate:
+            sock = DeflateSocket(sock)
+
+        with self.lock:
+            self.websockets += 1
+            self.open_websockets += 1
+
+            if deflate:
+                self.compressed_websockets += 1
+
+        try:
+            self.serve_channel(sock)
+
+        except IOError:
+            # client went away
+            pass
+
+        finally:
+            with self.lock:
+                self.open_websockets -= 1
+
+    def serve_channel(self, sock):
+        (_, data) = recv_frame(sock)
+        message = json.loads(data)
+
+        if message.get('accessToken') not in self.tokens:
+            send_frame(sock, json.dumps({'error': 'UNAUTHORIZED'}))
+            return
+
+        if 'job_id' in message:
+            job = self.jobs.get(message['job_id'])
+
+            if job == None:
+                send_frame(sock, json.dumps({'error': 'NONEXISTENT-JOB'}))
+                return
+
+            if self.sequence_frames and 'resume_after' in message:
+                with job['lock']:
+                    job['position'] = message['resume_after'] + 1
+
+        else:
+            channel_id = _new_id()
+            channel = {
+                'ready': threading.Event(),
+                'job': None
+            }
+            self.channels[channel_id] = channel
+            send_frame(sock, json.dumps({'channel_id': channel_id}))
+
+            channel['ready'].wait(CHANNEL_TIMEOUT)
+            del self.channels[channel_id]
+            job = channel['job']
+
+            if job == None:
+                return
+
+        if self.stream_job(sock, job):
+            self.close_channel(sock)
+
+    def stream_job(self, sock, job):
+        """
+        send the remaining scripted frames of the job, dropping the
+        connection when a disconnect was requested or the job killed in
+        which case False is returned
+
+        """
+        disconnect_at = None
+        stall_at = None
+
+        with self.lock:
+            if self.disconnects > 0:
+                self.disconnects -= 1
+                disconnect_at = job['position'] + self.disconnect_frames
+
+            if self.stalls > 0:
+                self.stalls -= 1
+                stall_at = job['position'] + self.stall_frames
+                stall_seconds = self.stall_seconds
+
+        with job['lock']:
+            while job['position'] < len(job['frames']):
+                if job['position'] == disconnect_at:
+                    if self.sequence_frames:
+                        # the frame in flight is lost with the connection
+                        job['position'] += 1
+
+                    return False
+
+                if self.frame_latency > 0:
+                    time.sleep(self.frame_latency)
+
+                frame = job['frames'][job['position']]
+
+                if self.sequence_frames:
+                    frame = dict(frame, seq=job['position'])
+
+                data = encode_frame(sock, json.dumps(frame))
+
+                if job['position'] == stall_at:
+                    sock.sendall(data[:len(data) / 2])
+                    data = data[len(data) / 2:]
+
+                    if stall_seconds == None:
+                        # nothing more until the client drops the connection
+                        while recv_frame(sock)[0] != OPCODE_CLOSE:
+                            pass
+
+                        return False
+
+                    time.sleep(stall_seconds)
+
+                sock.sendall(data)
+                job['position'] += 1
+
+        if job['timeout'] == 0:
+            # persistent jobs keep running until deleted, or until the client
+            # goes away which is noticed right away rather than on the next
+            # heartbeat
+            while job['id'] in self.jobs:
+                (readable, _, _) = select.select([sock], [], [], self.ping_interval)
+
+                if len(readable) > 0:
+                    # a pong, or the connection closing
+                    (opcode, _) = recv_frame(sock)
+
+                    if opcode == OPCODE_CLOSE:
+                        return False
+
+                    continue
+
+                if job['id'] in self.jobs:
+                    send_frame(sock, json.dumps({'ping': True}))
+
+            if job.get('killed'):
+                return False
+
+        else:
+            with self.lock:
+                self.jobs.pop(job['id'], None)
+
+        send_frame(sock, json.dumps({'job_end': True}))
+        return True
+
+    def close_channel(self, sock):
+        """
+        start the websocket closing handshake and wait (briefly) for the
+        client to acknowledge it, ignoring anything else it still sends
+
+        """
+        send_frame(sock, '', opcode=OPCODE_CLOSE)
+        sock.settimeout(1)
+
+        try:
+            opcode = None
+            while opcode != OPCODE_CLOSE:
+                (opcode, _) = recv_frame(sock)
+
+        except socket.timeout:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='local stand-in Jut server')
+
+    parser.add_argument('--host',
+                        default='127.0.0.1',
+                        help='address to listen on, default: 127.0.0.1')
+
+    parser.add_argument('--port',
+                        type=int,
+                        default=8080,
+                        help='port to listen on, default: 8080')
+
+    parser.add_argument('-u', '--username',
+                        default='jut-tools-admin',
+                        help='username of the admin account, '
+                             'default: jut-tools-admin')
+
+    parser.add_argument('-p', '--password',
+                        default='bigdata',
+                        help='password of the admin account, default: bigdata')
+
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0,
+                        help='seconds to wait before answering each HTTP '
+                             'request, default: 0')
+
+    parser.add_argument('--frame-latency',
+                        type=float,
+                        default=0,
+                        help='seconds to wait before sending each websocket '
+                             'frame, default: 0')
+
+    parser.add_argument('--sequence-frames',
+                        action='store_true',
+                        default=False,
+                        help='number the frames of each job and let clients '
+                             'resume jobs after the last frame they received')
+
+    parser.add_argument('--compression',
+                        action='store_true',
+                        default=False,
+                        help='compress the websocket frames sent to clients '
+                             'offering the permessage-deflate extension')
+
+    parser.add_argument('--script',
+                        default=None,
+                        help='JSON file mapping juttle programs to the list '
+                             'of payloads sent when they run')
+
+    parser.add_argument('-v', '--verbose',
+                        action='store_true',
+                        default=False,
+                        help='log each request')
+
+    options = parser.parse_args()
+
+    server = FakeJutServer(host=options.host,
+                           port=options.port,
+                           username=options.username,
+                           password=options.password,
+                           latency=options.latency,
+                           frame_latency=options.frame_latency,
+                           sequence_frames=options.sequence_frames,
+                           compression=options.compression,
+                           verbose=options.verbose)
+
+    if options.script != None:
+        with open(options.script, 'r') as script_file:
+            for (program, frames) in json.load(script_file).items():
+                server.script(program, frames)
+
+    info('fake jut server listening on %s, login with %s/%s' %
+         (server.url, options.username, options.password))
+
+    try:
+        server.httpd.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
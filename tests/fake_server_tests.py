@@ -0,0 +1,94 @@
+"""
+fake jut server tests, which only talk to a local fake jut server and can
+therefore run offline with:
+
+    JUT_FAKE_SERVER=1 python setup.py test -s tests.fake_server_tests
+
+"""
+
+from jut.api import auth, data_engine, integrations
+from jut.commands.upload import push_json_file
+from jut.exceptions import JutException
+
+from tests.fake_server import FakeJutServer, points_frames
+
+import json
+import StringIO
+import unittest
+
+
+class FakeServerTests(unittest.TestCase):
+
+
+    def setUp(self):
+        self.server = FakeJutServer(username='jut-tools-user01',
+                                    password='bigdata',
+                                    deployment_name='jut-tools-deployment')
+        self.server.start()
+
+        self.token_manager = auth.TokenManager(username='jut-tools-user01',
+                                               password='bigdata',
+                                               app_url=self.server.url)
+
+
+    def tearDown(self):
+        self.server.stop()
+
+
+    def run_juttle(self, juttle, websocket_options=None):
+        return list(data_engine.run(juttle,
+                                    'jut-tools-deployment',
+                                    token_manager=self.token_manager,
+                                    app_url=self.server.url,
+                                    websocket_options=websocket_options))
+
+
+    def test_run_scripted_program(self):
+        """
+        verify a scripted program streams back its job details followed by
+        all of its points and the end of the job
+
+        """
+        points = [{'time': '2014-01-01T00:00:00.000Z', 'value': index}
+                  for index in range(0, 250)]
+        self.server.script('emit -limit 250', points_frames(points, 100))
+
+        payloads = self.run_juttle('emit -limit 250')
+
+        self.assertEqual(payloads[0]['sinks'][0]['channel'], 'sink0')
+
+        received = []
+        for payload in payloads:
+            if 'points' in payload:
+                received += payload['points']
+
+        self.assertEqual(received, points)
+        self.assertEqual(payloads[-1], {'job_end': True})
+
+
+    def test_run_with_injected_failure(self):
+        """
+        verify an injected failure is reported back by the data engine API
+
+        """
+        self.server.inject_failure('/api/v1/deployments', status=503)
+
+        with self.assertRaises(JutException):
+            self.run_juttle('emit -limit 1')
+
+
+    def test_upload_to_webhook(self):
+        """
+        verify points pushed to the webhook url are imported in batches
+
+        """
+        url = integrations.get_webhook_url('jut-tools-deployment',
+                                           space='jut-tools-space',
+                                           token_manager=self.token_manager,
+                                           app_url=self.server.url)
+
+        points = [{'value': index} for index in range(0, 250)]
+        push_json_file(StringIO.StringIO(json.dumps(points)), url)
+
+        self.assertEqual(self.server.import_requests, 3)
+        self.assertEqual(self.server.imported['jut-tools-space'], points)
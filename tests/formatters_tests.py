@@ -0,0 +1,138 @@
+"""
+output formatters tests, which don't talk to Jut and can run offline with:
+
+    JUT_FAKE_SERVER=1 python -m unittest tests.formatters_tests
+
+"""
+
+from jut import formatters
+from jut.common import BufferedOutput
+
+import argparse
+import os
+import shutil
+import StringIO
+import tempfile
+import unittest
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+
+except ImportError:
+    pyarrow = None
+
+
+class CSVFormatterTests(unittest.TestCase):
+
+
+    def test_csv_output(self):
+        """
+        verify the points are written out with a header for every change of
+        fields, values quoted as needed, nulls as empty fields and numbers
+        at full precision
+
+        """
+        stream = StringIO.StringIO()
+        options = argparse.Namespace(output=None, flush='size')
+        formatter = formatters.get_formatter('csv',
+                                             options,
+                                             output=BufferedOutput(stream, policy='size'))
+
+        formatter.start()
+        formatter.points([
+            {'time': '2014-01-01T00:00:00.000Z', 'name': 'a,b', 'value': 0.1 + 0.2},
+            {'time': '2014-01-01T00:00:01.000Z', 'name': 'say "hi"', 'value': None}
+        ])
+        formatter.frame_end()
+        formatter.points([
+            {'time': '2014-01-01T00:00:02.000Z', 'count': 1},
+            {'time': '2014-01-01T00:00:03.000Z', 'name': 'x\ny', 'value': 2}
+        ])
+        formatter.stop()
+
+        self.assertEqual(stream.getvalue(),
+                         '#time,name,value\n'
+                         '2014-01-01T00:00:00.000Z,"a,b",0.30000000000000004\n'
+                         '2014-01-01T00:00:01.000Z,"say ""hi""",\n'
+                         '#time,count\n'
+                         '2014-01-01T00:00:02.000Z,1\n'
+                         '#time,name,value\n'
+                         '2014-01-01T00:00:03.000Z,"x\ny",2\n')
+
+        # one column plan per distinct set of fields, reused when they repeat
+        self.assertEqual(len(formatter.column_plans), 2)
+        self.assertTrue(formatter.column_plan({'time': 0, 'name': 0, 'value': 0}) is
+                        formatter.column_plans[frozenset(['time', 'name', 'value'])])
+
+
+@unittest.skipIf(pyarrow == None, 'pyarrow is not installed')
+class ColumnarFormatterTests(unittest.TestCase):
+
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def write(self, file_format, batches):
+        """
+        write the batches of points provided out in the format provided, one
+        row group per batch, and return the name of the file written
+
+        """
+        output = os.path.join(self.directory, 'points.%s' % file_format)
+        options = argparse.Namespace(output=output,
+                                     flush=None,
+                                     format=file_format,
+                                     row_group_size=len(batches[0]))
+
+        formatter = formatters.get_formatter(file_format, options)
+        formatter.start()
+
+        for points in batches:
+            formatter.points(points)
+            formatter.frame_end()
+
+        formatter.stop()
+        return output
+
+
+    def read(self, file_format, output):
+        if file_format == 'parquet':
+            return pyarrow.parquet.read_table(output)
+
+        with open(output, 'rb') as stream:
+            return pyarrow.ipc.open_stream(stream).read_all()
+
+
+    def test_columnar_round_trip(self):
+        """
+        verify the points written out in the columnar formats read back the
+        same, including numbers that are only whole in the first row group
+
+        """
+        batches = [
+            [{'time': '2014-01-01T00:00:00.000Z', 'value': 1, 'name': 'a'},
+             {'time': '2014-01-01T00:00:01.000Z', 'value': 2, 'name': 'b'}],
+            [{'time': '2014-01-01T00:00:02.000Z', 'value': 2.5, 'name': 'c'},
+             {'time': '2014-01-01T00:00:03.000Z', 'value': None, 'name': 'd'}]
+        ]
+
+        for file_format in ['arrow', 'parquet']:
+            table = self.read(file_format, self.write(file_format, batches))
+
+            self.assertEqual(table.schema.names, ['time', 'name', 'value'])
+            self.assertEqual(table.schema.field('time').type,
+                             pyarrow.timestamp('ms', tz='UTC'))
+            self.assertEqual(table.schema.field('value').type, pyarrow.float64())
+
+            self.assertEqual(table.num_rows, 4)
+            self.assertEqual(table.column('value').to_pylist(), [1.0, 2.0, 2.5, None])
+            self.assertEqual(table.column('name').to_pylist(), ['a', 'b', 'c', 'd'])
+            self.assertEqual(table.column('time').cast(pyarrow.int64()).to_pylist(),
+                             [1388534400000, 1388534401000,
+                              1388534402000, 1388534403000])
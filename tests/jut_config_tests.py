@@ -4,6 +4,9 @@ basic set of `jut config` tests
 """
 
 import os
+import shutil
+import subprocess
+import tempfile
 import unittest
 
 from tests.util import jut, \
@@ -412,3 +415,138 @@ class JutConfigTests(unittest.TestCase):
         delete_user_from_default_deployment('jut-tools-user01', 'bigdata')
         delete_user_from_default_deployment('jut-tools-user02', 'bigdata')
 
+
+class ConfigFileTests(unittest.TestCase):
+    """
+    configuration file tests, which don't talk to Jut and can run offline
+    with:
+
+        JUT_FAKE_SERVER=1 python -m unittest tests.jut_config_tests.ConfigFileTests
+
+    """
+
+
+    def setUp(self):
+        self.home_override = os.environ.get('HOME_OVERRIDE')
+        self.jut_home = tempfile.mkdtemp()
+
+        os.environ['HOME_OVERRIDE'] = self.jut_home
+        config.set_jut_home()
+
+
+    def tearDown(self):
+        os.environ['HOME_OVERRIDE'] = self.home_override
+        config.set_jut_home()
+
+        shutil.rmtree(self.jut_home)
+
+
+    def in_another_process(self, code):
+        """
+        run the python code provided, with the config module imported, in
+        another process using the same jut home
+
+        """
+        return subprocess.Popen(['python', '-c', 'from jut import config; %s' % code])
+
+
+    def test_config_read_lazily(self):
+        """
+        verify the configuration is only read by the commands that need it,
+        an unreadable configuration only failing those commands
+
+        """
+        with open(os.path.join(self.jut_home, 'config'), 'w') as configfile:
+            configfile.write('not a configuration\n')
+
+        process = jut('daemon', 'status')
+        process.expect_status(255)
+        process.expect_error('jut daemon is not running')
+
+        process = jut('config', 'list')
+        process.expect_status(1)
+        self.assertTrue('MissingSectionHeaderError' in process.read_error())
+
+
+    def test_config_rewritten_by_another_process(self):
+        """
+        verify the cached configuration is read again once another process
+        rewrites it, even when that leaves its size and modification time
+        unchanged
+
+        """
+        config.add('jut-tools-user01', username='jut-tools-user01', app_url='http://a')
+        config.set_default(name='jut-tools-user01')
+
+        # a modification time any process can set exactly
+        filepath = os.path.join(self.jut_home, 'config')
+        mtime = int(os.stat(filepath).st_mtime)
+        os.utime(filepath, (mtime, mtime))
+        size = os.stat(filepath).st_size
+
+        self.assertEqual(config.get_default()['username'], 'jut-tools-user01')
+
+        process = self.in_another_process(
+            'config.remove(name="jut-tools-user01"); '
+            'config.add("jut-tools-user02", username="jut-tools-user02", app_url="http://a"); '
+            'config.set_default(name="jut-tools-user02")')
+        self.assertEqual(process.wait(), 0)
+
+        # as if rewritten within the resolution of the modification time
+        os.utime(filepath, (mtime, mtime))
+        self.assertEqual(os.stat(filepath).st_size, size)
+
+        self.assertEqual(config.get_default()['username'], 'jut-tools-user02')
+        self.assertFalse(config.exists('jut-tools-user01'))
+
+
+    def test_concurrent_config_adds(self):
+        """
+        verify the configurations added by many processes at once are all
+        kept, none of the updates overwriting another
+
+        """
+        processes = [self.in_another_process('config.add("jut-tools-user%02d", '
+                                             'username="jut-tools-user%02d", '
+                                             'app_url="http://a")' % (index, index))
+                     for index in range(0, 30)]
+
+        for process in processes:
+            self.assertEqual(process.wait(), 0)
+
+        self.assertEqual(config.length(), 30)
+
+        for index in range(0, 30):
+            self.assertTrue(config.exists('jut-tools-user%02d' % index))
+
+
+    def test_failed_update_rolls_back(self):
+        """
+        verify an update failing before the configuration is written leaves
+        the configuration as it was, on disk and in memory
+
+        """
+        class Unwritable(object):
+
+            def __str__(self):
+                raise IOError('unable to write value')
+
+        config.add('jut-tools-user01', username='jut-tools-user01', app_url='http://a')
+
+        filepath = os.path.join(self.jut_home, 'config')
+
+        with open(filepath) as configfile:
+            contents = configfile.read()
+
+        with self.assertRaises(IOError):
+            config.add('jut-tools-user02', username=Unwritable(), app_url='http://a')
+
+        self.assertTrue(config.exists('jut-tools-user01'))
+        self.assertFalse(config.exists('jut-tools-user02'))
+
+        with open(filepath) as configfile:
+            self.assertEqual(configfile.read(), contents)
+
+        # without leaving the partially written configuration behind
+        self.assertEqual(sorted(os.listdir(self.jut_home)),
+                         ['config', 'config.lock'])
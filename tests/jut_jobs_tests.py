@@ -5,6 +5,7 @@ basic set of `jut jobs` tests
 
 import re
 import signal
+import time
 import unittest
 
 from tests.util import jut, \
@@ -15,6 +16,9 @@ from tests.util import jut, \
                        delete_user_from_default_deployment
 
 from jut import config
+from jut.api import auth, data_engine
+
+from tests.fake_server import FakeJutServer, points_frames
 
 
 class JutJobsTests(unittest.TestCase):
@@ -202,3 +206,263 @@ class JutJobsTests(unittest.TestCase):
             process.expect_error('No running jobs')
 
 
+    def test_jut_jobs_connect_on_multiple_persistent_jobs(self):
+        """
+        verify we can connect to multiple persistent jobs at once and that
+        the points are tagged with the job_id they came from
+
+        """
+        with temp_jut_tools_home():
+            configuration = config.get_default()
+            app_url = configuration['app_url']
+
+            process = jut('config',
+                          'add',
+                          '-u', 'jut-tools-user03',
+                          '-p', 'bigdata',
+                          '-a', app_url,
+                          '-d')
+            process.expect_status(0)
+
+            job_ids = []
+            for index in range(1, 3):
+                process = jut('run',
+                              '--name', 'Persistent Job #%s' % index,
+                              '-p',
+                              'emit -limit 10000 '
+                              '| put source_type="event", foo="bar"'
+                              '| (write -space "%s"; keep foo | pass)' %
+                              JutJobsTests.test_space)
+
+                process.expect_status(0)
+                job_ids.append(process.read_output().strip())
+
+            process = jut('jobs',
+                          'connect',
+                          job_ids[0],
+                          job_ids[1],
+                          '-f', 'text')
+
+            # each line is the foo field followed by the job_id
+            seen_job_ids = set()
+            for _ in range(0, 10):
+                process.expect_output('bar ')
+                seen_job_ids.add(process.read_output_line().strip())
+
+            self.assertEqual(seen_job_ids, set(job_ids))
+
+            process.send_signal(signal.SIGTERM)
+            process.expect_status(-signal.SIGTERM)
+
+            for job_id in job_ids:
+                process = jut('jobs',
+                              'kill',
+                              job_id,
+                              '-y')
+                process.expect_status(0)
+                process.expect_eof()
+
+
+class JobStreamTests(unittest.TestCase):
+    """
+    job stream tests, which only talk to a local fake jut server and can
+    therefore run offline with:
+
+        JUT_FAKE_SERVER=1 python -m unittest tests.jut_jobs_tests.JobStreamTests
+
+    """
+
+
+    def setUp(self):
+        self.server = FakeJutServer(username='jut-tools-user01',
+                                    password='bigdata',
+                                    deployment_name='jut-tools-deployment',
+                                    frame_latency=0.01,
+                                    ping_interval=0.1,
+                                    sequence_frames=True)
+        self.server.start()
+
+        self.token_manager = auth.TokenManager(username='jut-tools-user01',
+                                               password='bigdata',
+                                               app_url=self.server.url)
+
+        self.websocket_options = data_engine.WebsocketOptions(read_timeout=1)
+
+
+    def tearDown(self):
+        self.server.stop()
+
+
+    def script(self, juttle, count, persistent=False):
+        """
+        script the juttle program provided to output count points, one per
+        frame, and return those points
+
+        """
+        points = [{'time': '2014-01-01T00:00:00.000Z', 'program': juttle, 'value': index}
+                  for index in range(0, count)]
+        self.server.script(juttle, points_frames(points, 1), persistent=persistent)
+        return points
+
+
+    def start_job(self, juttle):
+        return data_engine.start_job_stream(juttle,
+                                            'jut-tools-deployment',
+                                            token_manager=self.token_manager,
+                                            app_url=self.server.url,
+                                            websocket_options=self.websocket_options)
+
+
+    def poll(self, streams, until=None):
+        """
+        poll the streams provided and return the (job_id, payload) received,
+        stopping early once until returns True for one of them
+
+        """
+        received = []
+
+        for (stream, payload) in data_engine.poll_jobs(streams):
+            received.append((stream.job_id, payload))
+
+            if until != None and until(stream, payload):
+                break
+
+        return received
+
+
+    def points(self, received, job_id):
+        return [point
+                for (payload_job_id, payload) in received
+                if payload_job_id == job_id
+                for point in payload.get('points', [])]
+
+
+    def test_poll_interleaved_jobs(self):
+        """
+        verify the payloads of several jobs are read as they arrive, each
+        job getting all of its points in order
+
+        """
+        points = {}
+        streams = []
+
+        for count in [30, 40, 50]:
+            juttle = 'emit -limit %s' % count
+            juttle_points = self.script(juttle, count)
+
+            stream = self.start_job(juttle)
+            points[stream.job_id] = juttle_points
+            streams.append(stream)
+
+        received = self.poll(streams)
+
+        for stream in streams:
+            self.assertEqual(self.points(received, stream.job_id),
+                             points[stream.job_id])
+            self.assertTrue(stream.finished)
+
+        # the jobs were read from as they streamed, not one after the other
+        switches = len([index for index in range(1, len(received))
+                        if received[index][0] != received[index - 1][0]])
+        self.assertTrue(switches > 10,
+                        'only switched between jobs %s times' % switches)
+
+
+    def test_poll_jobs_with_job_going_away(self):
+        """
+        verify a job going away ends its own stream with an error, while
+        the other jobs polled along with it stream all of their points
+
+        """
+        self.script('emit -limit 5', 5, persistent=True)
+        points = self.script('emit -limit 50', 50)
+
+        gone = self.start_job('emit -limit 5')
+        streams = [gone,
+                   self.start_job('emit -limit 50'),
+                   self.start_job('emit -limit 50')]
+
+        received = []
+
+        for (stream, payload) in data_engine.poll_jobs(streams):
+            received.append((stream.job_id, payload))
+
+            if stream == gone and 'points' in payload and \
+               len(self.points(received, gone.job_id)) == 5:
+                self.server.kill_job(gone.job_id)
+
+        gone_payloads = [payload for (job_id, payload) in received
+                         if job_id == gone.job_id and 'points' not in payload]
+        self.assertEqual(gone_payloads, [{'error': 'NONEXISTENT-JOB'}])
+
+        for stream in streams[1:]:
+            self.assertEqual(self.points(received, stream.job_id), points)
+            self.assertTrue((stream.job_id, {'job_end': True}) in received)
+
+        self.assertEqual(self.websocket_options.reconnects, 1)
+
+
+    def test_poll_jobs_with_partial_frame(self):
+        """
+        verify a job whose frame arrives in parts holds up none of the other
+        jobs, and gets the whole frame once the rest of it arrives
+
+        """
+        stalled_points = self.script('emit -limit 3', 3)
+        points = self.script('emit -limit 20', 20)
+
+        self.server.stall_after(1, seconds=0.5)
+        stalled = self.start_job('emit -limit 3')
+
+        # the stalled job is streaming, and sending its partial frame, before
+        # the other one starts
+        self.poll([stalled], until=lambda stream, payload: 'points' in payload)
+
+        stream = self.start_job('emit -limit 20')
+        received = self.poll([stalled, stream])
+
+        self.assertEqual(self.points(received, stalled.job_id), stalled_points[1:])
+        self.assertEqual(self.points(received, stream.job_id), points)
+
+        # the other job streamed all of its points while the stalled job
+        # was waiting on the rest of its frame
+        job_ids = [job_id for (job_id, payload) in received if 'points' in payload]
+        self.assertEqual(job_ids[:20], [stream.job_id] * 20)
+
+        self.assertEqual(self.websocket_options.reconnects, 0)
+
+
+    def test_poll_jobs_with_stalled_frame(self):
+        """
+        verify a job whose frame never arrives in full is reconnected to once
+        its read timeout expires, resuming with that frame, while the other
+        jobs keep streaming
+
+        """
+        stalled_points = self.script('emit -limit 3', 3)
+        points = self.script('emit -limit 20', 20)
+
+        self.server.stall_after(1)
+        stalled = self.start_job('emit -limit 3')
+        received = self.poll([stalled],
+                             until=lambda stream, payload: 'points' in payload)
+
+        stream = self.start_job('emit -limit 20')
+        started = time.time()
+        finished = {}
+
+        for (polled, payload) in data_engine.poll_jobs([stalled, stream]):
+            received.append((polled.job_id, payload))
+
+            if polled.finished:
+                finished[polled.job_id] = time.time() - started
+
+        self.assertEqual(self.points(received, stalled.job_id), stalled_points)
+        self.assertEqual(self.points(received, stream.job_id), points)
+
+        # the other job wasn't held up for the read timeout of the stalled one
+        self.assertTrue(finished[stream.job_id] < 0.8,
+                        'took %.1fs to stream' % finished[stream.job_id])
+        self.assertTrue(finished[stalled.job_id] >= 1)
+
+        self.assertEqual(self.websocket_options.reconnects, 1)
@@ -4,8 +4,18 @@ basic set of `jut run` tests
 """
 
 import json
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import time
 import unittest
 
+from jut.api import auth, data_engine
+from jut.util import pipeline
+
+from tests.fake_server import FakeJutServer, points_frames
 from tests.util import jut
 
 BAD_PROGRAM = 'foo'
@@ -72,6 +82,53 @@ class JutRunTests(unittest.TestCase):
                          ])
 
 
+    def test_jut_run_emit_to_json_raw(self):
+        """
+        use jut to run the juttle program:
+
+            emit -from :2014-01-01T00:00:00.000Z: -limit 5
+
+        with the --raw option and verify the output is still the expected JSON
+        """
+        process = jut('run',
+                      '--raw',
+                      'emit -from :2014-01-01T00:00:00.000Z: -limit 5')
+        process.expect_status(0)
+        points = json.loads(process.read_output())
+        process.expect_eof()
+
+        self.assertEqual(points,
+                         [
+                             {'time': '2014-01-01T00:00:00.000Z'},
+                             {'time': '2014-01-01T00:00:01.000Z'},
+                             {'time': '2014-01-01T00:00:02.000Z'},
+                             {'time': '2014-01-01T00:00:03.000Z'},
+                             {'time': '2014-01-01T00:00:04.000Z'}
+                         ])
+
+
+    def test_jut_run_emit_to_ndjson(self):
+        """
+        use jut to run the juttle program:
+
+            emit -from :2014-01-01T00:00:00.000Z: -limit 5
+
+        and verify the output is in the expected newline delimited JSON format
+        """
+        process = jut('run',
+                      '--format', 'ndjson',
+                      'emit -from :2014-01-01T00:00:00.000Z: -limit 5')
+        process.expect_status(0)
+        stdout = process.read_output()
+        process.expect_eof()
+
+        self.assertEqual(stdout, '{"time":"2014-01-01T00:00:00.000Z"}\n'
+                                 '{"time":"2014-01-01T00:00:01.000Z"}\n'
+                                 '{"time":"2014-01-01T00:00:02.000Z"}\n'
+                                 '{"time":"2014-01-01T00:00:03.000Z"}\n'
+                                 '{"time":"2014-01-01T00:00:04.000Z"}\n')
+
+
     def test_jut_run_emit_to_text(self):
         """
         use jut to run the juttle program:
@@ -118,3 +175,345 @@ class JutRunTests(unittest.TestCase):
                                  '2014-01-01T00:00:03.000Z\n'
                                  '2014-01-01T00:00:04.000Z\n')
 
+
+    def test_jut_run_emit_to_csv_with_quoting(self):
+        """
+        use jut to run the juttle program:
+
+            emit -from :2014-01-01T00:00:00.000Z: -limit 2
+            | put message="hello, world"
+
+        and verify the csv output correctly quotes values containing commas
+        """
+
+        process = jut('run',
+                      '--format', 'csv',
+                      'emit -from :2014-01-01T00:00:00.000Z: -limit 2 '
+                      '| put message="hello, world"')
+        process.expect_status(0)
+        stdout = process.read_output()
+        process.expect_eof()
+
+        self.assertEqual(stdout, '#time,message\n'
+                                 '2014-01-01T00:00:00.000Z,"hello, world"\n'
+                                 '2014-01-01T00:00:01.000Z,"hello, world"\n')
+
+
+    def test_jut_run_emit_with_sink_output(self):
+        """
+        use jut to run the juttle program:
+
+            emit -from :2014-01-01T00:00:00.000Z: -limit 1
+            | (@table; @logger)
+
+        routing the logger sink to a csv file and verify the table sink is
+        still written to stdout
+        """
+        directory = tempfile.mkdtemp()
+
+        try:
+            csv_filepath = os.path.join(directory, 'logger.csv')
+            process = jut('run',
+                          '--sink-output', 'logger=%s' % csv_filepath,
+                          'emit -from :2014-01-01T00:00:00.000Z: -limit 1 '
+                          '| (@table; @logger)')
+            process.expect_status(0)
+            points = json.loads(process.read_output())
+            process.expect_eof()
+
+            self.assertEqual(points, [
+                {'time': '2014-01-01T00:00:00.000Z'}
+            ])
+
+            with open(csv_filepath, 'r') as csv_file:
+                self.assertEqual(csv_file.read(), '#time\n'
+                                                  '2014-01-01T00:00:00.000Z\n')
+
+        finally:
+            shutil.rmtree(directory)
+
+
+class RawPointsTests(unittest.TestCase):
+    """
+    raw points tests, which don't talk to Jut and can run offline with:
+
+        JUT_FAKE_SERVER=1 python -m unittest tests.jut_run_tests.RawPointsTests
+
+    """
+
+
+    def test_decode_raw_points(self):
+        """
+        verify the raw points are split from the rest of the payload only
+        when that keeps every key of the payload, whatever follows the points
+
+        """
+        points = [{'time': '2014-01-01T00:00:00.000Z', 'value': 'a],"b"'},
+                  {'time': '2014-01-01T00:00:01.000Z', 'value': [1, 2]}]
+
+        payloads = [
+            '{"sink":"sink1","points":%s}',
+            '{"points":%s,"sink":"sink1"}',
+            '{"points":%s,"sink":"sink1","tags":["x"]}',
+            '{"points":%s,"sink":"sink1","tags":[{"name":"x"}]}',
+            '{"points" : %s , "sink":"sink1", "tags" : [ "x" ] }'
+        ]
+
+        for data in payloads:
+            for value in [points[:1], points[1:], points, []]:
+                payload = data_engine._decode_raw_points(data % json.dumps(value))
+
+                if payload == None:
+                    # falls back to decoding the whole payload
+                    continue
+
+                self.assertEqual(payload.pop('sink'), 'sink1')
+                self.assertEqual(payload.pop('tags', None),
+                                 json.loads(data % '[]').get('tags'))
+                self.assertEqual(json.loads(payload.pop('raw_points')), value)
+                self.assertEqual(payload, {})
+
+        # the common case of the points last isn't left to the fallback
+        value = [{'time': '2014-01-01T00:00:00.000Z', 'value': 1}]
+        payload = data_engine._decode_raw_points(payloads[0] % json.dumps(value))
+        self.assertEqual(json.loads(payload['raw_points']), value)
+
+
+class DataEngineRunTests(unittest.TestCase):
+    """
+    tests of running juttle programs against a local fake jut server, which
+    can therefore run offline with:
+
+        JUT_FAKE_SERVER=1 python -m unittest tests.jut_run_tests.DataEngineRunTests
+
+    """
+
+
+    def setUp(self):
+        self.server = FakeJutServer(username='jut-tools-user01',
+                                    password='bigdata',
+                                    deployment_name='jut-tools-deployment')
+        self.server.start()
+
+        self.token_manager = auth.TokenManager(username='jut-tools-user01',
+                                               password='bigdata',
+                                               app_url=self.server.url)
+
+
+    def tearDown(self):
+        self.server.stop()
+
+
+    def run_juttle(self, juttle, websocket_options=None):
+        return list(data_engine.run(juttle,
+                                    'jut-tools-deployment',
+                                    token_manager=self.token_manager,
+                                    app_url=self.server.url,
+                                    websocket_options=websocket_options))
+
+
+    def wait_until(self, condition, timeout, message):
+        """
+        wait up to timeout seconds for the condition provided to be met,
+        failing with the message provided otherwise
+
+        """
+        deadline = time.time() + timeout
+
+        while not condition():
+            if time.time() > deadline:
+                self.fail(message)
+
+            time.sleep(0.1)
+
+
+    def test_run_resumes_after_disconnects(self):
+        """
+        verify a program whose websocket drops midway resumes after the last
+        frame received without losing or duplicating any points, and that
+        the reconnects are counted on its websocket options, and that it's
+        reconnected to just the same when the data engine doesn't number its
+        frames
+
+        """
+        self.server.sequence_frames = True
+        self.server.disconnect_after(3, times=2)
+
+        points = [{'time': '2014-01-01T00:00:00.000Z', 'value': index}
+                  for index in range(0, 100)]
+        self.server.script('emit -limit 100', points_frames(points, 10))
+
+        websocket_options = data_engine.WebsocketOptions(read_timeout=None,
+                                                         receive_buffer=1024 * 1024)
+
+        received = []
+        for payload in self.run_juttle('emit -limit 100',
+                                       websocket_options=websocket_options):
+            received += payload.get('points', [])
+
+        self.assertEqual(received, points)
+        self.assertEqual(self.server.websockets, 3)
+        self.assertEqual(websocket_options.reconnects, 2)
+
+        self.server.sequence_frames = False
+        self.server.disconnect_after(3)
+
+        received = []
+        for payload in self.run_juttle('emit -limit 100',
+                                       websocket_options=websocket_options):
+            received += payload.get('points', [])
+
+        self.assertEqual(received, points)
+        self.assertEqual(self.server.websockets, 5)
+        self.assertEqual(websocket_options.reconnects, 3)
+
+
+    def test_run_compressed(self):
+        """
+        verify a program streams back all of its points when the data engine
+        compresses the websocket, and only when the client opted in and its
+        websocket-client can be extended to offer it
+
+        """
+        self.server.compression = True
+
+        points = [{'time': '2014-01-01T00:00:00.000Z', 'value': index}
+                  for index in range(0, 1000)]
+        self.server.script('emit -limit 1000', points_frames(points, 100))
+
+        def run_juttle(websocket_options):
+            received = []
+            for payload in self.run_juttle('emit -limit 1000',
+                                           websocket_options=websocket_options):
+                received += payload.get('points', [])
+
+            self.assertEqual(received, points)
+
+        run_juttle(data_engine.WebsocketOptions(compression=True))
+        self.assertEqual(self.server.compressed_websockets, 1)
+
+        run_juttle(data_engine.WebsocketOptions())
+        run_juttle(data_engine.WebsocketOptions(compression=False))
+        self.assertEqual(self.server.compressed_websockets, 1)
+
+        deflate_supported = data_engine.DEFLATE_SUPPORTED
+        data_engine.DEFLATE_SUPPORTED = False
+
+        try:
+            run_juttle(data_engine.WebsocketOptions(compression=True))
+
+        finally:
+            data_engine.DEFLATE_SUPPORTED = deflate_supported
+
+        self.assertEqual(self.server.compressed_websockets, 1)
+
+
+    def test_run_with_slow_output(self):
+        """
+        verify the payloads a slow consumer can't keep up with are spilled to
+        disk, past the memory watermark, and read back in order without
+        altering any values, or dropped and counted
+
+        """
+        points = [{'time': '2014-01-01T00:00:00.000Z', 'value': index + 0.1}
+                  for index in range(0, 50)]
+        self.server.script('emit -limit 50', points_frames(points, 1))
+
+        def consume(payloads):
+            received = []
+            for payload in payloads:
+                received += payload.get('points', [])
+                time.sleep(0.01)
+
+            return received
+
+        spilling = pipeline.Pipeline(data_engine.run('emit -limit 50',
+                                                     'jut-tools-deployment',
+                                                     token_manager=self.token_manager,
+                                                     app_url=self.server.url),
+                                     policy=pipeline.SPILL,
+                                     memory_watermark=256)
+
+        self.assertEqual(consume(spilling), points)
+        self.assertTrue(spilling.spilled_payloads > 0)
+
+        dropping = pipeline.Pipeline(data_engine.run('emit -limit 50',
+                                                     'jut-tools-deployment',
+                                                     token_manager=self.token_manager,
+                                                     app_url=self.server.url),
+                                     max_payloads=2,
+                                     policy=pipeline.DROP)
+
+        received = consume(dropping)
+
+        self.assertTrue(dropping.dropped_points > 0)
+        self.assertEqual(len(received) + dropping.dropped_points, len(points))
+
+
+    def test_run_through_daemon(self):
+        """
+        verify `jut run` produces the same output when forwarded to a running
+        jut daemon as when running on its own, with the environment of the
+        caller, and that the forwarded command ends with its caller
+
+        """
+        points = [{'time': '2014-01-01T00:00:00.000Z', 'value': index}
+                  for index in range(0, 25)]
+        self.server.script('emit -limit 25', points_frames(points, 10))
+
+        env = dict(os.environ)
+        env['HOME_OVERRIDE'] = tempfile.mkdtemp()
+        env.pop('JUT_NO_DAEMON', None)
+
+        def start_jut(*args, **kwargs):
+            return subprocess.Popen(['python', 'jut/cli.py'] + list(args),
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE,
+                                    env=dict(env, **kwargs))
+
+        def run_jut(*args, **kwargs):
+            process = start_jut(*args, **kwargs)
+            (output, errors) = process.communicate()
+            self.assertEqual(process.returncode, 0)
+            return output + errors
+
+        try:
+            run_jut('config', 'add',
+                    '-u', 'jut-tools-user01',
+                    '-p', 'bigdata',
+                    '-a', self.server.url,
+                    '-d')
+
+            expected = run_jut('run', '-f', 'csv', 'emit -limit 25')
+
+            run_jut('daemon', 'start')
+
+            try:
+                socket_filepath = os.path.join(env['HOME_OVERRIDE'], 'daemon.sock')
+                self.assertEqual(stat.S_IMODE(os.stat(socket_filepath).st_mode), 0600)
+
+                self.assertEqual(run_jut('run', '-f', 'csv', 'emit -limit 25'), expected)
+
+                self.assertIn('connecting to',
+                              run_jut('run', '-f', 'csv', 'emit -limit 25', JUT_DEBUG='1'))
+
+                self.server.script('emit -every :1s:', [], persistent=True)
+                process = start_jut('run', 'emit -every :1s:')
+
+                self.wait_until(lambda: self.server.open_websockets == 1, 10,
+                                'the forwarded `jut run` didn\'t connect to its '
+                                'job within 10s')
+                process.kill()
+                process.wait()
+
+                # the persistent job stays quiet between heartbeats, which
+                # would otherwise be the first time the command notices
+                self.wait_until(lambda: self.server.open_websockets == 0, 2,
+                                'the forwarded `jut run` was still connected to '
+                                'its job 2s after its caller was killed')
+
+            finally:
+                run_jut('daemon', 'stop')
+
+        finally:
+            shutil.rmtree(env['HOME_OVERRIDE'])
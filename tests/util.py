@@ -152,6 +152,13 @@ class Spawn(object):
 
         return result
 
+    def read_output_line(self):
+        """
+        read and return the next line of the stdout output
+
+        """
+        return self.process.stdout.readline()
+
     def read_error(self):
         """
         read and return the whole stderr output